@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+최근 N 거래일 일간 수익률 상관으로 유니버스를 '같이 움직이는 종목군' 으로 묶기 (NumPy 만 사용)
+- 종가 행렬: HistoryStore.load_range 로 윈도우(기본 60일 + 직전 1일)의 close 를 한 번에 읽고
+  id → 열 번호 직접 주소 테이블로 C[day, 종목] 에 scatter (결측 NaN)
+  data/universe/{market}/{date}.npz 전체 유니버스가 있으면 그 종가로 빈칸을 채움
+  (저장소는 top 리스트 합집합만 보관 → 리스트를 들락날락한 종목은 관측이 듬성듬성)
+- 수익률 = 종가 / 직전 날짜 종가 - 1 (저장소 pct_change 는 US 가 시가→종가라 쓰지 않음)
+  전날/당일 종가가 없거나 비율이 1/SPLIT~SPLIT 밖(분할/병합 추정)이면 NaN
+- 시장 요인 제거: 날짜별 횡단면 평균을 빼서 잔차 수익률로 상관 (전 종목이 지수와 같이 움직이는 효과 제거)
+- 표준화: 종목별 평균 0 / 분산 1 / √관측수 로 나누고 결측은 0 → Zᵀ Z ≈ 상관행렬
+  관측이 min_obs 미만인 종목은 클러스터 대상에서 제외 (저장소 히스토리가 min_obs 일보다 짧으면 클러스터 없음)
+  min_obs 기본값: 윈도우 전 날짜에 유니버스 스냅샷이 있으면 MIN_OBS(40), 아니면 MIN_OBS_STORE(20)
+- 블록 상관: 열 블록(기본 512)마다 Z[:, 블록]ᵀ Z 만 만들고 np.argpartition 으로 행별 상위 k 이웃만 남김
+  → n×n 행렬을 통째로 들고 있지 않음, 메모리 O(블록 × n), 3,000+ 종목도 수십 ms
+- 그래프: 상호 kNN (i 가 j 의 k 이웃이고 j 도 i 의 k 이웃) + 상관 min_corr 이상인 간선만
+  연결 요소는 최소 라벨 전파 + 포인터 점프 (파이썬 루프는 반복 횟수만큼만)
+- 크기 min_size 미만 요소는 라벨 -1 (무소속)
+    python clusters.py --market us --date 2026-08-20 --window 60
+"""
+
+import sys, argparse
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from history_store import HistoryStore, DEFAULT_ROOT, UNIVERSE_ROOT, load_universe, universe_path
+from market_stats import column, grouped_stats
+
+WINDOW = 60
+MIN_OBS = 40                # 전체 유니버스 스냅샷으로 매일 종가가 있을 때
+MIN_OBS_STORE = 20          # 저장소(top 리스트 합집합)만 있을 때
+SPLIT = 3.0
+K = 5
+MIN_CORR = 0.5
+MIN_SIZE = 3
+BLOCK = 512
+
+
+class Clusters(NamedTuple):
+    labels: np.ndarray          # 종목별 클러스터 번호 (0..n_clusters-1, -1 = 무소속)
+    n_clusters: int
+    corr: np.ndarray            # 클러스터별 간선 평균 상관
+    obs: np.ndarray             # 종목별 윈도우 내 관측 수
+    dates: List[str]
+
+
+def return_matrix(store: HistoryStore, tickers: Sequence[str], end: Optional[str] = None,
+                  window: int = WINDOW, universe_root: Optional[Path] = UNIVERSE_ROOT):
+    """
+    (R[날짜, 종목], 날짜 목록, 전 날짜 유니버스 스냅샷 여부).
+    R = 종가 / 직전 날짜 종가 - 1, 종가가 없는 칸은 NaN.
+    """
+    ds = [d for d in store.dates() if end is None or d <= end][-(window + 1):]
+    C = np.full((len(ds), len(tickers)), np.nan)
+    full = bool(ds)
+    if ds:
+        ids = store.ids_for(tickers)
+        col = np.full(max(len(store.symbols()), 1), -1, dtype=np.int64)
+        col[ids[ids >= 0]] = np.flatnonzero(ids >= 0)
+        for i, day in enumerate(ds):
+            up = universe_path(store.market, day, universe_root) if universe_root else None
+            if up is None or not up.exists():
+                full = False
+                continue
+            u = load_universe(up)
+            uid = store.ids_for(u["ticker"].tolist())
+            c = np.where(uid >= 0, col[np.maximum(uid, 0)], -1)
+            C[i, c[c >= 0]] = u["close"][c >= 0]
+        d = store.load_range(ds[0], ds[-1], ("close",))
+        c = col[np.asarray(d["ticker_id"])]
+        ok = c >= 0
+        C[d["day"][ok], c[ok]] = np.asarray(d["close"])[ok]     # 저장소 행이 유니버스를 덮어씀
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = C[1:] / C[:-1]
+    R = np.where((ratio > 1 / SPLIT) & (ratio < SPLIT), ratio - 1.0, np.nan)
+    return R, ds[1:], full
+
+
+def standardize(R: np.ndarray, min_obs: int = MIN_OBS):
+    """시장 평균 제거 + 종목별 표준화. 반환 (Z, 관측 수, 사용 가능 마스크)."""
+    valid = np.isfinite(R)
+    obs = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mkt = np.where(valid, R, 0.0).sum(axis=1, keepdims=True) / np.maximum(valid.sum(axis=1, keepdims=True), 1)
+        X = np.where(valid, R - mkt, 0.0)
+        mean = X.sum(axis=0) / np.maximum(obs, 1)
+        X = np.where(valid, X - mean, 0.0)
+        sd = np.sqrt((X * X).sum(axis=0))
+    use = (obs >= min_obs) & (sd > 0)
+    Z = np.where(use, X / np.where(sd > 0, sd, 1.0), 0.0)
+    return Z, obs, use
+
+
+def knn(Z: np.ndarray, k: int = K, block: int = BLOCK):
+    """블록 단위 상관 → 행별 상위 k 이웃 (idx, 상관). 자기 자신 제외."""
+    n = Z.shape[1]
+    k = min(k, max(n - 1, 0))
+    idx = np.zeros((n, k), dtype=np.int64)
+    sim = np.zeros((n, k))
+    if not k:
+        return idx, sim
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        C = Z[:, lo:hi].T @ Z                                   # (블록, n)
+        C[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        part = np.argpartition(-C, k - 1, axis=1)[:, :k]
+        idx[lo:hi] = part
+        sim[lo:hi] = np.take_along_axis(C, part, axis=1)
+    return idx, sim
+
+
+def mutual_edges(idx: np.ndarray, sim: np.ndarray, min_corr: float = MIN_CORR):
+    """상호 kNN 간선 (i < j) 과 상관."""
+    n, k = idx.shape
+    a = np.repeat(np.arange(n, dtype=np.int64), k)
+    b = idx.ravel()
+    s = sim.ravel()
+    keep = s >= min_corr
+    a, b, s = a[keep], b[keep], s[keep]
+    mutual = np.isin(a * n + b, b * n + a)
+    sel = mutual & (a < b)
+    return a[sel], b[sel], s[sel]
+
+
+def components(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """무향 그래프 연결 요소 라벨 (요소 내 최소 정점 번호)."""
+    lab = np.arange(n, dtype=np.int64)
+    while True:
+        m = np.minimum(lab[src], lab[dst])
+        new = lab.copy()
+        np.minimum.at(new, src, m)
+        np.minimum.at(new, dst, m)
+        while True:                                             # 포인터 점프
+            nxt = new[new]
+            if np.array_equal(nxt, new):
+                break
+            new = nxt
+        if np.array_equal(new, lab):
+            return lab
+        lab = new
+
+
+def cluster(store: HistoryStore, tickers: Sequence[str], end: Optional[str] = None, window: int = WINDOW,
+            min_obs: Optional[int] = None, k: int = K, min_corr: float = MIN_CORR, min_size: int = MIN_SIZE,
+            block: int = BLOCK) -> Clusters:
+    R, ds, full = return_matrix(store, tickers, end, window)
+    if min_obs is None:
+        min_obs = MIN_OBS if full else MIN_OBS_STORE
+    Z, obs, use = standardize(R, min_obs)
+    n = len(tickers)
+    cols = np.flatnonzero(use)
+    labels = np.full(n, -1, dtype=np.int64)
+    if len(ds) < min_obs or len(cols) < 2:                      # 히스토리가 짧으면 클러스터 없음
+        return Clusters(labels, 0, np.zeros(0), obs, ds)
+    idx, sim = knn(Z[:, cols], k, block)
+    a, b, s = mutual_edges(idx, sim, min_corr)
+    comp = components(len(cols), a, b)
+    _, inv, size = np.unique(comp, return_inverse=True, return_counts=True)
+    big = size >= min_size
+    remap = np.full(len(size), -1, dtype=np.int64)
+    remap[big] = np.arange(int(big.sum()))
+    labels[cols] = remap[inv]
+    G = int(big.sum())
+    ea = labels[cols[a]]
+    w = np.bincount(ea[ea >= 0], weights=s[ea >= 0], minlength=G)
+    e = np.bincount(ea[ea >= 0], minlength=G)
+    corr = np.divide(w, e, out=np.zeros(G), where=e > 0)
+    return Clusters(labels, G, corr, obs, ds)
+
+
+def summarize(rows: Sequence[dict], cl: Clusters, top: int = 8, names: int = 6) -> List[dict]:
+    """
+    클러스터별 당일 breadth/flow (market_stats.grouped_stats) → 거래대금 비중 순 상위 top.
+    tickers = 클러스터 안 거래대금 상위 names 개 ("/" 연결).
+    """
+    if not cl.n_clusters:
+        return []
+    pct, dv = column(rows, "pct_change"), column(rows, "dollar_volume")
+    total = float(np.nansum(np.where(dv > 0, dv, 0.0)))
+    g = grouped_stats(cl.labels, pct, dv, cl.n_clusters, dv_total=total)
+    order = np.argsort(-g["dv"], kind="stable")[:top]
+    rank = np.lexsort((-np.nan_to_num(dv), cl.labels))          # 클러스터 순 → 거래대금 내림차순
+    start = np.searchsorted(cl.labels[rank], np.arange(cl.n_clusters))
+    out = []
+    for c in order.tolist():
+        members = rank[start[c]:start[c] + min(names, int(g["size"][c]))]
+        out.append({
+            "tickers": "/".join(rows[i].get("ticker", "") for i in members.tolist()),
+            "size": int(g["size"][c]), "adv": int(g["adv"][c]), "dec": int(g["dec"][c]),
+            "median": None if np.isnan(g["median"][c]) else float(g["median"][c]),
+            "dv_share": float(g["dv_share"][c]), "corr": float(cl.corr[c]),
+        })
+    return out
+
+
+def lookup(market: str, date_str: str, rows: Sequence[dict], root: Path = DEFAULT_ROOT,
+           **kw) -> Optional[List[dict]]:
+    """요약기용: 저장소 윈도우가 date_str 로 끝날 때만 클러스터 요약 (아니면 None)."""
+    store = HistoryStore(market, root)
+    if not (store.dir / "index.json").exists() or not store.has(date_str):
+        return None
+    try:
+        cl = cluster(store, [r.get("ticker") for r in rows], date_str, **kw)
+    except Exception as e:
+        print(f"WARN: clusters unavailable ({e})", file=sys.stderr)
+        return None
+    return summarize(rows, cl) or None
+
+
+def main():
+    import time
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--market", default="us")
+    ap.add_argument("--history-dir", default=str(DEFAULT_ROOT))
+    ap.add_argument("--date", default=None, help="윈도우 마지막 날짜 (기본: 저장소 최신)")
+    ap.add_argument("--window", type=int, default=WINDOW)
+    ap.add_argument("--k", type=int, default=K)
+    ap.add_argument("--min-corr", type=float, default=MIN_CORR)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    store = HistoryStore(args.market, Path(args.history_dir))
+    date = args.date or store.dates()[-1]
+    rows = store.rows(date, ("pct_change", "dollar_volume"))
+    rows.sort(key=lambda r: -(r["dollar_volume"] or 0))
+    t = time.perf_counter()
+    cl = cluster(store, [r["ticker"] for r in rows], date, args.window, k=args.k, min_corr=args.min_corr)
+    ms = (time.perf_counter() - t) * 1000
+    grouped = int((cl.labels >= 0).sum())
+    print(f"{date}: {len(rows)} tickers, {cl.n_clusters} cluster(s) covering {grouped}, "
+          f"window={len(cl.dates)}d, {ms:.0f} ms")
+    print("tickers,size,adv,dec,median,dv_share,corr")
+    for r in summarize(rows, cl, args.top):
+        med = "" if r["median"] is None else f"{r['median'] * 100:.2f}%"
+        print(f"{r['tickers']},{r['size']},{r['adv']},{r['dec']},{med},{r['dv_share'] * 100:.1f}%,{r['corr']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,22 +8,42 @@ JPX Top-Lists fetcher
 - 메트릭: dollar_volume = Volume * Close  (JPY 기준)
 - 필터: 상승/하락 Top10은 종가가 MIN_PRICE_JPY 이상인 종목만 포함
 - 날짜: JST 16:00 이후 실행 시 헤더 날짜를 '당일(JST)'로 강제 표기
+- 히스토리: data/history/jpx/ 에 리스트 합집합을 컬럼형으로 저장 (--from-history 로 재생성)
+- 다운로드: batch 를 N 개까지 동시 실행, 429/지연에 따라 AIMD 로 동시성·간격 조절 (throttle.py)
+- 증분: data/jpx_last_close.npz 에 종목별 직전 종가 보관 → 최신인 종목은 1d(1개 bar)만 받고
+  pct_change 는 저장된 종가 기준. 기록이 없거나 오래된 종목만 3d
+- 복구: 실패 batch 는 백오프 재시도 → 반으로 나눠 재귀 재시도 → 단일 종목까지 실패하면
+  data/jpx_quarantine.json 에 격리(기간 동안 건너뜀). 커버리지는 bundle 의 coverage 에 기록
+  빈 프레임(EmptyFrame)은 429 와 같이 취급해 백오프 재시도 후 분할, 단일 종목도 재시도가 모두 비어야 격리
 """
 
-import os, sys, csv, json, time, argparse
+import os, sys, csv, json, time, argparse, statistics
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, NamedTuple, Tuple, Optional
 
+import numpy as np
 import pandas as pd
 import yfinance as yf
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
+from ranking import RankSpec, rank
+from throttle import AdaptiveScheduler, is_rate_limited
+from history_store import HistoryStore, union_rows
+from theme_stats import ThemeIndex, aggregate as aggregate_themes
+import rolling
+from last_close import LastCloseStore, DEFAULT_PATH as LAST_CLOSE_PATH, prev_weekday
+
 # --------------------
 # 설정
 # --------------------
 BATCH = int(os.getenv("JPX_BATCH", "100"))
 MIN_PRICE_JPY = float(os.getenv("MIN_PRICE_JPY", "1000"))  # 상승/하락 Top10 최저가 필터(¥)
+RETRIES = int(os.getenv("JPX_RETRIES", "1"))                 # 실패 batch 통째 재시도 횟수(분할 전)
+THROTTLE_RETRIES = int(os.getenv("JPX_THROTTLE_RETRIES", "5"))  # 429 계열 재시도 횟수
+RETRY_BACKOFF = float(os.getenv("JPX_RETRY_BACKOFF", "2"))   # 재시도 대기(sec), 회차마다 2배
+QUARANTINE_PATH = Path(os.getenv("JPX_QUARANTINE", "data/jpx_quarantine.json"))
+QUARANTINE_DAYS = float(os.getenv("JPX_QUARANTINE_DAYS", "7"))  # 재격리 시 2배, 최대 90일
 
 # --------------------
 # 유틸
@@ -49,83 +69,111 @@ def batched(seq: List[str], n: int):
     for i in range(0, len(seq), n):
         yield seq[i:i+n]
 
-def fetch_batch(tickers: List[str]) -> Tuple[List[dict], Optional[pd.Timestamp]]:
+class EmptyFrame(RuntimeError):
+    """yfinance 가 빈 프레임을 돌려줌 (429 를 예외 대신 빈 프레임으로 주는 경우가 대부분, 드물게 데이터 없는 종목)."""
+    pass
+
+def is_throttled(exc: BaseException) -> bool:
+    """429 계열 예외 또는 빈 프레임 (스케줄러 감속 + 같은 묶음 재시도 대상)."""
+    return isinstance(exc, EmptyFrame) or is_rate_limited(exc)
+
+def _long_arrays(df: pd.DataFrame, tickers: List[str]):
+    """
+    yfinance 프레임(멀티: (Ticker, Price) 컬럼 / 단일: Price 컬럼) → long 형식 배열.
+    (날짜 × 종목 × 필드) 큐브로 채운 뒤 (날짜·종목, 필드) 로 reshape.
+    DataFrame.stack 은 종목마다 내부 루프를 돌아 4,000 종목에서 수 초가 걸린다.
+    반환: (거래일 datetime64[D], 종목 위치(tickers 기준, 없으면 -1), 값 2D, 필드명)
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        t_codes, t_names = pd.factorize(df.columns.get_level_values(0))
+        f_codes, f_names = pd.factorize(df.columns.get_level_values(1))
+    else:
+        t_codes, t_names = np.zeros(df.shape[1], dtype=np.int64), pd.Index(tickers[:1])
+        f_codes, f_names = np.arange(df.shape[1]), pd.Index(df.columns)
+    when = pd.DatetimeIndex(df.index)
+    if when.tz is not None:
+        when = when.tz_localize(None)
+    nd, nt = len(when), len(t_names)
+    cube = np.full((nd, nt, len(f_names)), np.nan)
+    cube[:, t_codes, f_codes] = df.to_numpy(dtype=np.float64, na_value=np.nan)
+    days = np.repeat(when.values.astype("datetime64[D]"), nt)
+    pos = np.tile(pd.Index(tickers).get_indexer(t_names), nd)
+    return days, pos, cube.reshape(nd * nt, -1), list(f_names)
+
+def extract_bars(df: pd.DataFrame, tickers: List[str], last=None) -> Tuple[List[dict], Optional[pd.Timestamp]]:
     """
-    yfinance에서 3영업일 daily로 내려받아 전일 대비 % 계산.
+    다운로드 프레임 → 종목별 최신 bar 행 (종목 루프 없이 컬럼 단위 계산).
+    - 종목별로 값이 하나라도 빈 날짜는 제외 (기존 df[t].dropna() 와 동일)
+    - (요청 순서, 날짜) 로 정렬한 뒤 종목 경계로 마지막/직전 유효 행을 고름
+    - 직전 행이 없는 종목(1d 요청 등)은 last 저장소의 직전 종가를 기준으로 사용
+    반환 행 순서는 tickers 순서
+    """
+    days, pos, vals, fields = _long_arrays(df, tickers)
+    keep = (pos >= 0) & ~np.isnan(vals).any(axis=1)
+    if not keep.any():
+        return [], None
+    order = np.flatnonzero(keep)
+    order = order[np.lexsort((days[order], pos[order]))]
+    pos, days, vals = pos[order], days[order], vals[order]
+    n = len(pos)
+    col = lambda k: vals[:, fields.index(k)] if k in fields else np.full(n, np.nan)
+    o, c, v = col("Open"), col("Close"), col("Volume")
+
+    is_last = np.ones(n, dtype=bool)
+    is_last[:-1] = pos[1:] != pos[:-1]
+    li = np.flatnonzero(is_last)
+    has_prev = (li > 0) & (pos[li - 1] == pos[li])
+    ref = np.full(len(li), np.nan)
+    ref[has_prev] = c[li[has_prev] - 1]
+    names = np.asarray(tickers, dtype=object)[pos[li]]
+    if last is not None and (~has_prev).any():
+        m = ~has_prev
+        ref[m] = last.references(names[m], days[li[m]].astype(np.int64))
+    else:
+        li, ref, names = li[has_prev], ref[has_prev], names[has_prev]   # 저장소 없이 bar 1개면 제외 (기존 동작)
+    if len(li) == 0:
+        return [], None
+
+    cl, vl = c[li], v[li]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(ref != 0, (cl - ref) / ref, np.nan)
+    day_s = np.datetime_as_string(days[li], unit="D")
+    nan_none = lambda a: [None if x != x else x for x in a.tolist()]
+    rows = [
+        {"ticker": t.replace(".T", ""),   # "7203"
+         "open": op, "close": cc, "volume": vv,
+         "dollar_volume": dv,             # JPY
+         "pct_change": pc, "prev_close": rf, "date": d}
+        for t, op, cc, vv, dv, pc, rf, d in zip(
+            names.tolist(), o[li].tolist(), cl.tolist(), vl.tolist(), (vl * cl).tolist(),
+            nan_none(pct), nan_none(ref), day_s.tolist())
+    ]
+    return rows, pd.Timestamp(days[li].max())
+
+def fetch_batch(tickers: List[str], download=None, period: str = "3d",
+                last=None) -> Tuple[List[dict], Optional[pd.Timestamp]]:
+    """
+    yfinance daily 를 내려받아 최신 bar 와 전일 대비 % 계산.
+    period: "3d" (프레임 안의 전일 종가 사용) | "1d" (last 저장소의 직전 종가 사용)
+    last: LastCloseStore (없으면 프레임에 2개 이상 bar 가 있는 종목만)
+    download: yf.download 호환 함수 (테스트용 대체 주입)
     반환: (rows, max_timestamp)
     """
-    df = yf.download(
+    download = download or yf.download
+    df = download(
         tickers=tickers,
-        period="3d",
+        period=period,
         interval="1d",
         group_by="ticker",
         auto_adjust=False,
         progress=False,
         threads=True,
     )
+    if df is None or df.empty:
+        # yfinance 는 429 를 예외 대신 빈 프레임으로 돌려주는 경우가 많다
+        raise EmptyFrame(f"yfinance: empty frame for {len(tickers)} ticker(s)")
 
-    rows: List[dict] = []
-    max_ts: Optional[pd.Timestamp] = None
-
-    # 멀티/단일 형태 모두 처리
-    if isinstance(df.columns, pd.MultiIndex):
-        for t in tickers:
-            if t not in df.columns.get_level_values(0):
-                continue
-            cdf = df[t].dropna()
-            if cdf.empty or len(cdf) < 2:
-                continue
-
-            last = cdf.iloc[-1]
-            prev = cdf.iloc[-2]
-
-            o = float(last.get("Open", float("nan")))
-            c = float(last.get("Close", float("nan")))
-            v = float(last.get("Volume", float("nan")))
-            pct = None
-            if pd.notna(c) and pd.notna(prev.get("Close")) and prev["Close"] != 0:
-                pct = (c - float(prev["Close"])) / float(prev["Close"])
-
-            if pd.isna(c) or pd.isna(v):
-                continue
-
-            dv = v * c  # JPY
-            rows.append({
-                "ticker": t.replace(".T", ""),   # "7203"
-                "open": o, "close": c, "volume": v,
-                "dollar_volume": dv, "pct_change": pct
-            })
-
-            ts = cdf.index[-1]
-            if isinstance(ts, pd.Timestamp):
-                if (max_ts is None) or (ts > max_ts):
-                    max_ts = ts
-    else:
-        cdf = df.dropna()
-        if not cdf.empty and len(cdf) >= 2:
-            last = cdf.iloc[-1]
-            prev = cdf.iloc[-2]
-            t = tickers[0]
-
-            o = float(last.get("Open", float("nan")))
-            c = float(last.get("Close", float("nan")))
-            v = float(last.get("Volume", float("nan")))
-            pct = None
-            if pd.notna(c) and pd.notna(prev.get("Close")) and prev["Close"] != 0:
-                pct = (c - float(prev["Close"])) / float(prev["Close"])
-
-            if pd.isna(c) or pd.isna(v):
-                return rows, None
-
-            dv = v * c
-            rows.append({
-                "ticker": t.replace(".T", ""),
-                "open": o, "close": c, "volume": v,
-                "dollar_volume": dv, "pct_change": pct
-            })
-            max_ts = cdf.index[-1]
-
-    return rows, max_ts
+    return extract_bars(df, tickers, last)
 
 def ensure_out(date_str: str) -> Path:
     p = Path("out_jpx") / date_str
@@ -139,30 +187,254 @@ def write_csv(path: Path, rows: List[dict], cols: List[str]):
         for r in rows:
             w.writerow({k: r.get(k) for k in cols})
 
+COLS = ["ticker", "open", "close", "volume", "dollar_volume", "pct_change"]
+LAST_CLOSE_FIELDS = ("prev_close", "date")   # extract_bars 행의 LastCloseStore 전용 필드 (출력에는 넣지 않음)
+
+def split_last_close(rows: List[dict]) -> List[dict]:
+    """행에서 LastCloseStore 전용 필드를 떼어내 last.update() 용 리스트로 반환 (rows 는 제자리 수정)."""
+    return [{"ticker": r["ticker"], "close": r.get("close"), **{k: r.pop(k, None) for k in LAST_CLOSE_FIELDS}}
+            for r in rows]
+
+def _ge_min_price(r: dict) -> bool:
+    return r.get("close") is not None and r["close"] >= MIN_PRICE_JPY
+
+RANK_SPECS = [
+    RankSpec("universe_top600_by_dollar", "dollar_volume", None, 600, "desc"),
+    RankSpec("top10_dollar_value", "dollar_volume", None, 10, "desc"),
+    RankSpec("top10_volume", "volume", None, 10, "desc"),
+    # US와 키 호환을 위해 이름 유지 (실제 필터는 MIN_PRICE_JPY)
+    RankSpec("top10_gainers_ge10", "pct_change", _ge_min_price, 10, "desc"),
+    RankSpec("top10_losers_ge10", "pct_change", _ge_min_price, 10, "asc"),
+]
+
+def build_lists(all_rows: List[dict]) -> dict:
+    # 랭킹 계산 (단일 패스, ranking.py)
+    return rank(all_rows, RANK_SPECS)
+
+def write_outputs(outdir: Path, date_str: str, universe_total: int, lists: dict,
+                  extra: Optional[dict] = None):
+    # CSV 출력
+    write_csv(outdir / "universe_top600_by_dollar.csv", lists["universe_top600_by_dollar"], COLS)
+    write_csv(outdir / "top10_dollar_value.csv", lists["top10_dollar_value"], COLS)
+    write_csv(outdir / "top10_volume.csv",        lists["top10_volume"], COLS)
+    write_csv(outdir / "top10_gainers_ge_minprice.csv", lists["top10_gainers_ge10"], COLS)
+    write_csv(outdir / "top10_losers_ge_minprice.csv",  lists["top10_losers_ge10"],  COLS)
+
+    bundle = {
+        "date": date_str,
+        "market": "JP",
+        "currency": "JPY",
+        "params": {
+            "min_price_jpy": MIN_PRICE_JPY,
+            "batch": BATCH,
+        },
+        "counts": {
+            "universe_total": universe_total,
+            "universe_top600_by_dollar": len(lists["universe_top600_by_dollar"]),
+        },
+        "lists": lists,
+        "source_note": "Prices/Volumes via yfinance JP (.T). dollar_volume means JPY not USD.",
+    }
+    bundle.update(extra or {})
+
+    (outdir / "bundle.json").write_text(
+        json.dumps(bundle, ensure_ascii=False, indent=2),
+        encoding="utf-8"
+    )
+
+# --------------------
+# 격리 목록
+# --------------------
+def load_quarantine(path: Path = QUARANTINE_PATH) -> Dict[str, dict]:
+    """{code: {"since", "until", "strikes", "error"}}. 없거나 깨졌으면 빈 dict."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def save_quarantine(q: Dict[str, dict], path: Path = QUARANTINE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(dict(sorted(q.items())), ensure_ascii=False, indent=2) + "\n",
+                    encoding="utf-8")
+
+def quarantine_add(q: Dict[str, dict], code: str, error: str, today: str):
+    """격리 등록. 만료 후 다시 실패한 종목은 기간을 2배로 (최대 90일)."""
+    strikes = q.get(code, {}).get("strikes", 0) + 1
+    days = min(90.0, QUARANTINE_DAYS * 2 ** (strikes - 1))
+    until = (datetime.strptime(today, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+    q[code] = {"since": today, "until": until, "strikes": strikes, "error": error[:200]}
+
+# --------------------
+# 다운로드 + 실패 복구
+# --------------------
+class Job(NamedTuple):
+    tickers: Tuple[str, ...]
+    attempt: int = 0       # 같은 묶음 재시도 회차
+    wait: float = 0.0      # 시작 전 대기(sec, 백오프)
+    kind: str = "batch"    # batch | split | missing
+    period: str = "3d"     # 1d: 직전 종가가 저장소에 있는 종목 / 3d: 그 외
+
+def run_job(job: Job, download=None, last=None):
+    if job.wait > 0:
+        time.sleep(job.wait)
+    return fetch_batch(list(job.tickers), download, job.period, last)
+
+def recover(job: Job, error: BaseException) -> Tuple[List[Job], List[str]]:
+    """
+    실패한 job → (다시 돌릴 job, 격리할 ticker).
+    - 429 계열 / 빈 프레임: 종목 탓이 아닐 가능성이 높으므로 THROTTLE_RETRIES 까지 같은 묶음 재시도
+      (간격은 스케줄러가 늘림. 빈 프레임은 job 자체도 RETRY_BACKOFF 에서 2배씩 대기 →
+      단일 종목은 ~1분에 걸친 재시도가 모두 비어야 격리)
+    - 원래 batch 의 실패: 일시 오류일 수 있으므로 RETRIES 회까지 백오프 후 통째로 재시도
+    - 그 뒤에도 실패: 반으로 나눠 각각 실행 → 불량 종목 1개면 ~2·log2(n) 회로 격리
+    - 단일 종목까지 실패: 격리
+    """
+    empty = isinstance(error, EmptyFrame)
+    throttled = is_throttled(error)
+    if job.attempt < (THROTTLE_RETRIES if throttled else RETRIES if job.kind == "batch" else 0):
+        wait = 0.0 if throttled and not empty else RETRY_BACKOFF * 2 ** job.attempt
+        return [job._replace(attempt=job.attempt + 1, wait=wait)], []
+    if len(job.tickers) > 1:
+        h = len(job.tickers) // 2
+        half = dict(attempt=0, wait=0.0, kind="split")
+        return [job._replace(tickers=job.tickers[:h], **half), job._replace(tickers=job.tickers[h:], **half)], []
+    return [], list(job.tickers)
+
+def fetch_universe(tickers: List[str], args, download=None, last=None,
+                   since=None) -> Tuple[List[dict], List[pd.Timestamp], dict, Dict[str, str]]:
+    """
+    전 종목 다운로드. 반환: (rows, 관측 타임스탬프, fetch_stats, {격리할 ticker: 오류})
+    rows 는 tickers 순서 (job 완료 순서와 무관)
+    - last/since: 저장소의 마지막 거래일이 since 이상인 종목은 1d, 나머지는 3d 로 요청
+    - 성공 batch 에서 빠진 종목은 마지막에 한 번 모아서 3d 로 재요청
+      (프레임은 왔는데 행이 없으면 missing 으로 집계, 빈 프레임이면 백오프 재시도 → 분할 → 격리)
+    """
+    sched = AdaptiveScheduler(
+        lambda job: run_job(job, download, last), concurrency=args.concurrency,
+        max_concurrency=args.max_concurrency, delay=max(args.sleep, 0.0),
+        target_latency=args.target_latency, throttled=is_throttled,
+    )
+    fresh = last.fresh(tickers, since) if last is not None and since is not None else [False] * len(tickers)
+    chunks = []
+    for period, group in (("1d", [t for t, f in zip(tickers, fresh) if f]),
+                          ("3d", [t for t, f in zip(tickers, fresh) if not f])):
+        for chunk in batched(group, BATCH):
+            chunks.append(chunk)
+            sched.add(Job(tuple(chunk), period=period))
+
+    rows: List[dict] = []
+    seen_dates: List[pd.Timestamp] = []
+    got = set()
+    bad: Dict[str, str] = {}
+    timings: List[float] = []
+    failed = 0
+    t0 = time.monotonic()
+
+    def drain():
+        nonlocal failed
+        for d in sched.run():
+            job = d.task
+            timings.append(d.elapsed)
+            state = f"{job.kind} {job.period} n={len(job.tickers)} try={job.attempt} conc={d.concurrency:.1f} delay={d.delay:.1f}s"
+            if d.error is not None:
+                failed += 1
+                retry, quarantine = recover(job, d.error)
+                for j in retry:
+                    sched.add(j)
+                for t in quarantine:
+                    bad[t] = f"{type(d.error).__name__}: {d.error}"
+                print(f"request {len(timings)}: FAILED in {d.elapsed:.1f}s ({state}): {d.error}"
+                      f" -> {'retry' if retry else 'quarantine'}", file=sys.stderr)
+                continue
+            r, ts = d.value
+            for row in r:
+                if row["ticker"] not in got:
+                    got.add(row["ticker"])
+                    rows.append(row)
+            if ts is not None:
+                seen_dates.append(ts)
+            print(f"request {len(timings)}: {len(r)}/{len(job.tickers)} rows in {d.elapsed:.1f}s ({state})")
+
+    drain()
+    missing = [t for t in tickers if t.replace(".T", "") not in got and t not in bad]
+    for chunk in batched(missing, BATCH):
+        sched.add(Job(tuple(chunk), kind="missing"))
+    drain()
+
+    # 완료 순서는 동시성/지연/재시도에 따라 달라지므로 유니버스 순서로 (랭킹 동률은 입력 순서)
+    pos = {t.replace(".T", ""): i for i, t in enumerate(tickers)}
+    rows.sort(key=lambda r: pos.get(r["ticker"], len(pos)))
+
+    n_fresh = int(sum(fresh))
+    fetch_stats = {
+        "tickers_1d": n_fresh, "tickers_3d": len(tickers) - n_fresh,
+        "batches": len(chunks), "requests": len(timings), "extra_requests": len(timings) - len(chunks),
+        "failed_requests": failed, "throttled": sched.throttle_events,
+        "wall_s": round(time.monotonic() - t0, 1),
+        "batch_p50_s": round(statistics.median(timings), 2) if timings else None,
+        "batch_max_s": round(max(timings), 2) if timings else None,
+    }
+    return rows, seen_dates, fetch_stats, bad
+
 # --------------------
 # 메인 로직
 # --------------------
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--sleep", type=float, default=float(os.getenv("JPX_SLEEP", "0.6")),
-                    help="batch 간 대기(sec)")
+                    help="batch 시작 간 최소 간격(sec). 429 발생 시 자동으로 늘어남")
+    ap.add_argument("--concurrency", type=int, default=int(os.getenv("JPX_CONCURRENCY", "3")),
+                    help="동시 실행 batch 수 초기값")
+    ap.add_argument("--max-concurrency", type=int, default=int(os.getenv("JPX_MAX_CONCURRENCY", "8")))
+    ap.add_argument("--target-latency", type=float, default=float(os.getenv("JPX_TARGET_LATENCY", "30")),
+                    help="batch 지연이 이 값(sec)을 넘으면 동시성 축소")
+    ap.add_argument("--history-dir", default=os.getenv("HISTORY_DIR", "data/history"))
+    ap.add_argument("--from-history", default=None, metavar="YYYY-MM-DD",
+                    help="다운로드 없이 히스토리 저장소에서 해당일 bundle/CSV 재생성")
+    ap.add_argument("--last-close", default=str(LAST_CLOSE_PATH),
+                    help="종목별 직전 종가 저장소(.npz)")
+    ap.add_argument("--full", action="store_true",
+                    help="직전 종가 저장소를 무시하고 전 종목 3d 로 받기 (저장소는 갱신)")
     args = ap.parse_args()
 
-    tickers = load_universe_codes()
-    all_rows: List[dict] = []
-    seen_dates: List[pd.Timestamp] = []
-
-    for chunk in batched(tickers, BATCH):
-        try:
-            r, ts = fetch_batch(chunk)
-            all_rows.extend(r)
-            if ts is not None:
-                seen_dates.append(ts)
-        except Exception:
-            # 간헐적 429 등 완화
-            time.sleep(2)
-            continue
-        time.sleep(max(args.sleep, 0.0))
+    store = HistoryStore("jpx", Path(args.history_dir))
+    if args.from_history:
+        rows = store.rows(args.from_history, COLS[1:])
+        pos = {t.replace(".T", ""): i for i, t in enumerate(load_universe_codes())}
+        rows.sort(key=lambda r: pos.get(r["ticker"], len(pos)))   # 라이브 실행과 같은 입력 순서 (동률 순위 일치)
+        total = store.meta(args.from_history).get("total_rows") or len(rows)
+        outdir = ensure_out(args.from_history)
+        write_outputs(outdir, args.from_history, total, build_lists(rows))
+        print(f"Wrote {outdir.resolve()} (from history)")
+        return
+
+    # 격리 기간이 남은 종목은 건너뜀 (만료분은 다시 시도, 기록은 남겨 재격리 시 기간 2배)
+    today_jst = datetime.now(ZoneInfo("Asia/Tokyo")).strftime("%Y-%m-%d")
+    quarantine = load_quarantine()
+    active = {c for c, q in quarantine.items() if q.get("until", "") > today_jst}
+    universe = load_universe_codes()
+    tickers = [t for t in universe if t.replace(".T", "") not in active]
+
+    # 직전 평일까지 기록된 종목은 최신 bar 1개만 요청 (휴장 다음날은 전 종목 3d)
+    last = LastCloseStore(Path(args.last_close))
+    since = None if args.full else prev_weekday(datetime.strptime(today_jst, "%Y-%m-%d").date())
+    all_rows, seen_dates, fetch_stats, bad = fetch_universe(tickers, args, last=last, since=since)
+    print(f"fetch: {fetch_stats}")
+    for t, err in bad.items():
+        quarantine_add(quarantine, t.replace(".T", ""), err, today_jst)
+    if bad:
+        print(f"quarantined: {', '.join(sorted(bad))}", file=sys.stderr)
+    save_quarantine(quarantine)
+
+    coverage = {
+        "requested": len(universe),
+        "fetched": len(all_rows),
+        "quarantined": len(universe) - len(tickers) + len(bad),
+        "quarantined_new": sorted(t.replace(".T", "") for t in bad),
+        "missing": len(tickers) - len(all_rows) - len(bad),
+        "extra_requests": fetch_stats["extra_requests"],
+    }
+    print(f"coverage: {coverage}")
 
     if not all_rows or not seen_dates:
         print("ERROR: no data", file=sys.stderr)
@@ -181,63 +453,21 @@ def main():
         date_str = max_date.strftime("%Y-%m-%d")
 
     outdir = ensure_out(date_str)
-
-    # 랭킹 계산
-    rows_has_dv = [r for r in all_rows if r.get("dollar_volume") is not None]
-    rows_by_dv = sorted(rows_has_dv, key=lambda x: x["dollar_volume"], reverse=True)
-
-    top600 = rows_by_dv[:600]
-    top10_dv = top600[:10]
-
-    top10_vol = sorted(
-        [r for r in all_rows if r.get("volume") is not None],
-        key=lambda x: x["volume"],
-        reverse=True
-    )[:10]
-
-    pool_ge = [
-        r for r in all_rows
-        if r.get("close") is not None and r["close"] >= MIN_PRICE_JPY
-        and r.get("pct_change") is not None
-    ]
-    top10_gainers = sorted(pool_ge, key=lambda x: x["pct_change"], reverse=True)[:10]
-    top10_losers  = sorted(pool_ge, key=lambda x: x["pct_change"])[:10]
-
-    # CSV 출력
-    cols = ["ticker", "open", "close", "volume", "dollar_volume", "pct_change"]
-    write_csv(outdir / "universe_top600_by_dollar.csv", top600, cols)
-    write_csv(outdir / "top10_dollar_value.csv", top10_dv, cols)
-    write_csv(outdir / "top10_volume.csv",        top10_vol, cols)
-    write_csv(outdir / "top10_gainers_ge_minprice.csv", top10_gainers, cols)
-    write_csv(outdir / "top10_losers_ge_minprice.csv",  top10_losers,  cols)
-
-    bundle = {
-        "date": date_str,
-        "market": "JP",
-        "currency": "JPY",
-        "params": {
-            "min_price_jpy": MIN_PRICE_JPY,
-            "batch": BATCH,
-        },
-        "counts": {
-            "universe_total": len(all_rows),
-            "universe_top600_by_dollar": len(top600),
-        },
-        "lists": {
-            "universe_top600_by_dollar": top600,
-            "top10_dollar_value": top10_dv,
-            "top10_volume": top10_vol,
-            # US와 키 호환을 위해 이름 유지
-            "top10_gainers_ge10": top10_gainers,
-            "top10_losers_ge10":  top10_losers,
-        },
-        "source_note": "Prices/Volumes via yfinance JP (.T). dollar_volume means JPY not USD.",
-    }
-
-    (outdir / "bundle.json").write_text(
-        json.dumps(bundle, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    refs = split_last_close(all_rows)
+    lists = build_lists(all_rows)
+    extra = {"fetch_stats": fetch_stats, "coverage": coverage}
+    # 테마별 집계는 전 종목 기준 (top600 밖 중소형도 테마 breadth 에 포함). 실패해도 번들은 기록
+    # (theme_stats 가 없으면 요약기가 top600 으로 계산)
+    try:
+        extra["theme_stats"] = {"scope": "universe", "rows": len(all_rows),
+                                "themes": aggregate_themes(all_rows, ThemeIndex.open())}
+    except Exception as e:
+        print(f"WARN: theme stats unavailable ({e})", file=sys.stderr)
+    write_outputs(outdir, date_str, len(all_rows), lists, extra=extra)
+    store.append(date_str, union_rows(lists.values()), meta={"total_rows": len(all_rows)})
+    rolling.advance(store)      # 롤링 지표: 새 날짜만 O(1)/종목 반영
+    last.update(refs)
+    last.save()
 
     print(f"Wrote {outdir.resolve()}")
 
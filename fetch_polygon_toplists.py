@@ -1,24 +1,193 @@
 #!/usr/bin/env python3
-import os, sys, json, argparse, datetime as dt, csv, urllib.request
+import os, sys, json, time, argparse, datetime as dt, csv, urllib.request, urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-URL = "https://api.polygon.io/v2/aggs/grouped/locale/us/market/stocks/{date}?adjusted=true&include_otc=false&apiKey={key}"
+import numpy as np
+
+from ranking import RankSpec, rank_columns
+from history_store import HistoryStore, COLUMNS, save_universe, universe_path, UNIVERSE_FIELDS
+import rolling
+
+from json_stream import ArrayStream
+from response_cache import ResponseCache, cache_key
+from throttle import TokenBucket
+
+BASE_URL = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io")
+URL = BASE_URL + "/v2/aggs/grouped/locale/us/market/stocks/{date}?adjusted=true&include_otc=false&apiKey={key}"
+BLOCK = 8192  # 스트리밍 ingest 시 한 번에 컬럼화하는 레코드 수
 
 def prev_us_weekday(d: dt.date) -> dt.date:
     while d.weekday() >= 5: d -= dt.timedelta(days=1)
     return d
 
-def fetch(date_str: str, key: str):
-    with urllib.request.urlopen(URL.format(date=date_str, key=key), timeout=60) as r:
-        data = json.loads(r.read().decode("utf-8"))
-    if data.get("status") != "OK":
-        raise RuntimeError(f"Polygon non-OK: {data}")
-    return data.get("results") or []
+# NYSE 임시 휴장(추도일 등)
+SPECIAL_CLOSURES = {dt.date(2018,12,5), dt.date(2025,1,9)}
+
+def _nth_weekday(y, m, wd, n):
+    d = dt.date(y, m, 1)
+    d += dt.timedelta(days=(wd - d.weekday()) % 7)
+    return d + dt.timedelta(weeks=n-1)
+
+def _last_weekday(y, m, wd):
+    d = dt.date(y, m+1, 1) - dt.timedelta(days=1) if m < 12 else dt.date(y, 12, 31)
+    return d - dt.timedelta(days=(d.weekday() - wd) % 7)
+
+def _easter(y):
+    a, b, c = y % 19, y // 100, y % 100
+    d, e = b // 4, b % 4
+    g = (8*b + 13) // 25
+    h = (19*a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2*e + 2*i - h - k) % 7
+    m = (a + 11*h + 19*l) // 433
+    return dt.date(y, (h + l - 7*m + 90) // 25, (h + l - 7*m + 33*((h + l - 7*m + 90) // 25) + 19) % 32)
+
+def _observed(d):
+    return d - dt.timedelta(days=1) if d.weekday() == 5 else d + dt.timedelta(days=1) if d.weekday() == 6 else d
+
+def us_market_holidays(y: int) -> set:
+    """NYSE 정규 휴장일 (관측일 규칙 포함). 토요일 신정은 전년 12/31 로 당기지 않는다."""
+    h = {
+        _nth_weekday(y, 1, 0, 3),            # MLK
+        _nth_weekday(y, 2, 0, 3),            # Presidents
+        _easter(y) - dt.timedelta(days=2),   # Good Friday
+        _last_weekday(y, 5, 0),              # Memorial
+        _observed(dt.date(y, 7, 4)),
+        _nth_weekday(y, 9, 0, 1),            # Labor
+        _nth_weekday(y, 11, 3, 4),           # Thanksgiving
+        _observed(dt.date(y, 12, 25)),
+    }
+    ny = dt.date(y, 1, 1)
+    if ny.weekday() != 5: h.add(_observed(ny))
+    if y >= 2022: h.add(_observed(dt.date(y, 6, 19)))  # Juneteenth
+    return {d for d in h if d.year == y} | {d for d in SPECIAL_CLOSURES if d.year == y}
+
+def is_us_session(d: dt.date) -> bool:
+    return d.weekday() < 5 and d not in us_market_holidays(d.year)
+
+def prev_us_session(d: dt.date) -> dt.date:
+    while not is_us_session(d): d -= dt.timedelta(days=1)
+    return d
+
+def us_sessions(start: dt.date, end: dt.date):
+    d, out = start, []
+    while d <= end:
+        if is_us_session(d): out.append(d)
+        d += dt.timedelta(days=1)
+    return out
+
+def iter_grouped(fp):
+    """응답 바이트 스트림 → results 레코드를 하나씩 yield. 끝까지 읽은 뒤 status 확인."""
+    s = ArrayStream(fp, "results")
+    yield from s
+    if s.header.get("status") != "OK":
+        raise RuntimeError(f"Polygon non-OK: {s.header}")
+
+class _Tee:
+    """HTTP 본문을 읽는 대로 캐시 writer 에도 복사."""
+    def __init__(self, src, sink): self.src, self.sink = src, sink
+    def read(self, n=-1):
+        data = self.src.read(n)
+        if data: self.sink.write(data)
+        return data
+
+def url_cache_key(url: str) -> str:
+    """apiKey 를 뺀 URL 기준 키 (키 교체와 무관하게 같은 응답을 공유)."""
+    u = urllib.parse.urlsplit(url)
+    q = [(k, v) for k, v in urllib.parse.parse_qsl(u.query) if k.lower() != "apikey"]
+    return cache_key(urllib.parse.urlunsplit(u._replace(query=urllib.parse.urlencode(q))))
+
+def fetch(date_str: str, key: str, src: str = None, cache: ResponseCache = None, mode: str = "default",
+          limiter: TokenBucket = None):
+    """
+    grouped 레코드를 하나씩 yield.
+    - src: 로컬 파일(녹화된 응답)에서 읽기
+    - cache: mode="default" 면 유효 캐시 우선, "refresh" 면 무시하고 재다운로드,
+             "offline" 이면 캐시만 사용 (없으면 에러)
+    - 다운로드 본문은 스트리밍 파싱과 동시에 캐시에 기록, status OK + 행 있음일 때만 확정
+    - limiter: 실제 네트워크 요청 직전에만 토큰 소비 (캐시 적중은 무료)
+    """
+    if src:
+        with open(src, "rb") as fp:
+            yield from iter_grouped(fp)
+        return
+    url = URL.format(date=date_str, key=key or "")
+    ck = url_cache_key(url) if cache else None
+    if cache and mode != "refresh" and cache.meta(ck) is not None:
+        with cache.open(ck) as fp:
+            yield from iter_grouped(fp)
+        return
+    if mode == "offline":
+        raise RuntimeError(f"offline: no cached Polygon response for {date_str}")
+    if limiter: limiter.acquire()
+    with urllib.request.urlopen(url, timeout=60) as r:
+        if not cache:
+            yield from iter_grouped(r)
+            return
+        with cache.writer(ck, date=date_str) as w:
+            n = 0
+            for rec in iter_grouped(_Tee(r, w)):
+                n += 1
+                yield rec
+            if n:
+                w.commit(rows=n)
 
 def f(x):
     try: return float(x)
     except: return None
 
+def _col(raw, k):
+    """results 의 필드 하나를 float64 배열로 (None → NaN). 숫자가 아닌 값이 섞이면 f() 로 폴백."""
+    vals = [r.get(k) for r in raw]
+    try: return np.fromiter(vals, dtype=np.float64, count=len(vals))
+    except (TypeError, ValueError): pass
+    try: return np.array(vals, dtype=np.float64)
+    except (TypeError, ValueError): return np.array([f(x) for x in vals], dtype=np.float64)
+
+def read_columns(records, fields=("o","c","vw","v"), block=BLOCK) -> dict:
+    """
+    레코드 iterable → {"T": object 배열, 필드: float64 배열} (필터 전 원본).
+    block 개씩 모아 컬럼화하므로 dict 는 최대 block 개만 동시에 살아 있다.
+    """
+    parts = {k: [] for k in ("T",) + tuple(fields)}
+    buf = []
+    def flush():
+        parts["T"].append(np.array([r.get("T") or "" for r in buf], dtype=object))
+        for k in fields: parts[k].append(_col(buf, k))
+        buf.clear()
+    for r in records:
+        buf.append(r)
+        if len(buf) >= block: flush()
+    if buf or not parts["T"]: flush()
+    return {k: np.concatenate(v) for k, v in parts.items()}
+
+def normalize(raw:dict) -> dict:
+    """원본 컬럼 → 유효 행만 남긴 타입 컬럼 dict (dv/pct 는 배열 연산)."""
+    T, o, c, vw, v = raw["T"], raw["o"], raw["c"], raw["vw"], raw["v"]
+    ok = (T != "") & np.isfinite(o) & np.isfinite(c) & np.isfinite(v)
+    T, o, c, vw, v = T[ok], o[ok], c[ok], vw[ok], v[ok]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dv = v * np.where(vw > 0, vw, c)
+        pct = np.where(o > 0, (c - o) / o, np.nan)
+    return {"ticker":T,"open":o,"close":c,"vwap":vw,"volume":v,"dollar_volume":dv,"pct_change":pct}
+
+def ingest_grouped(records, block=BLOCK) -> dict:
+    """grouped 응답 results(list 또는 스트림) → 타입 컬럼 dict."""
+    return normalize(read_columns(records, block=block))
+
+def to_rows(cols:dict, idx, dstr:str):
+    """선택된 행 인덱스 → 번들용 dict 리스트 (NaN → None)."""
+    vals = {k: cols[k][idx].tolist() for k in COLUMNS}
+    rows = []
+    for i, t in enumerate(cols["ticker"][idx].tolist()):
+        r = {"ticker": t}
+        for k in COLUMNS:
+            x = vals[k][i]; r[k] = None if x != x else x
+        r["date"] = dstr
+        rows.append(r)
+    return rows
+
 def ensure_out(date_str:str)->Path:
     p = Path("out")/date_str
     p.mkdir(parents=True, exist_ok=True)
@@ -29,49 +198,163 @@ def write_csv(p:Path, rows, cols):
         w = csv.DictWriter(f, fieldnames=cols); w.writeheader()
         for r in rows: w.writerow({k:r.get(k) for k in cols})
 
+COLS = ["ticker","open","close","vwap","volume","dollar_volume","pct_change","date"]
+
+def _ge10(c): return c["close"] >= 10
+
+RANK_SPECS = [
+    RankSpec("universe_top600_by_dollar", "dollar_volume", None, 600, "desc"),
+    RankSpec("top10_dollar_value", "dollar_volume", None, 10, "desc"),
+    RankSpec("top10_volume", "volume", None, 10, "desc"),
+    RankSpec("top10_gainers_ge10", "pct_change", _ge10, 10, "desc"),
+    RankSpec("top10_losers_ge10", "pct_change", _ge10, 10, "asc"),
+]
+
+def build_lists(cols:dict, dstr:str):
+    """RANK_SPECS → (번들 리스트 dict, 리스트에 등장한 행 인덱스 합집합)."""
+    ranked = rank_columns(cols, RANK_SPECS)
+    lists = {name: to_rows(cols, idx, dstr) for name, idx in ranked.items()}
+    keep = np.array(list(dict.fromkeys(np.concatenate(list(ranked.values())).tolist())), dtype=np.intp)
+    return lists, keep
+
+def write_outputs(outdir:Path, dstr:str, total_rows:int, lists:dict):
+    write_csv(outdir/"universe_top600_by_dollar.csv", lists["universe_top600_by_dollar"], COLS)
+    write_csv(outdir/"top10_dollar_value.csv", lists["top10_dollar_value"], COLS)
+    write_csv(outdir/"top10_volume.csv", lists["top10_volume"], COLS)
+    write_csv(outdir/"top10_gainers_ge10.csv", lists["top10_gainers_ge10"], COLS)
+    write_csv(outdir/"top10_losers_ge10.csv", lists["top10_losers_ge10"], COLS)
+
+    bundle={"date":dstr,"counts":{"total_rows":total_rows,"universe_top600_by_dollar":len(lists["universe_top600_by_dollar"])},
+            "lists":lists}
+    (outdir/"bundle.json").write_text(json.dumps(bundle,ensure_ascii=False,indent=2), encoding="utf-8")
+
+def columns_from_history(store:HistoryStore, dstr:str):
+    d = store.load(dstr)
+    cols = {k: np.asarray(d[k]) for k in COLUMNS}
+    cols["ticker"] = store.symbol_array()[np.asarray(d["ticker_id"])]
+    return cols, store.meta(dstr).get("total_rows") or len(cols["ticker"])
+
+def run_date(dstr:str, key:str, args, store:HistoryStore, cache:ResponseCache, mode:str,
+             limiter:TokenBucket = None, append=None) -> Path:
+    """
+    하루치 수집 → CSV/bundle + 히스토리 저장. 반환: 출력 디렉터리.
+    append: store.append_columns 대신 부를 함수 (백필은 날짜순으로 모아서 저장)
+    """
+    fields = tuple(UNIVERSE_FIELDS) if args.keep_universe else ("o","c","vw","v")
+    raw = read_columns(fetch(dstr, key, args.from_file, cache, mode, limiter), fields)
+    cols = normalize(raw)
+    n = len(cols["ticker"])
+    if not n: raise RuntimeError(f"No rows from Polygon for {dstr}")
+
+    outdir = ensure_out(dstr)
+    lists, keep = build_lists(cols, dstr)
+    write_outputs(outdir, dstr, n, lists)
+    # 리스트 합집합만 저장해도 번들 재생성 가능 (history_store 참고)
+    (append or store.append_columns)(dstr, cols["ticker"][keep].tolist(), {k: cols[k][keep] for k in COLUMNS},
+                                     meta={"total_rows": n})
+    if args.keep_universe:
+        has_t = raw["T"] != ""
+        p = save_universe(universe_path("us", dstr), raw["T"][has_t].tolist(),
+                          {name: raw[k][has_t] for k, name in UNIVERSE_FIELDS.items()})
+        print(f"Wrote {p} ({p.stat().st_size//1024} KB)")
+    return outdir
+
+def backfill(dates, key, args, store, cache, mode):
+    """
+    여러 날짜를 bounded 워커 풀로 동시 수집. 토큰 버킷으로 분당 요청 수 상한 준수.
+    이미 bundle.json 이 있는 날은 건너뜀(--refresh 제외) → 중단 후 재실행하면 이어서 진행.
+    히스토리 저장은 완료 순서가 아니라 날짜순: 앞 날짜가 모두 끝난 날만 저장소 끝에 붙임
+    (중간 날짜가 늦게 끝나 끼워 넣으면 저장소 전체를 다시 씀)
+    """
+    todo = [d for d in dates if args.refresh or not (Path("out")/d/"bundle.json").exists()]
+    print(f"backfill: {len(dates)} session(s), {len(dates)-len(todo)} done, {len(todo)} to fetch "
+          f"(workers={args.workers}, rpm={args.rpm})")
+    limiter = TokenBucket(args.rpm, burst=args.burst)
+    failed = []
+    ready = {}                      # 완료됐지만 앞 날짜를 기다리는 날 → append_columns 인자
+    order, nxt = sorted(todo), 0
+    hold = lambda dstr, *a, **kw: ready.__setitem__(dstr, (a, kw))
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futs = {ex.submit(run_date, d, key, args, store, cache, mode, limiter, hold): d for d in todo}
+        for i, fut in enumerate(as_completed(futs), 1):
+            d = futs[fut]
+            try:
+                fut.result()
+                print(f"[{i}/{len(todo)}] {d} ok ({time.monotonic()-t0:.0f}s)")
+            except Exception as e:
+                failed.append(d)
+                print(f"[{i}/{len(todo)}] {d} FAILED: {e}", file=sys.stderr)
+            while nxt < len(order) and (order[nxt] in ready or order[nxt] in failed):
+                d, nxt = order[nxt], nxt + 1
+                if d not in ready:
+                    continue
+                a, kw = ready.pop(d)
+                try:
+                    store.append_columns(d, *a, **kw)
+                except Exception as e:
+                    failed.append(d)
+                    print(f"{d} history append FAILED: {e}", file=sys.stderr)
+    if failed:
+        print(f"backfill: {len(failed)} failed: {' '.join(sorted(failed))}", file=sys.stderr)
+    return failed
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--date", default=None)
+    ap.add_argument("--start", default=None, help="백필 시작일 (YYYY-MM-DD, 주말/휴장일 제외)")
+    ap.add_argument("--end", default=None, help="백필 종료일 (기본: 직전 거래일)")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("POLYGON_WORKERS", "4")))
+    ap.add_argument("--rpm", type=float, default=float(os.getenv("POLYGON_RPM", "5")),
+                    help="분당 요청 상한 (Polygon 플랜에 맞게)")
+    ap.add_argument("--burst", type=int, default=int(os.getenv("POLYGON_BURST", "1")))
+    ap.add_argument("--history-dir", default=os.getenv("HISTORY_DIR", "data/history"))
+    ap.add_argument("--from-history", action="store_true",
+                    help="API 대신 히스토리 저장소에서 --date 의 bundle/CSV 재생성")
+    ap.add_argument("--keep-universe", action="store_true", default=os.getenv("KEEP_UNIVERSE") == "1",
+                    help="전체 grouped 유니버스를 data/universe/us/{date}.npz 로 압축 저장")
+    ap.add_argument("--from-file", default=None,
+                    help="API 대신 녹화된 grouped 응답 JSON 파일에서 읽기 (테스트/재처리용)")
+    ap.add_argument("--cache-dir", default=os.getenv("POLYGON_CACHE_DIR", ".cache/polygon"))
+    ap.add_argument("--cache-ttl-hours", type=float, default=float(os.getenv("POLYGON_CACHE_TTL_HOURS", "720")))
+    ap.add_argument("--cache-max-mb", type=float, default=float(os.getenv("POLYGON_CACHE_MAX_MB", "1024")))
+    g = ap.add_mutually_exclusive_group()
+    g.add_argument("--offline", action="store_true", help="캐시된 응답만 사용 (네트워크 없음)")
+    g.add_argument("--refresh", action="store_true", help="캐시를 무시하고 다시 받아 갱신")
+    g.add_argument("--no-cache", action="store_true")
     args = ap.parse_args()
 
+    store = HistoryStore("us", Path(args.history_dir))
+    if args.from_history:
+        if not args.date:
+            print("ERROR: --from-history requires --date", file=sys.stderr); sys.exit(2)
+        cols, total = columns_from_history(store, args.date)
+        outdir = ensure_out(args.date)
+        write_outputs(outdir, args.date, total, build_lists(cols, args.date)[0])
+        print(f"Wrote {outdir.resolve()} (from history)")
+        return
+
     key = os.getenv("POLYGON_API_KEY")
-    if not key:
+    if not key and not (args.from_file or args.offline):
         print("ERROR: set POLYGON_API_KEY", file=sys.stderr); sys.exit(2)
 
-    target = dt.datetime.strptime(args.date, "%Y-%m-%d").date() if args.date \
-             else prev_us_weekday(dt.date.today() - dt.timedelta(days=1))
-    dstr = target.strftime("%Y-%m-%d")
-    outdir = ensure_out(dstr)
+    cache = None if args.no_cache else ResponseCache(
+        args.cache_dir, ttl=args.cache_ttl_hours * 3600, max_bytes=int(args.cache_max_mb * 2**20))
+    mode = "offline" if args.offline else "refresh" if args.refresh else "default"
+    parse = lambda s: dt.datetime.strptime(s, "%Y-%m-%d").date()
 
-    raw = fetch(dstr, key)
-    rows=[]
-    for r in raw:
-        T=r.get("T"); v=f(r.get("v")); vw=f(r.get("vw")); c=f(r.get("c")); o=f(r.get("o"))
-        if not T or v is None or c is None or o is None: continue
-        dv = v*(vw if (vw and vw>0) else c)
-        pct = (c-o)/o if o>0 else None
-        rows.append({"ticker":T,"open":o,"close":c,"vwap":vw,"volume":v,"dollar_volume":dv,"pct_change":pct,"date":dstr})
-    if not rows: raise RuntimeError("No rows from Polygon")
-
-    rows_by_dv = sorted([r for r in rows if r["dollar_volume"] is not None], key=lambda x:x["dollar_volume"], reverse=True)
-    top600 = rows_by_dv[:600]
-    top10_dv = top600[:10]
-    top10_vol = sorted(rows, key=lambda x:x["volume"] if x["volume"] is not None else -1, reverse=True)[:10]
-    pool_ge10 = [r for r in rows if r["close"] is not None and r["close"]>=10 and r["pct_change"] is not None]
-    top10_g = sorted(pool_ge10, key=lambda x:x["pct_change"], reverse=True)[:10]
-    top10_l = sorted(pool_ge10, key=lambda x:x["pct_change"])[:10]
-
-    cols = ["ticker","open","close","vwap","volume","dollar_volume","pct_change","date"]
-    write_csv(outdir/"universe_top600_by_dollar.csv", top600, cols)
-    write_csv(outdir/"top10_dollar_value.csv", top10_dv, cols)
-    write_csv(outdir/"top10_volume.csv", top10_vol, cols)
-    write_csv(outdir/"top10_gainers_ge10.csv", top10_g, cols)
-    write_csv(outdir/"top10_losers_ge10.csv", top10_l, cols)
-
-    bundle={"date":dstr,"counts":{"total_rows":len(rows),"universe_top600_by_dollar":len(top600)},
-            "lists":{"universe_top600_by_dollar":top600,"top10_dollar_value":top10_dv,
-                     "top10_volume":top10_vol,"top10_gainers_ge10":top10_g,"top10_losers_ge10":top10_l}}
-    (outdir/"bundle.json").write_text(json.dumps(bundle,ensure_ascii=False,indent=2), encoding="utf-8")
+    if args.start:
+        if args.from_file:
+            print("ERROR: --from-file cannot be combined with --start", file=sys.stderr); sys.exit(2)
+        end = parse(args.end) if args.end else prev_us_session(dt.date.today() - dt.timedelta(days=1))
+        dates = [d.strftime("%Y-%m-%d") for d in us_sessions(parse(args.start), end)]
+        failed = backfill(dates, key, args, store, cache, mode)
+        rolling.advance(store)
+        sys.exit(1 if failed else 0)
+
+    target = parse(args.date) if args.date else prev_us_session(dt.date.today() - dt.timedelta(days=1))
+    outdir = run_date(target.strftime("%Y-%m-%d"), key, args, store, cache, mode)
+    rolling.advance(store)      # 롤링 지표: 새 날짜만 O(1)/종목 반영
     print(f"Wrote {outdir.resolve()}")
 
 if __name__=="__main__": main()
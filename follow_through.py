@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+전일 top 리스트의 후속 성과 (follow-through)
+- 대상 리스트: top10_gainers_ge10 / top10_losers_ge10 / top10_volume
+  멤버는 게시된 번들(public/daily/{date}.json, public/jpx/daily/{date}.json)에서 읽어
+  HistoryStore ticker id 로 바꿔 상태에 저장 (번들당 한 번만 파싱)
+- 조인: 날짜마다 id → 행 위치 직접 주소 테이블(pos[id]) 을 한 번 만들고
+  멤버 id 배열로 gather → 정수 키 해시 조인과 같고 비용 ∝ 그날 행 수 + 멤버 수
+- 선행 수익률: h 세션 뒤(저장소 날짜 순서) 종가 / 리스트 당일 종가 - 1
+  h 세션 뒤 날짜에 그 종목 행이 없으면 미커버 (저장소는 리스트 합집합만 보관 →
+  data/universe/{market}/{date}.npz 전체 유니버스가 있으면 그쪽도 조인)
+  종가 비율이 1/SPLIT 미만 또는 SPLIT 배 초과면 분할/병합 가능성이 커서 미커버로 취급
+- 방향: gainers = +1, losers = -1, volume = 리스트 당일 등락 부호
+    continuation = 선행 수익률 부호 == 방향, reversal = 반대 부호
+- 기록 단위 (리스트 날짜, 리스트, h) = [멤버 수, 커버 수, 지속, 반전, 선행 수익률 합]
+  h 세션 뒤 날짜가 생겼을 때 한 번 계산하고 이후 재사용 → 새 날짜마다 증분
+  과거 날짜가 바뀌었으면(저장소 지문 불일치) 처음부터 재계산
+- 상태: data/history/{market}/follow_through.json
+    python follow_through.py --market us                 # 갱신 + 누적 요약
+    python follow_through.py --market us --days 5        # 최근 5개 리스트 날짜별
+"""
+
+import os, sys, json, argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from history_store import HistoryStore, DEFAULT_ROOT, UNIVERSE_ROOT, load_universe, universe_path
+
+LISTS = ("top10_gainers_ge10", "top10_losers_ge10", "top10_volume")
+DIRECTION = {"top10_gainers_ge10": 1, "top10_losers_ge10": -1}     # 없으면 당일 등락 부호
+HORIZONS = (1, 5)
+SPLIT = 3.0
+BUNDLE_DIRS = {"us": Path("public/daily"), "jpx": Path("public/jpx/daily")}
+N, COVERED, CONT, REV, SUM = range(5)
+
+
+class DayIndex:
+    """저장소 하루치 (+ 있으면 전체 유니버스) 의 id → (종가, 등락률) 직접 주소 조인."""
+
+    def __init__(self, store: HistoryStore, date_str: str, universe_root: Optional[Path] = UNIVERSE_ROOT):
+        d = store.load(date_str, ("close", "pct_change"))
+        ids = [np.asarray(d["ticker_id"])]
+        close, pct = [np.asarray(d["close"])], [np.asarray(d["pct_change"])]
+        up = universe_path(store.market, date_str, universe_root) if universe_root else None
+        if up is not None and up.exists():
+            u = load_universe(up)
+            uid = store.ids_for(u["ticker"].tolist())
+            ok = uid >= 0                               # 리스트에 한 번도 안 나온 종목은 조인 대상이 아님
+            ids.insert(0, uid[ok]); close.insert(0, u["close"][ok]); pct.insert(0, u["pct_change"][ok])
+        self.ids = np.concatenate(ids)
+        self.close, self.pct = np.concatenate(close), np.concatenate(pct)
+        self.pos = np.full(max(len(store.symbols()), 1), -1, dtype=np.int64)
+        self.pos[self.ids] = np.arange(len(self.ids))    # 뒤(저장소 행)가 앞(유니버스)을 덮어씀
+
+    def take(self, ids: np.ndarray):
+        """멤버 id → (종가, 등락률). 없는 종목은 NaN."""
+        p = self.pos[ids] if len(ids) else np.zeros(0, dtype=np.int64)
+        has = p >= 0
+        close = np.where(has, self.close[np.where(has, p, 0)], np.nan)
+        pct = np.where(has, self.pct[np.where(has, p, 0)], np.nan)
+        return close, pct
+
+
+def bundle_members(path: Path, store: HistoryStore) -> Dict[str, List[int]]:
+    """번들 → 리스트별 멤버 ticker id (저장소에 없는 심볼은 제외)."""
+    lists = json.loads(Path(path).read_text(encoding="utf-8")).get("lists") or {}
+    out = {}
+    for name in LISTS:
+        ids = store.ids_for([r.get("ticker") for r in lists.get(name, [])])
+        out[name] = ids[ids >= 0].tolist()
+    return out
+
+
+def score(members: np.ndarray, base: DayIndex, target: DayIndex, direction: int) -> List[float]:
+    c0, p0 = base.take(members)
+    c1, _ = target.take(members)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fwd = c1 / c0 - 1.0
+    ok = np.isfinite(fwd) & (fwd > 1 / SPLIT - 1) & (fwd < SPLIT - 1)
+    d = np.full(len(members), float(direction)) if direction else np.sign(np.nan_to_num(p0))
+    s = np.sign(fwd[ok])
+    return [len(members), int(ok.sum()), int(((s != 0) & (s == d[ok])).sum()),
+            int(((s != 0) & (s == -d[ok])).sum()), float(fwd[ok].sum())]
+
+
+class FollowThrough:
+    def __init__(self, store: HistoryStore, bundle_dir: Optional[Path] = None,
+                 universe_root: Optional[Path] = UNIVERSE_ROOT):
+        self.store = store
+        self.bundle_dir = Path(bundle_dir) if bundle_dir else BUNDLE_DIRS.get(store.market, Path("public/daily"))
+        self.universe_root = universe_root
+        self.path = store.dir / "follow_through.json"
+        self.state = {"fingerprint": "", "days": 0, "members": {}, "records": {}}
+        if self.path.exists():
+            try:
+                self.state.update(json.loads(self.path.read_text(encoding="utf-8")))
+            except ValueError as e:
+                print(f"WARN: follow_through state unreadable, rebuilding ({e})", file=sys.stderr)
+
+    def members(self, date_str: str) -> Optional[Dict[str, List[int]]]:
+        m = self.state["members"].get(date_str)
+        if m is None:
+            p = self.bundle_dir / f"{date_str}.json"
+            if not p.exists():
+                return None
+            m = self.state["members"][date_str] = bundle_members(p, self.store)
+        return m
+
+    def advance(self, save: bool = True) -> int:
+        """새로 계산 가능해진 (리스트 날짜, h) 만 계산. 반환: 새로 기록한 개수."""
+        st, store = self.state, self.store
+        dates = store.dates()
+        done = st["days"]
+        if done > len(dates) or store.fingerprint(done) != st["fingerprint"]:
+            st.update(members={}, records={})
+        days: Dict[int, DayIndex] = {}
+
+        def day(i: int) -> DayIndex:
+            if i not in days:
+                days[i] = DayIndex(store, dates[i], self.universe_root)
+            return days[i]
+
+        added = 0
+        for i, dstr in enumerate(dates):
+            todo = [h for h in HORIZONS if i + h < len(dates) and f"{dstr}|{h}" not in st["records"]]
+            if not todo:
+                continue
+            mem = self.members(dstr)
+            if mem is None:
+                continue
+            for h in todo:
+                st["records"][f"{dstr}|{h}"] = {
+                    name: score(np.asarray(mem.get(name, []), dtype=np.int64), day(i), day(i + h),
+                                DIRECTION.get(name, 0))
+                    for name in LISTS}
+                added += 1
+        st["days"], st["fingerprint"] = len(dates), store.fingerprint()
+        if save and (added or not self.path.exists()):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(st, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, self.path)
+        return added
+
+    def report(self, h: int = 1, last: Optional[int] = None, upto: Optional[str] = None) -> List[dict]:
+        """
+        리스트별 누적 (upto 이하 날짜가 결과일인 기록, last 면 최근 last 개 리스트 날짜만).
+        행: list, h, days, n, covered, cont_rate, rev_rate, avg_fwd, last_date, last_* (가장 최근 하루)
+        """
+        dates = self.store.dates()
+        pos = {d: i for i, d in enumerate(dates)}
+        keys = sorted(k for k in self.state["records"] if k.endswith(f"|{h}") and k.split("|")[0] in pos
+                      and (upto is None or dates[pos[k.split("|")[0]] + h] <= upto))
+        if last:
+            keys = keys[-last:]
+        out = []
+        for name in LISTS:
+            recs = np.asarray([self.state["records"][k][name] for k in keys], dtype=np.float64).reshape(-1, 5)
+            tot = recs.sum(axis=0)
+            row = {"list": name, "h": h, "days": len(keys), "n": int(tot[N]), "covered": int(tot[COVERED])}
+            row.update(_rates(tot))
+            if keys:
+                row["last_date"] = keys[-1].split("|")[0]
+                row.update({f"last_{k}": v for k, v in _rates(recs[-1]).items()})
+            out.append(row)
+        return out
+
+    def daily(self, h: int = 1, last: int = 5) -> List[dict]:
+        """최근 last 개 리스트 날짜의 날짜별 기록."""
+        keys = sorted(k for k in self.state["records"] if k.endswith(f"|{h}"))[-last:]
+        return [dict(date=k.split("|")[0], list=name, n=int(r[N]), covered=int(r[COVERED]),
+                     **_rates(np.asarray(r, dtype=np.float64)))
+                for k in keys for name, r in self.state["records"][k].items()]
+
+
+def _rates(r: np.ndarray) -> dict:
+    cov = r[COVERED]
+    if not cov:
+        return {"cont_rate": None, "rev_rate": None, "avg_fwd": None}
+    return {"cont_rate": float(r[CONT] / cov), "rev_rate": float(r[REV] / cov), "avg_fwd": float(r[SUM] / cov)}
+
+
+def lookup(market: str, date_str: str, root: Path = DEFAULT_ROOT, bundle_dir: Optional[Path] = None,
+           horizons: Sequence[int] = HORIZONS) -> Optional[List[dict]]:
+    """
+    요약기용: 상태를 갱신하고 date_str 까지의 누적 + 결과일이 date_str 인 하루치 (리스트 × h 행).
+    저장소에 date_str 가 없으면 None.
+    """
+    store = HistoryStore(market, root)
+    if not (store.dir / "index.json").exists() or not store.has(date_str):
+        return None
+    try:
+        ft = FollowThrough(store, bundle_dir)
+        ft.advance()
+    except Exception as e:
+        print(f"WARN: follow-through unavailable ({e})", file=sys.stderr)
+        return None
+    dates = store.dates()
+    i = dates.index(date_str)
+    rows = []
+    for h in horizons:
+        for r in ft.report(h, upto=date_str):
+            if not r["days"]:
+                continue
+            today = r.get("last_date") == (dates[i - h] if i >= h else None)
+            rows.append({k: v for k, v in r.items() if today or not k.startswith("last_")})
+    return rows or None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--market", default="us")
+    ap.add_argument("--history-dir", default=str(DEFAULT_ROOT))
+    ap.add_argument("--bundle-dir", default=None, help="게시 번들 디렉터리 (기본: public/daily, public/jpx/daily)")
+    ap.add_argument("--rebuild", action="store_true")
+    ap.add_argument("--days", type=int, default=0, help="최근 N 개 리스트 날짜별 기록 출력")
+    args = ap.parse_args()
+
+    store = HistoryStore(args.market, Path(args.history_dir))
+    ft = FollowThrough(store, args.bundle_dir)
+    if args.rebuild and ft.path.exists():
+        ft.path.unlink()
+        ft = FollowThrough(store, args.bundle_dir)
+    added = ft.advance()
+    print(f"{ft.path}: +{added} record(s), {len(ft.state['records'])} total")
+    pct = lambda x: "" if x is None else f"{x * 100:.1f}%"
+    print("list,h,days,covered/n,cont,rev,avg_fwd")
+    for h in HORIZONS:
+        for r in ft.report(h):
+            print(f"{r['list']},{h},{r['days']},{r['covered']}/{r['n']},{pct(r['cont_rate'])},"
+                  f"{pct(r['rev_rate'])},{pct(r['avg_fwd'])}")
+    if args.days:
+        print("date,list,covered/n,cont,rev,avg_fwd (h=1)")
+        for r in ft.daily(1, args.days):
+            print(f"{r['date']},{r['list']},{r['covered']}/{r['n']},{pct(r['cont_rate'])},"
+                  f"{pct(r['rev_rate'])},{pct(r['avg_fwd'])}")
+
+
+if __name__ == "__main__":
+    main()
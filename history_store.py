@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+일별 컬럼형 히스토리 저장소
+- 위치: data/history/{market}/
+    symbols.txt      : ticker id → 심볼 (줄 번호 = id, append-only)
+    ticker_id.i4     : int32 원시 배열 (모든 날짜 연속)
+    {column}.f8      : float64 원시 배열 (COLUMNS 각각 1파일)
+    index.json       : 날짜 파티션 목록 [{date, start, rows, total_rows, ...}]
+    series_ptr.i8    : 종목별 시계열 인덱스(CSR) — ticker id t 의 행은 series_row[ptr[t]:ptr[t+1]]
+    series_row.i4    : 전역 행 번호 (종목별로 날짜 오름차순), 새 날짜 append 시 정렬 없이 병합
+- 쓰기: 새 날짜는 파일 끝에 append, 과거 날짜 재작성/삽입 시에만 전체 재배치
+- 읽기: 컬럼 파일을 np.memmap 으로 한 번씩 열고 파티션은 슬라이스 → 1년치도 수 ms
+- 종목 시계열: series("MU") → CSR 로 그 종목 행 번호만 찾아 memmap 에서 gather
+  (전체 번들을 읽지 않음, 비용 ∝ 그 종목의 거래일 수)
+    python history_store.py series MU --market us --days 60
+- 저장 대상: 번들 리스트(top600 + top10 4종)의 합집합.
+  각 top 리스트는 전체 유니버스의 상위이므로 합집합에서 다시 랭킹해도 결과가 같다
+  → bundle.json / CSV 재생성 가능 (fetcher 의 --from-history)
+- 저장소는 캐시 취급: 커밋된 public/**/*.json 번들에서 언제든 재구축 가능
+    python history_store.py import public/daily/*.json --market us
+    python history_store.py info --market us
+- 전체 유니버스(옵션): data/universe/{market}/{YYYY-MM-DD}.npz
+    고정폭 수치 컬럼 + 사전 인코딩 ticker 컬럼, 압축 저장 (하루 ~300KB)
+    python history_store.py universe --date 2025-09-19 --top 1000 --min-price 5
+"""
+
+import os, sys, csv, json, hashlib, argparse, threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+COLUMNS = ("open", "close", "vwap", "volume", "dollar_volume", "pct_change")
+DEFAULT_ROOT = Path(os.getenv("HISTORY_DIR", "data/history"))
+UNIVERSE_ROOT = Path(os.getenv("UNIVERSE_DIR", "data/universe"))
+# Polygon grouped 응답 필드 → 컬럼명
+UNIVERSE_FIELDS = {"o": "open", "h": "high", "l": "low", "c": "close",
+                   "vw": "vwap", "v": "volume", "n": "transactions"}
+
+
+def _to_float(x) -> float:
+    try:
+        return float(x) if x is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _write_atomic(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class HistoryStore:
+    def __init__(self, market: str = "us", root: Path = DEFAULT_ROOT):
+        self.market = market
+        self.dir = Path(root) / market
+        self._lock = threading.RLock()
+        self._symbols: Optional[List[str]] = None
+        self._ids: Optional[Dict[str, int]] = None
+        self._parts_key = None          # index.json (mtime_ns, size) — 읽기 캐시 무효화용
+        self._parts_cache: Optional[list] = None
+        self._mm: Dict[tuple, object] = {}
+
+    # --------------------
+    # ticker 사전
+    # --------------------
+    def symbols(self) -> List[str]:
+        if self._symbols is None:
+            p = self.dir / "symbols.txt"
+            self._symbols = p.read_text(encoding="utf-8").split("\n")[:-1] if p.exists() else []
+            self._ids = {s: i for i, s in enumerate(self._symbols)}
+        return self._symbols
+
+    def ids_for(self, tickers: Iterable[str], create: bool = False) -> np.ndarray:
+        """심볼 → ticker id. create=False 면 미등록 심볼은 -1."""
+        with self._lock:
+            self.symbols()
+            new = []
+            out = []
+            for t in tickers:
+                i = self._ids.get(t)
+                if i is None:
+                    if not create:
+                        out.append(-1); continue
+                    i = len(self._symbols)
+                    self._symbols.append(t); self._ids[t] = i; new.append(t)
+                out.append(i)
+            if new:
+                self.dir.mkdir(parents=True, exist_ok=True)
+                with (self.dir / "symbols.txt").open("a", encoding="utf-8") as f:
+                    f.write("".join(s + "\n" for s in new))
+        return np.asarray(out, dtype=np.int32)
+
+    def symbol_array(self) -> np.ndarray:
+        return np.asarray(self.symbols(), dtype=object)
+
+    # --------------------
+    # 인덱스 / 파일
+    # --------------------
+    def _index(self) -> dict:
+        p = self.dir / "index.json"
+        if p.exists():
+            return json.loads(p.read_text(encoding="utf-8"))
+        return {"columns": list(COLUMNS), "parts": []}
+
+    def _files(self) -> Dict[str, Path]:
+        out = {"ticker_id": self.dir / "ticker_id.i4"}
+        out.update({c: self.dir / f"{c}.f8" for c in COLUMNS})
+        return out
+
+    @staticmethod
+    def _dtype(name: str):
+        return np.int32 if name == "ticker_id" else np.float64
+
+    def _memmap(self, name: str, total: int) -> np.ndarray:
+        if total == 0:
+            return np.zeros(0, dtype=self._dtype(name))
+        return np.memmap(self._files()[name], dtype=self._dtype(name), mode="r", shape=(total,))
+
+    def _parts(self) -> list:
+        """읽기용 파티션 목록 (index.json 이 바뀌지 않았으면 캐시)."""
+        p = self.dir / "index.json"
+        try:
+            st = p.stat()
+            key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return []
+        if key != self._parts_key:
+            self._parts_cache = self._index()["parts"]
+            self._parts_key = key
+            self._mm.clear()
+        return self._parts_cache
+
+    def _cached_memmap(self, name: str, total: int) -> np.ndarray:
+        k = (name, total)
+        if k not in self._mm:
+            self._mm[k] = self._memmap(name, total)
+        return self._mm[k]
+
+    # --------------------
+    # 쓰기
+    # --------------------
+    def append(self, date_str: str, rows: Sequence[dict], meta: Optional[dict] = None):
+        """하루치 행(dict) 저장. 같은 날짜가 이미 있으면 교체."""
+        tickers = [r["ticker"] for r in rows]
+        cols = {c: [r.get(c) for r in rows] for c in COLUMNS}
+        self.append_columns(date_str, tickers, cols, meta)
+
+    def append_columns(self, date_str: str, tickers: Sequence[str], cols: Dict[str, Sequence],
+                       meta: Optional[dict] = None):
+        n = len(tickers)
+        new = {"ticker_id": self.ids_for(tickers, create=True)}
+        for c in COLUMNS:
+            v = cols.get(c)
+            if v is None:
+                new[c] = np.full(n, np.nan)
+                continue
+            try:
+                new[c] = np.asarray(v, dtype=np.float64).reshape(n)
+            except (TypeError, ValueError):
+                new[c] = np.asarray([_to_float(x) for x in v], dtype=np.float64)
+
+        with self._lock:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            idx = self._index()
+            parts = idx["parts"]
+            total = sum(p["rows"] for p in parts)
+            part = {"date": date_str, "start": total, "rows": n}
+            part.update(meta or {})
+            files = self._files()
+
+            if not parts or date_str > parts[-1]["date"]:
+                # 일반 경로: 끝에 붙이기 (이전 실패로 남은 꼬리는 잘라냄)
+                for name, path in files.items():
+                    isz = np.dtype(self._dtype(name)).itemsize
+                    with path.open("ab") as f:
+                        f.truncate(total * isz)
+                        f.write(np.ascontiguousarray(new[name]).tobytes())
+                parts.append(part)
+                self._series_append(total, new["ticker_id"])
+            else:
+                # 과거 날짜 교체/삽입 → 날짜순으로 재배치
+                keep = [p for p in parts if p["date"] != date_str]
+                old = {name: self._memmap(name, total) for name in files}
+                chunks = {name: [] for name in files}
+                merged, pos, placed = [], 0, False
+                for p in keep + [None]:
+                    if not placed and (p is None or p["date"] > date_str):
+                        for name in files:
+                            chunks[name].append(new[name])
+                        merged.append(dict(part, start=pos)); pos += n; placed = True
+                    if p is None:
+                        break
+                    for name in files:
+                        chunks[name].append(np.asarray(old[name][p["start"]:p["start"] + p["rows"]]))
+                    merged.append(dict(p, start=pos)); pos += p["rows"]
+                for name, path in files.items():
+                    tmp = path.with_name(path.name + ".tmp")
+                    np.concatenate(chunks[name]).astype(self._dtype(name)).tofile(tmp)
+                    os.replace(tmp, path)
+                del old
+                idx["parts"] = merged
+                self._mm.clear()
+                self._series_rebuild(pos)
+            _write_atomic(self.dir / "index.json", json.dumps(idx, ensure_ascii=False))
+
+    # --------------------
+    # 종목별 시계열 인덱스 (CSR)
+    # --------------------
+    def _series_paths(self):
+        return self.dir / "series_ptr.i8", self.dir / "series_row.i4"
+
+    def _series_read(self):
+        pp, rp = self._series_paths()
+        try:
+            ptr = np.fromfile(pp, dtype=np.int64)
+            rows = np.fromfile(rp, dtype=np.int32)
+        except OSError:
+            return None, None
+        if len(ptr) == 0 or ptr[-1] != len(rows):
+            return None, None
+        return ptr, rows
+
+    def _series_write(self, ptr: np.ndarray, rows: np.ndarray):
+        # row 파일 먼저 → ptr 교체. 중간에 죽으면 ptr[-1] != len(rows) 로 감지되어 재구축
+        pp, rp = self._series_paths()
+        for path, arr in ((rp, rows.astype(np.int32)), (pp, ptr.astype(np.int64))):
+            tmp = path.with_name(path.name + ".tmp")
+            arr.tofile(tmp)
+            os.replace(tmp, path)
+
+    def _series_rebuild(self, total: int):
+        """ticker_id 컬럼 전체에서 다시 만듦 (과거 날짜 재배치 / 인덱스 손상 시)."""
+        tid = np.asarray(self._memmap("ticker_id", total))
+        nsym = len(self.symbols())
+        rows = np.argsort(tid, kind="stable").astype(np.int32)     # 종목별 → 행 번호(=날짜) 순
+        ptr = np.concatenate([[0], np.cumsum(np.bincount(tid, minlength=nsym))])
+        self._series_write(ptr, rows)
+
+    def _series_append(self, total: int, tids: np.ndarray):
+        """새 날짜 행(전역 행 번호 total..)을 기존 CSR 에 병합. 새 행은 항상 각 종목 목록의 끝."""
+        ptr, rows = self._series_read()
+        if ptr is None or ptr[-1] != total:
+            self._series_rebuild(total + len(tids))
+            return
+        nsym = len(self.symbols())
+        ptr = np.concatenate([ptr, np.full(nsym + 1 - len(ptr), ptr[-1])])
+        cnt_old = np.diff(ptr)
+        tids = np.asarray(tids, dtype=np.int64)
+        cnt_new = np.bincount(tids, minlength=nsym)
+        new_ptr = np.concatenate([[0], np.cumsum(cnt_old + cnt_new)])
+        out = np.empty(new_ptr[-1], dtype=np.int32)
+        # 기존 행: 종목 t 의 블록을 (new_ptr[t] - ptr[t]) 만큼 밀기
+        shift = (new_ptr[:-1] - ptr[:-1])[np.repeat(np.arange(nsym), cnt_old)]
+        out[np.arange(len(rows)) + shift] = rows
+        # 새 행: 종목 블록 끝에, 같은 종목이 여럿이면 행 번호 순
+        order = np.argsort(tids, kind="stable")
+        st = tids[order]
+        rank = np.arange(len(st)) - np.searchsorted(st, st, side="left")
+        out[new_ptr[st] + cnt_old[st] + rank] = total + order
+        self._series_write(new_ptr, out)
+
+    def series(self, ticker: str, columns: Sequence[str] = COLUMNS, start: Optional[str] = None,
+               end: Optional[str] = None, last: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        한 종목의 날짜별 시계열 (저장된 날짜 중 그 종목이 있는 날만, 오름차순).
+        반환: {"dates": 문자열 배열, 컬럼: float64 배열}. last 는 마지막 N 개만.
+        """
+        parts = self._parts()
+        total = sum(p["rows"] for p in parts)
+        out: Dict[str, np.ndarray] = {"dates": np.zeros(0, dtype="U10")}
+        out.update({c: np.zeros(0) for c in columns})
+        self.symbols()
+        t = self._ids.get(ticker)
+        if t is None or not total:
+            return out
+        k = ("series", total)
+        if k not in self._mm:
+            ptr, rows = self._series_read()
+            if ptr is None or ptr[-1] != total:
+                with self._lock:
+                    self._series_rebuild(total)
+                ptr, rows = self._series_read()
+            starts = np.asarray([p["start"] for p in parts], dtype=np.int64)
+            self._mm[k] = (ptr, rows, starts, np.asarray([p["date"] for p in parts], dtype="U10"))
+        ptr, rows, starts, dates = self._mm[k]
+        if t + 1 >= len(ptr):
+            return out
+        r = rows[ptr[t]:ptr[t + 1]]
+        day = np.searchsorted(starts, r, side="right") - 1
+        d = dates[day]
+        keep = np.ones(len(r), dtype=bool)
+        if start is not None:
+            keep &= d >= start
+        if end is not None:
+            keep &= d <= end
+        if not keep.all():
+            r, d = r[keep], d[keep]
+        if last is not None:
+            r, d = r[-last:], d[-last:]
+        out["dates"] = d
+        for c in columns:
+            out[c] = np.asarray(self._cached_memmap(c, total)[r])
+        return out
+
+    # --------------------
+    # 읽기
+    # --------------------
+    def dates(self) -> List[str]:
+        return [p["date"] for p in self._index()["parts"]]
+
+    def fingerprint(self, upto: Optional[int] = None) -> str:
+        """앞 upto 개 파티션 (날짜, 행 수) 의 해시 — 파생 상태(rolling 등)가 과거 변경을 감지하는 용도."""
+        parts = self._index()["parts"][:upto]
+        return hashlib.sha1(json.dumps([(p["date"], p["rows"]) for p in parts]).encode()).hexdigest()
+
+    def has(self, date_str: str) -> bool:
+        return any(p["date"] == date_str for p in self._index()["parts"])
+
+    def meta(self, date_str: str) -> dict:
+        for p in self._index()["parts"]:
+            if p["date"] == date_str:
+                return p
+        raise FileNotFoundError(f"history: no partition {self.market}/{date_str}")
+
+    def load_range(self, start: Optional[str] = None, end: Optional[str] = None,
+                   columns: Sequence[str] = COLUMNS) -> Dict[str, object]:
+        """기간 [start, end] 를 연속 배열(memmap 뷰)로 반환. day[i] 는 dates 의 인덱스."""
+        parts = self._index()["parts"]
+        total = sum(p["rows"] for p in parts)
+        sel = [p for p in parts if (start is None or p["date"] >= start) and (end is None or p["date"] <= end)]
+        out: Dict[str, object] = {"dates": [p["date"] for p in sel]}
+        lo = sel[0]["start"] if sel else 0
+        hi = sel[-1]["start"] + sel[-1]["rows"] if sel else 0
+        for name in ("ticker_id",) + tuple(columns):
+            out[name] = self._memmap(name, total)[lo:hi]
+        out["day"] = np.repeat(np.arange(len(sel), dtype=np.int32), [p["rows"] for p in sel])
+        return out
+
+    def load(self, date_str: str, columns: Sequence[str] = COLUMNS) -> Dict[str, np.ndarray]:
+        """하루치 컬럼을 memmap 뷰로 반환 (복사 없음)."""
+        self.meta(date_str)
+        d = self.load_range(date_str, date_str, columns)
+        d.pop("day"); d.pop("dates")
+        return d
+
+    def rows(self, date_str: str, columns: Sequence[str] = COLUMNS) -> List[dict]:
+        """번들 형식의 행 리스트로 복원 (NaN → None)."""
+        d = self.load(date_str, columns)
+        syms = self.symbols()
+        vals = [np.asarray(d[c]).tolist() for c in columns]
+        out = []
+        for i, tid in enumerate(np.asarray(d["ticker_id"]).tolist()):
+            r = {"ticker": syms[tid]}
+            for c, v in zip(columns, vals):
+                x = v[i]
+                r[c] = None if x != x else x
+            out.append(r)
+        return out
+
+
+# --------------------
+# 전체 유니버스 (압축 컬럼 파일)
+# --------------------
+def universe_path(market: str, date_str: str, root: Path = UNIVERSE_ROOT) -> Path:
+    return Path(root) / market / f"{date_str}.npz"
+
+def save_universe(path: Path, tickers: Sequence[str], cols: Dict[str, Sequence]) -> Path:
+    """
+    ticker 는 사전(정렬된 고유 심볼, 개행 결합 바이트) + 행별 코드로 저장.
+    수치 컬럼은 float64 고정폭(결측 NaN), transactions 는 int64.
+    """
+    uniq, codes = np.unique(np.asarray(tickers, dtype=object).astype(str), return_inverse=True)
+    arrays = {
+        "ticker_dict": np.frombuffer("\n".join(uniq.tolist()).encode("utf-8"), dtype=np.uint8),
+        "ticker_code": codes.astype(np.uint16 if len(uniq) < 65536 else np.int32),
+    }
+    for name in UNIVERSE_FIELDS.values():
+        v = cols.get(name)
+        if v is None:
+            continue
+        a = np.asarray(v, dtype=np.float64)
+        if name == "transactions":
+            a = np.where(np.isfinite(a), a, -1).astype(np.int64)
+        arrays[name] = a
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+    return path
+
+def load_universe(path: Path) -> Dict[str, np.ndarray]:
+    """전체 유니버스 로드 + dollar_volume(vwap, 없으면 close) / pct_change 파생."""
+    with np.load(path) as z:
+        uniq = np.asarray(bytes(z["ticker_dict"]).decode("utf-8").split("\n"), dtype=object)
+        out = {"ticker": uniq[z["ticker_code"]]}
+        for name in UNIVERSE_FIELDS.values():
+            if name in z.files:
+                out[name] = z[name]
+    o, c, v = out["open"], out["close"], out["volume"]
+    vw = out.get("vwap", np.full(len(c), np.nan))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["dollar_volume"] = v * np.where(vw > 0, vw, c)
+        out["pct_change"] = np.where(o > 0, (c - o) / o, np.nan)
+    return out
+
+def universe_rows(u: Dict[str, np.ndarray], columns: Sequence[str] = COLUMNS) -> List[dict]:
+    vals = [u[c].tolist() for c in columns]
+    out = []
+    for i, t in enumerate(u["ticker"].tolist()):
+        r = {"ticker": t}
+        for c, v in zip(columns, vals):
+            x = v[i]
+            r[c] = None if x != x else x
+        out.append(r)
+    return out
+
+
+def union_rows(lists: Iterable[Sequence[dict]]) -> List[dict]:
+    """리스트들의 합집합(티커 기준, 처음 나온 순서 유지)."""
+    seen, out = set(), []
+    for lst in lists:
+        for r in lst:
+            t = r.get("ticker")
+            if t and t not in seen:
+                seen.add(t); out.append(r)
+    return out
+
+
+def import_bundle(store: HistoryStore, path: Path, overwrite: bool = False) -> Optional[str]:
+    bundle = json.loads(Path(path).read_text(encoding="utf-8"))
+    dstr = bundle.get("date")
+    if not dstr or (store.has(dstr) and not overwrite):
+        return None
+    counts = bundle.get("counts", {})
+    total = counts.get("total_rows", counts.get("universe_total"))
+    rows = union_rows((bundle.get("lists") or {}).values())
+    if not rows:
+        return None
+    store.append(dstr, rows, meta={"total_rows": total})
+    return dstr
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    a = sub.add_parser("import", help="기존 bundle.json 들을 저장소로 가져오기")
+    a.add_argument("paths", nargs="+")
+    a.add_argument("--market", default="us")
+    a.add_argument("--overwrite", action="store_true")
+    i = sub.add_parser("info")
+    i.add_argument("--market", default="us")
+    se = sub.add_parser("series", help="한 종목의 저장된 시계열 출력")
+    se.add_argument("ticker")
+    se.add_argument("--market", default="us")
+    se.add_argument("--days", type=int, default=None, help="마지막 N 거래일")
+    se.add_argument("--columns", default="close,dollar_volume,pct_change")
+    u = sub.add_parser("universe", help="전체 유니버스 파일에서 분포 통계 / top-N 재추출")
+    u.add_argument("--date", required=True)
+    u.add_argument("--market", default="us")
+    u.add_argument("--top", type=int, default=600)
+    u.add_argument("--min-price", type=float, default=0.0)
+    u.add_argument("--out", default=None, help="top-N CSV 경로 (생략 시 통계만 출력)")
+    args = ap.parse_args()
+
+    if args.cmd == "universe":
+        uni = load_universe(universe_path(args.market, args.date))
+        pct, dv = uni["pct_change"], uni["dollar_volume"]
+        ok = np.isfinite(pct)
+        print(f"{args.date}: rows={len(pct)} adv={int((pct[ok] > 0).sum())} dec={int((pct[ok] < 0).sum())} "
+              f"median={np.median(pct[ok]) * 100:.2f}% dv_total={np.nansum(dv) / 1e9:.1f}B")
+        if args.out:
+            keep = np.isfinite(dv) & (np.nan_to_num(uni["close"]) >= args.min_price)
+            order = np.flatnonzero(keep)[np.argsort(-dv[keep], kind="stable")][:args.top]
+            sub_u = {k: v[order] for k, v in uni.items()}
+            with open(args.out, "w", newline="", encoding="utf-8") as f:
+                w = csv.DictWriter(f, fieldnames=["ticker"] + list(COLUMNS)); w.writeheader()
+                for r in universe_rows(sub_u):
+                    w.writerow(r)
+            print(f"Wrote {args.out} ({len(order)} rows)")
+        return
+
+    store = HistoryStore(args.market)
+    if args.cmd == "import":
+        done = 0
+        for p in sorted(args.paths):
+            if Path(p).name.startswith("latest"):
+                continue
+            try:
+                if import_bundle(store, Path(p), args.overwrite):
+                    done += 1
+            except Exception as e:
+                print(f"WARN: skip {p}: {e}", file=sys.stderr)
+        print(f"imported {done} day(s) -> {store.dir}")
+    elif args.cmd == "series":
+        cols = [c for c in args.columns.split(",") if c]
+        sr = store.series(args.ticker, cols, last=args.days)
+        w = csv.writer(sys.stdout)
+        w.writerow(["date"] + cols)
+        for i, d in enumerate(sr["dates"].tolist()):
+            w.writerow([d] + [sr[c][i] for c in cols])
+    else:
+        ds = store.dates()
+        print(f"{store.dir}: {len(ds)} day(s), {len(store.symbols())} symbols"
+              + (f", {ds[0]} .. {ds[-1]}" if ds else ""))
+
+
+if __name__ == "__main__":
+    main()
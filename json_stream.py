@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+최상위 JSON 객체 안의 큰 배열을 원소 단위로 읽는 스트리밍 파서
+- 예: Polygon grouped 응답 {"status": ..., "results": [{...}, {...}, ...], ...}
+- 바이트 스트림을 chunk 단위로 읽고(utf-8 증분 디코딩) 배열 원소를 하나씩 yield
+- 버퍼에는 아직 소비하지 않은 꼬리만 남으므로 메모리는 chunk + 원소 1개 수준
+- 배열 외 최상위 필드(status, resultsCount 등)는 .header 에 모인다
+  (키 순서가 자유로우므로 status 확인은 순회가 끝난 뒤에)
+"""
+
+import json, codecs
+from typing import Any, BinaryIO, Dict, Iterator
+
+_WS = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+class ArrayStream:
+    def __init__(self, fp: BinaryIO, key: str = "results", chunk_size: int = 1 << 16):
+        self.fp = fp
+        self.key = key
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.count = 0
+        self._dec = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    # --------------------
+    # 버퍼
+    # --------------------
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self.fp.read(self.chunk_size)
+        if not data:
+            self._eof = True
+            text = self._dec.decode(b"", final=True)
+        else:
+            text = self._dec.decode(data)
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return bool(data) or bool(text)
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WS:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("json_stream: unexpected end of input")
+
+    def _expect(self, ch: str):
+        if self._peek() != ch:
+            raise ValueError(f"json_stream: expected {ch!r} at offset {self._pos}, got {self._buf[self._pos]!r}")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                val, end = _decoder.raw_decode(self._buf, self._pos)
+                # 숫자 등은 버퍼 끝에서 잘렸을 수 있으므로 뒤에 문자가 하나 더 있어야 확정
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return val
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    # --------------------
+    # 순회
+    # --------------------
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            k = self._value()
+            self._expect(":")
+            if k == self.key and self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        item = self._value()
+                        self.count += 1
+                        yield item
+                        ch = self._peek(); self._pos += 1
+                        if ch == "]":
+                            break
+                        if ch != ",":
+                            raise ValueError(f"json_stream: expected ',' or ']' in {self.key}, got {ch!r}")
+            else:
+                self.header[k] = self._value()
+            ch = self._peek(); self._pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"json_stream: expected ',' or '}}', got {ch!r}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JPX 종목별 직전 종가 저장소 (증분 다운로드용)
+- 위치: data/jpx_last_close.npz (압축, 수십 KB)
+- 종목 코드 4자리를 슬롯 번호로 직접 매핑한 고정 길이 배열
+    1·3번째 자리는 숫자, 2·4번째 자리는 숫자 또는 영문(2024~ 신규 코드 "130A" 등)
+    → 10 * 36 * 10 * 36 = 129,600 슬롯
+- 슬롯마다: close/session (마지막 종가와 그 거래일), prev_close (그 직전 거래일 종가)
+  거래일은 1970-01-01 기준 일수(int32), 0 = 없음
+- 같은 거래일을 다시 기록해도 prev_close 는 유지 → 같은 날 재실행해도 pct_change 가 같다
+"""
+
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+
+DEFAULT_PATH = Path(os.getenv("JPX_LAST_CLOSE", "data/jpx_last_close.npz"))
+SLOTS = 10 * 36 * 10 * 36
+_EPOCH = date(1970, 1, 1)
+_B36 = {c: i for i, c in enumerate("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ")}
+
+
+def code_slot(code: str) -> int:
+    """'7203' / '7203.T' / '130A' → 슬롯 번호. 형식이 다르면 -1."""
+    c = code.split(".", 1)[0].upper()
+    if len(c) != 4 or not (c[0].isdigit() and c[2].isdigit()):
+        return -1
+    b, d = _B36.get(c[1]), _B36.get(c[3])
+    if b is None or d is None:
+        return -1
+    return ((int(c[0]) * 36 + b) * 10 + int(c[2])) * 36 + d
+
+
+def day_num(d) -> int:
+    if isinstance(d, str):
+        d = date.fromisoformat(d[:10])
+    return (d - _EPOCH).days
+
+
+def prev_weekday(d: date) -> date:
+    """d 직전 평일 (JPX 휴장일은 고려하지 않음 → 휴장 다음날은 전 종목 stale 로 안전하게 처리)."""
+    d -= timedelta(days=1)
+    while d.weekday() >= 5:
+        d -= timedelta(days=1)
+    return d
+
+
+class LastCloseStore:
+    def __init__(self, path: Path = DEFAULT_PATH):
+        self.path = Path(path)
+        self.close = np.full(SLOTS, np.nan)
+        self.prev_close = np.full(SLOTS, np.nan)
+        self.session = np.zeros(SLOTS, dtype=np.int32)
+        if self.path.exists():
+            with np.load(self.path) as z:
+                for k in ("close", "prev_close", "session"):
+                    if k in z and len(z[k]) == SLOTS:
+                        getattr(self, k)[:] = z[k]
+
+    def slots(self, tickers: Iterable[str]) -> np.ndarray:
+        return np.fromiter((code_slot(t) for t in tickers), dtype=np.int64)
+
+    def fresh(self, tickers: List[str], since: date) -> np.ndarray:
+        """마지막 기록 거래일이 since 이상인 종목 마스크 (→ 최신 1개 bar 만 받아도 됨)."""
+        s = self.slots(tickers)
+        ok = s >= 0
+        out = np.zeros(len(s), dtype=bool)
+        out[ok] = self.session[s[ok]] >= day_num(since)
+        return out
+
+    def references(self, tickers: List[str], bar_days: np.ndarray) -> np.ndarray:
+        """각 종목 bar_days(일수) 종가의 비교 기준(직전 거래일 종가). 모르면 NaN."""
+        s = self.slots(tickers)
+        d = np.asarray(bar_days, dtype=np.int64)
+        out = np.full(len(s), np.nan)
+        ok = s >= 0
+        ss, sd = s[ok], d[ok]
+        sess = self.session[ss]
+        out[ok] = np.where((sess > 0) & (sess < sd), self.close[ss],
+                           np.where(sess == sd, self.prev_close[ss], np.nan))
+        out[out == 0] = np.nan
+        return out
+
+    def update(self, rows: Iterable[dict]):
+        """rows: {"ticker", "close", "date", "prev_close"} (prev_close = pct_change 의 기준값)."""
+        for r in rows:
+            s = code_slot(r["ticker"])
+            c = r.get("close")
+            if s < 0 or c is None or not r.get("date"):
+                continue
+            d = day_num(r["date"])
+            if d < self.session[s]:
+                continue
+            ref = r.get("prev_close")
+            if ref is not None or d > self.session[s]:
+                self.prev_close[s] = np.nan if ref is None else ref
+            self.close[s], self.session[s] = c, d
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        np.savez_compressed(tmp, close=self.close, prev_close=self.prev_close,
+                            session=self.session)
+        os.replace(tmp, self.path)
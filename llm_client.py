@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM 호출 + 프롬프트 키 응답 캐시 (US/JP 요약기 공용)
+- 키: sha256(model, system, user, max_output_tokens) — 번들/프롬프트가 같으면 같은 키
+- 저장: ResponseCache (.cache/llm, 본문 = 응답 텍스트, 메타 = model/지연/토큰 수)
+- 용량: LLM_CACHE_MAX_MB(기본 64MB) 초과 시 오래 안 쓴 항목부터 삭제
+- 모드: "use"(기본, hit 면 네트워크 없이 반환) / "off"(--no-cache, 읽지도 쓰지도 않음)
+        / "only"(--cache-only, miss 면 CacheMiss — 템플릿 수정 후 실제 출력 재생용)
+- 빈 응답은 저장하지 않음 (요약기가 fallback 으로 처리)
+- 마감: 전체 시간 예산(LLM_DEADLINE_S) 안에서 시도별 타임아웃 + 재시도,
+  첫 시도가 과거 지연의 p90 을 넘기면 같은 요청을 하나 더(헤지) 보내 먼저 온 응답 사용,
+  fallback 본문은 시작과 동시에 만들어 두고 마감까지 성공이 없으면 그대로 반환
+- 성공 지연은 {cache}/latency.json 에 (모델, max_output_tokens) 별 최근 50개 기록 (헤지 임계값)
+  → 짧은 섹션 호출이 긴 본문 호출의 p90 을 끌어내리지 않음. 동시 호출은 잠금 + 호출별 임시 파일
+- 로컬 스텁 서버로 지연/오류 주입 테스트: scripts/llm_stub_server.py + OPENAI_BASE_URL
+"""
+
+import os, sys, json, time, queue, argparse, tempfile, threading
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+from response_cache import ResponseCache, cache_key
+
+DEFAULT_DIR = Path(os.getenv("LLM_CACHE_DIR", ".cache/llm"))
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024)
+MODES = ("use", "off", "only")
+DEADLINE_S = 360.0          # 전체 마감 (LLM_DEADLINE_S)
+ATTEMPT_TIMEOUT_S = 240.0   # 시도별 타임아웃 (LLM_ATTEMPT_TIMEOUT_S)
+HEDGE_QUANTILE = 0.9
+HEDGE_MIN_SAMPLES = 5
+LATENCY_KEEP = 50
+
+
+class CacheMiss(RuntimeError):
+    """cache-only 모드에서 캐시에 없는 프롬프트."""
+
+
+class Completion(NamedTuple):
+    text: str
+    cached: bool
+    latency_s: float        # 원래 호출에 걸린 시간 (hit 여도 기록된 값)
+    input_tokens: Optional[int]
+    output_tokens: Optional[int]
+    fallback: bool = False  # 마감까지 성공한 시도가 없어 fallback 본문을 반환
+    attempts: tuple = ()    # 시도별 기록 (Attempt.as_dict)
+
+
+def llm_key(model: str, system: str, user: str, max_output_tokens: int) -> str:
+    return cache_key("responses", model, system, user, int(max_output_tokens))
+
+
+def open_cache(root: Path = DEFAULT_DIR, max_bytes: int = MAX_BYTES) -> ResponseCache:
+    return ResponseCache(root, max_bytes=max_bytes)
+
+
+def add_cache_args(ap: argparse.ArgumentParser):
+    g = ap.add_mutually_exclusive_group()
+    g.add_argument("--no-cache", dest="llm_cache", action="store_const", const="off",
+                   help="LLM 응답 캐시를 쓰지 않음")
+    g.add_argument("--cache-only", dest="llm_cache", action="store_const", const="only",
+                   help="캐시된 응답만 사용 (없으면 실패, 네트워크 호출 없음)")
+    ap.set_defaults(llm_cache="use")
+
+
+def _usage(resp, name: str) -> Optional[int]:
+    v = getattr(getattr(resp, "usage", None), name, None)
+    return int(v) if isinstance(v, (int, float)) else None
+
+
+# --------------------
+# 지연 기록 (헤지 임계값용)
+# --------------------
+def _latency_path(cache: Optional[ResponseCache]) -> Path:
+    return (cache.root if cache is not None else DEFAULT_DIR) / "latency.json"
+
+
+_latency_lock = threading.Lock()
+
+
+def latency_key(model: str, max_output_tokens: int) -> str:
+    return f"{model}@{int(max_output_tokens)}"
+
+
+def load_latencies(path: Path, key: str) -> List[float]:
+    try:
+        return list(json.loads(path.read_text(encoding="utf-8")).get(key, []))
+    except (OSError, ValueError, AttributeError):
+        return []
+
+
+def record_latency(path: Path, key: str, seconds: float):
+    """읽기-수정-쓰기를 잠금으로 직렬화, 임시 파일은 호출마다 따로 (동시 os.replace 충돌 방지)."""
+    with _latency_lock:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        data[key] = (list(data.get(key, [])) + [round(seconds, 3)])[-LATENCY_KEEP:]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps(data))
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+def hedge_delay(samples: Sequence[float], q: float = HEDGE_QUANTILE) -> Optional[float]:
+    """기록된 성공 지연의 q 분위수 (표본이 HEDGE_MIN_SAMPLES 미만이면 None = 헤지 안 함)."""
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    xs = sorted(samples)
+    return xs[int(q * (len(xs) - 1))]
+
+
+def _env_seconds(name: str, default: Optional[float]) -> Optional[float]:
+    v = os.getenv(name, "").strip().lower()
+    if not v:
+        return default
+    if v in ("0", "off", "none"):
+        return None
+    return float(v)
+
+
+# --------------------
+# 호출
+# --------------------
+class Attempt:
+    __slots__ = ("n", "kind", "start_s", "elapsed_s", "status", "error")
+
+    def __init__(self, n: int, kind: str, start_s: float):
+        self.n, self.kind, self.start_s = n, kind, start_s
+        self.elapsed_s: Optional[float] = None
+        self.status = "running"        # ok | empty | error | timeout | abandoned
+        self.error = ""
+
+    def as_dict(self) -> dict:
+        return {"n": self.n, "kind": self.kind, "start_s": round(self.start_s, 3),
+                "elapsed_s": None if self.elapsed_s is None else round(self.elapsed_s, 3),
+                "status": self.status, "error": self.error}
+
+    def __repr__(self):
+        el = "-" if self.elapsed_s is None else f"{self.elapsed_s:.1f}s"
+        return f"#{self.n} {self.kind} @{self.start_s:.1f}s {self.status} {el}" + (f" ({self.error})" if self.error else "")
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    return isinstance(exc, TimeoutError) or "timeout" in type(exc).__name__.lower() \
+        or "timed out" in str(exc).lower()
+
+
+def complete(model: str, system: str, user: str, max_output_tokens: int,
+             client: Optional[Callable[..., object]] = None, mode: str = "use",
+             cache: Optional[ResponseCache] = None, retries: int = 1,
+             deadline_s: Optional[float] = None, attempt_timeout_s: Optional[float] = None,
+             hedge_after_s="auto", fallback: Optional[Callable[[], str]] = None) -> Completion:
+    """
+    Responses API 호출 (전체 마감 + 시도별 타임아웃 + 헤지 + fallback 경쟁).
+    - client: OpenAI 클라이언트 생성 함수 (miss 일 때만, client(timeout=, max_retries=0) 로 호출)
+    - retries: 순차 시도 최대 횟수 (헤지는 별도). 실패 후 2 * k 초 쉬고 재시도, 마감 넘으면 중단
+    - deadline_s / attempt_timeout_s: 기본값 LLM_DEADLINE_S / LLM_ATTEMPT_TIMEOUT_S
+    - hedge_after_s: "auto" = 기록된 지연의 p90 (LLM_HEDGE_AFTER_S 로 고정/off 가능), None = 끔
+      첫 시도가 그 시간 안에 안 끝나면 같은 요청을 하나 더 보내 먼저 온 응답 사용
+    - fallback: 시작과 동시에 별도 스레드에서 만들어 두는 대체 본문. 마감까지 성공이 없으면 반환
+      (fallback 없이 실패하면 마지막 예외, 마감이면 TimeoutError)
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    key = llm_key(model, system, user, max_output_tokens)
+    if mode != "off":
+        cache = cache or open_cache()
+        meta = cache.meta(key)
+        if meta is not None:
+            return Completion(cache.get_bytes(key).decode("utf-8"), True, meta.get("latency_s", 0.0),
+                              meta.get("input_tokens"), meta.get("output_tokens"))
+        if mode == "only":
+            raise CacheMiss(f"no cached response for {model} prompt {key[:12]}")
+
+    if client is None:
+        from openai import OpenAI
+        client = OpenAI
+    deadline_s = _env_seconds("LLM_DEADLINE_S", DEADLINE_S) if deadline_s is None else deadline_s
+    attempt_timeout_s = _env_seconds("LLM_ATTEMPT_TIMEOUT_S", ATTEMPT_TIMEOUT_S) \
+        if attempt_timeout_s is None else attempt_timeout_s
+    lat_path = _latency_path(cache)
+    if hedge_after_s == "auto":
+        hedge_after_s = _env_seconds("LLM_HEDGE_AFTER_S", -1.0)
+        if hedge_after_s is not None and hedge_after_s < 0:
+            hedge_after_s = hedge_delay(load_latencies(lat_path, latency_key(model, max_output_tokens)))
+
+    t0 = time.monotonic()
+    end = t0 + deadline_s if deadline_s else float("inf")
+    results: "queue.Queue" = queue.Queue()
+    attempts: List[Attempt] = []
+    retries = max(1, retries)
+
+    fb: dict = {}
+    if fallback is not None:
+        def _make_fallback():
+            try:
+                fb["text"] = fallback()
+            except Exception as e:
+                fb["error"] = e
+        fb_thread = threading.Thread(target=_make_fallback, daemon=True)
+        fb_thread.start()
+
+    def _run(a: Attempt, timeout: Optional[float]):
+        t = time.monotonic()
+        try:
+            cli = client(timeout=timeout, max_retries=0)
+            resp = cli.responses.create(
+                model=model,
+                max_output_tokens=int(max_output_tokens),
+                input=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+            )
+            results.put((a, resp, None, time.monotonic() - t))
+        except Exception as e:
+            results.put((a, None, e, time.monotonic() - t))
+
+    def launch(kind: str):
+        now = time.monotonic()
+        a = Attempt(len(attempts) + 1, kind, now - t0)
+        attempts.append(a)
+        timeout = min(x for x in (attempt_timeout_s, end - now) if x)
+        # 데몬 스레드: 마감 후 남은 요청이 프로세스 종료를 막지 않게
+        threading.Thread(target=_run, args=(a, timeout), daemon=True).start()
+
+    launch("primary")
+    inflight, sequential, hedged = 1, 1, hedge_after_s is None
+    retry_at = None
+    win, win_resp, last_err = None, None, None
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        wake = [end]
+        if not hedged and inflight:
+            wake.append(t0 + attempts[-1].start_s + hedge_after_s)
+        if retry_at is not None:
+            wake.append(retry_at)
+        try:
+            a, resp, err, elapsed = results.get(timeout=max(0.0, min(wake) - now))
+        except queue.Empty:
+            now = time.monotonic()
+            if not hedged and inflight and now >= t0 + attempts[-1].start_s + hedge_after_s:
+                launch("hedge"); inflight += 1; hedged = True
+            if retry_at is not None and now >= retry_at:
+                launch("retry"); inflight += 1; sequential += 1; retry_at = None
+            continue
+        inflight -= 1
+        a.elapsed_s = elapsed
+        text = (resp.output_text or "") if err is None else ""
+        if err is None and text.strip():
+            a.status = "ok"
+            win, win_resp = a, resp
+            break
+        if err is None:
+            a.status, last_err = "empty", RuntimeError("empty response")
+        else:
+            a.status = "timeout" if _is_timeout(err) else "error"
+            a.error, last_err = f"{type(err).__name__}: {err}"[:200], err
+        if inflight == 0 and retry_at is None:
+            if sequential >= retries:
+                break
+            wait_s = 2 * sequential
+            if time.monotonic() + wait_s >= end:
+                break
+            retry_at = time.monotonic() + wait_s
+    for a in attempts:
+        if a.status == "running":
+            a.status = "abandoned"
+
+    timings = tuple(a.as_dict() for a in attempts)
+    if win is not None:
+        try:
+            record_latency(lat_path, latency_key(model, max_output_tokens), win.elapsed_s)
+        except OSError as e:       # 기록 실패가 성공한 응답을 버리게 하지 않음
+            print(f"WARN: latency record failed ({e})", file=sys.stderr)
+        out = Completion(win_resp.output_text, False, win.elapsed_s,
+                         _usage(win_resp, "input_tokens"), _usage(win_resp, "output_tokens"),
+                         False, timings)
+        if mode != "off":
+            cache.put_bytes(key, out.text.encode("utf-8"), model=model, latency_s=round(win.elapsed_s, 3),
+                            input_tokens=out.input_tokens, output_tokens=out.output_tokens)
+        return out
+
+    if fallback is not None:
+        fb_thread.join()
+        if "text" in fb:
+            return Completion(fb["text"], False, time.monotonic() - t0, None, None, True, timings)
+        raise fb["error"]
+    if last_err is None or time.monotonic() >= end:
+        raise TimeoutError(f"LLM deadline {deadline_s:.0f}s exceeded: {attempts}")
+    raise last_err
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+등락률/거래대금 통계 커널 (US/JP 요약기 공용)
+- 입력: pct_change, dollar_volume, volume 컬럼을 한 번만 NumPy 배열로 (None → NaN)
+- 한 번의 호출로: 등락 종목 수, 평균/표준편차, 정확한 분위수(중앙값 포함),
+  대칭 등락 구간 히스토그램, 거래대금/거래량 상위 N 집중도
+- 정렬은 pct 한 번(np.sort, NaN 은 끝으로), 상위 N 합계는 np.partition → O(n)
+- 분위수는 기존 요약기와 같은 '하한' 방식 arr[int(q * (n - 1))], 중앙값은 가운데 두 값 평균
+- 등락 구간 경계 (edges):
+    "outer" (기본, US) : 절대값 기준 대칭, ±t 이상(>= t / <= -t)이면 바깥 구간 → 가운데는 (-t, t)
+    "left"  (JP 기존)  : 반열림 [하한, 상한) — +t 는 바깥, -t 는 안쪽 (< -t 만 아래 구간) → 가운데는 [-t, t)
+    thresholds=(0.02, 0.05) → le_m5 / m5_m2 / m2_p2 / p2_5 / ge_5
+  ge/le{임계값} 개수는 경계와 무관하게 >= t / <= -t
+- 2차원 입력 (행 = 날짜/윈도우, 열 = 종목) 도 그대로 받아 행별로 계산 → describe_rows()
+- 그룹별 (클러스터/테마 id) 집계 → grouped_stats(): bincount + 그룹 내 정렬 1회 (lexsort)
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+THRESHOLDS = (0.02, 0.05)
+QUANTILES = (0.05, 0.95)
+TOP = (10, 50)
+
+
+def column(rows: Iterable[dict], key: str) -> np.ndarray:
+    """행 dict 리스트 → float64 컬럼 (None/비수치 → NaN)."""
+    vals = [r.get(key) for r in rows]
+    try:
+        return np.array(vals, dtype=np.float64)          # None 은 NaN 으로 변환됨
+    except (TypeError, ValueError):
+        return np.array([v if isinstance(v, (int, float)) else np.nan for v in vals], dtype=np.float64)
+
+
+def _band_names(thresholds: Sequence[float]) -> List[str]:
+    """(0.02, 0.05) → ['le_m5', 'm5_m2', 'm2_p2', 'p2_5', 'ge_5'] (% 정수 표기)."""
+    t = [f"{x * 100:g}".replace(".", "") for x in thresholds]
+    neg = [f"le_m{t[-1]}"] + [f"m{t[i + 1]}_m{t[i]}" for i in reversed(range(len(t) - 1))]
+    pos = [f"p{t[i]}_{t[i + 1]}" for i in range(len(t) - 1)] + [f"ge_{t[-1]}"]
+    return neg + [f"m{t[0]}_p{t[0]}"] + pos
+
+
+def _top_share(x: Optional[np.ndarray], top: Sequence[int]) -> Dict[int, np.ndarray]:
+    """행별 상위 k 합 / 전체 합 (NaN·음수는 0 취급, 합이 0 이면 0)."""
+    if x is None:
+        return {}
+    x = np.where(np.isfinite(x) & (x > 0), x, 0.0)
+    total = x.sum(axis=1)
+    m = x.shape[1]
+    out = {}
+    for k in top:
+        if k >= m:
+            s = total
+        else:
+            s = -np.partition(-x, k - 1, axis=1)[:, :k].sum(axis=1)
+        out[k] = np.divide(s, total, out=np.zeros_like(total), where=total > 0)
+    return out
+
+
+def describe_rows(pct, dollar_volume=None, volume=None, thresholds: Sequence[float] = THRESHOLDS,
+                  quantiles: Sequence[float] = QUANTILES, top: Sequence[int] = TOP,
+                  edges: str = "outer") -> Dict[str, object]:
+    """
+    2차원 (행 = 날짜/윈도우) 입력의 행별 통계. 값은 길이 = 행 수인 배열.
+    키: n, missing, adv, dec, flat, mean, std, median, q{분위수}, ge/le{임계값},
+        bands{이름}, dv_top{k}, vol_top{k}
+    """
+    if edges not in ("outer", "left"):
+        raise ValueError(f"edges must be 'outer' or 'left', got {edges!r}")
+    p = np.atleast_2d(np.asarray(pct, dtype=np.float64))
+    rows, m = p.shape
+    s = np.sort(p, axis=1)                        # NaN 은 각 행 끝으로
+    valid = ~np.isnan(p)
+    n = valid.sum(axis=1)
+    has = n > 0
+    res: Dict[str, object] = {"n": n, "missing": m - n}
+
+    z = np.where(valid, p, 0.0)
+    res["adv"] = (z > 0).sum(axis=1)
+    res["dec"] = (z < 0).sum(axis=1)
+    res["flat"] = n - res["adv"] - res["dec"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = z.sum(axis=1) / n
+        var = np.where(valid, (p - mean[:, None]) ** 2, 0.0).sum(axis=1) / n
+    res["mean"] = np.where(has, mean, np.nan)
+    res["std"] = np.where(has, np.sqrt(var), np.nan)
+
+    def at(idx):
+        idx = np.clip(idx, 0, np.maximum(n - 1, 0)).astype(np.int64)
+        v = np.take_along_axis(s, idx[:, None], axis=1)[:, 0] if m else np.full(rows, np.nan)
+        return np.where(has, v, np.nan)
+
+    res["median"] = (at((n - 1) // 2) + at(n // 2)) / 2
+    res["q"] = {q: at(np.floor(q * (n - 1))) for q in quantiles}
+
+    ge = {t: (p >= t).sum(axis=1) for t in thresholds}
+    le = {t: (p <= -t).sum(axis=1) for t in thresholds}
+    res["ge"], res["le"] = ge, le
+    ts = sorted(thresholds)
+    lo = le if edges == "outer" else {t: (p < -t).sum(axis=1) for t in ts}
+    counts = [lo[ts[-1]]] + [lo[ts[i]] - lo[ts[i + 1]] for i in reversed(range(len(ts) - 1))]
+    counts += [n - lo[ts[0]] - ge[ts[0]]]
+    counts += [ge[ts[i]] - ge[ts[i + 1]] for i in range(len(ts) - 1)] + [ge[ts[-1]]]
+    res["bands"] = dict(zip(_band_names(ts), counts))
+
+    dv = None if dollar_volume is None else np.atleast_2d(np.asarray(dollar_volume, dtype=np.float64))
+    vol = None if volume is None else np.atleast_2d(np.asarray(volume, dtype=np.float64))
+    res["dv_top"] = _top_share(dv, top)
+    res["vol_top"] = _top_share(vol, top)
+    return res
+
+
+def _scalar(v):
+    if isinstance(v, dict):
+        return {k: _scalar(x) for k, x in v.items()}
+    x = v[0].item()
+    return None if isinstance(x, float) and np.isnan(x) else x
+
+
+def describe(pct, dollar_volume=None, volume=None, thresholds: Sequence[float] = THRESHOLDS,
+             quantiles: Sequence[float] = QUANTILES, top: Sequence[int] = TOP,
+             edges: str = "outer") -> Dict[str, object]:
+    """1차원 (하루치 유니버스) 입력 → 파이썬 스칼라 dict (값이 없으면 None)."""
+    res = describe_rows(np.asarray(pct, dtype=np.float64)[None, :],
+                        None if dollar_volume is None else np.asarray(dollar_volume, dtype=np.float64)[None, :],
+                        None if volume is None else np.asarray(volume, dtype=np.float64)[None, :],
+                        thresholds, quantiles, top, edges)
+    return {k: _scalar(v) for k, v in res.items()}
+
+
+def describe_records(rows: Sequence[dict], **kw) -> Dict[str, object]:
+    """행 dict 리스트 → describe (pct_change, dollar_volume, volume 컬럼)."""
+    return describe(column(rows, "pct_change"), column(rows, "dollar_volume"),
+                    column(rows, "volume"), **kw)
+
+
+def grouped_stats(groups, pct, dollar_volume=None, n_groups: Optional[int] = None,
+                  dv_total: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    그룹 id (0..G-1, 음수 = 제외) 별 통계. 값은 길이 G 배열.
+    키: size(행 수), n(유효 pct 수), adv, dec, flat, mean, median, dv(거래대금 합),
+        dv_share(dv_total 대비, 생략 시 그룹에 속한 행 합계 대비)
+    중앙값은 describe 와 같이 가운데 두 값 평균. 반복문 없이 bincount / lexsort 로만 계산.
+    """
+    g = np.asarray(groups, dtype=np.int64)
+    p = np.asarray(pct, dtype=np.float64)
+    G = int(n_groups if n_groups is not None else (g.max() + 1 if len(g) and g.max() >= 0 else 0))
+    keep = (g >= 0) & (g < G)
+    g, p = g[keep], p[keep]
+    valid = ~np.isnan(p)
+    cnt = lambda w=None: np.bincount(g, weights=w, minlength=G)[:G]
+    res: Dict[str, np.ndarray] = {"size": cnt().astype(np.int64)}
+    n = cnt(valid.astype(np.float64)).astype(np.int64)
+    res["n"] = n
+    res["adv"] = cnt((valid & (p > 0)).astype(np.float64)).astype(np.int64)
+    res["dec"] = cnt((valid & (p < 0)).astype(np.float64)).astype(np.int64)
+    res["flat"] = n - res["adv"] - res["dec"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        res["mean"] = np.where(n > 0, cnt(np.where(valid, p, 0.0)) / n, np.nan)
+
+    # 그룹 순 → 그룹 안에서 pct 오름차순 (NaN 은 그룹 끝)
+    order = np.lexsort((np.where(valid, p, np.inf), g))
+    s = p[order]
+    start = np.concatenate([[0], np.cumsum(res["size"])[:-1]]) if G else np.zeros(0, dtype=np.int64)
+    lo = start + np.maximum(n - 1, 0) // 2
+    hi = start + n // 2
+    at = lambda i: s[np.minimum(i, max(len(s) - 1, 0))] if len(s) else np.full(G, np.nan)
+    res["median"] = np.where(n > 0, (at(lo) + at(np.where(n > 0, hi, lo))) / 2, np.nan)
+
+    if dollar_volume is not None:
+        dv = np.asarray(dollar_volume, dtype=np.float64)[keep]
+        dv = np.where(np.isfinite(dv) & (dv > 0), dv, 0.0)
+        res["dv"] = cnt(dv)
+        total = dv.sum() if dv_total is None else dv_total
+        res["dv_share"] = res["dv"] / total if total > 0 else np.zeros(G)
+    return res
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM 프롬프트용 데이터 압축 인코더 (json.dumps 대체)
+- 블록 = 이름 → dict | 행 dict 리스트 | 스칼라
+    dict          → "[이름] k=v k=v ..." 한 줄
+    행 dict 리스트 → "[이름] col,col,..." 헤더 + CSV 행 (키 반복 없음)
+- fields 로 블록별 사용할 컬럼만 (vwap/open/date 등 모델이 안 쓰는 필드 제거)
+- 숫자는 필드별 표기: 등락률 "-0.44%", 금액 "$34.8B", 수량 "45.5M", 가격 "762.60", RVOL "3.52x",
+  그 외 float 은 유효숫자 4자리
+- 토큰 예산: fit() 이 예산을 넘으면 가장 긴 표부터 꼬리 행을 잘라냄 (랭킹 순서 리스트 전제)
+- 토큰 수: tiktoken 이 있으면 정확히, 없으면 근사 (ASCII 4자 ≈ 1토큰, 그 외 1자 ≈ 1토큰)
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+except Exception:  # 선택 의존성
+    tiktoken = None
+
+
+def _human(x: float, prefix: str = "") -> str:
+    a = abs(x)
+    for div, unit in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if a >= div:
+            return f"{'-' if x < 0 else ''}{prefix}{a / div:.3g}{unit}"
+    return f"{'-' if x < 0 else ''}{prefix}{a:.3g}"
+
+
+def _price(x: float) -> str:
+    return f"{x:.2f}" if abs(x) >= 1 else f"{x:.4g}"
+
+
+FORMATS = {
+    "pct": lambda x: f"{x * 100:.2f}%",
+    "share": lambda x: f"{x * 100:.1f}%",
+    "money": lambda x: _human(x, "$"),
+    "qty": _human,
+    "price": _price,
+    "ratio": lambda x: f"{x:.2f}x",
+    "coef": lambda x: f"{x:.2f}",
+}
+
+# 필드 이름 → 표기 (US/JP 번들·요약 공통 키)
+FIELD_FORMATS = {
+    "pct_change": "pct", "mean": "pct", "median": "pct", "p95": "pct", "p05": "pct", "std": "pct",
+    "dv_top10_share": "share", "dv_top50_share": "share", "vol_top10_share": "share",
+    "dollar_volume": "money", "volume": "qty",
+    "close": "price", "open": "price", "vwap": "price",
+    "ret5": "pct", "ret20": "pct", "ret60": "pct", "vol20": "pct",
+    "rvol5": "ratio", "rvol20": "ratio", "adv5": "money", "adv20": "money", "adv60": "money",
+    "cont_rate": "share", "rev_rate": "share", "last_cont_rate": "share", "last_rev_rate": "share",
+    "avg_fwd": "pct", "last_avg_fwd": "pct",
+    "dv_share": "share", "corr": "coef",
+}
+
+LEGEND = ("表記: %=騰落率/シェア, $=売買代金(ドル), K/M/B=千/百万/十億, x=RVOL(当日代金/直近平均), "
+          "retN=終値ベースN日累積騰落率, streak=終値ベース連騰(+)/連続下落(-)日数, "
+          "表は1行目が列名のCSV")
+
+
+def fmt(key: str, v, formats: Dict[str, str] = FIELD_FORMATS) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, bool) or isinstance(v, int) and key not in formats:
+        return str(v)
+    if isinstance(v, (int, float)):
+        if isinstance(v, float) and not math.isfinite(v):
+            return ""
+        f = formats.get(key)
+        return FORMATS[f](v) if f else f"{v:.4g}"
+    s = str(v)
+    return f'"{s}"' if ("," in s or " " in s) else s
+
+
+def _block_lines(name: str, obj, cols: Optional[Sequence[str]], formats) -> List[str]:
+    if isinstance(obj, dict):
+        keys = cols or list(obj)
+        return [f"[{name}] " + " ".join(f"{k}={fmt(k, obj.get(k), formats)}" for k in keys)]
+    if isinstance(obj, list) and obj and all(isinstance(r, dict) for r in obj):
+        keys = list(cols) if cols else list(dict.fromkeys(k for r in obj for k in r))
+        return [f"[{name}] " + ",".join(keys)] + [",".join(fmt(k, r.get(k), formats) for k in keys) for r in obj]
+    if isinstance(obj, list):
+        return [f"[{name}] " + ",".join(fmt(name, x, formats) for x in obj)]
+    return [f"[{name}] {fmt(name, obj, formats)}"]
+
+
+def encode(blocks: Dict[str, object], fields: Optional[Dict[str, Sequence[str]]] = None,
+           formats: Dict[str, str] = FIELD_FORMATS, legend: bool = True) -> str:
+    fields = fields or {}
+    lines = [LEGEND] if legend else []
+    for name, obj in blocks.items():
+        lines += _block_lines(name, obj, fields.get(name), formats)
+    return "\n".join(lines)
+
+
+def count_tokens(text: str, encoding: str = "o200k_base") -> Tuple[int, str]:
+    """(토큰 수, 방식) — 방식은 'tiktoken' 또는 'approx'."""
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.get_encoding(encoding).encode(text)), "tiktoken"
+        except Exception:
+            pass
+    ascii_n = sum(1 for c in text if ord(c) < 128)
+    return math.ceil(ascii_n / 4) + (len(text) - ascii_n), "approx"
+
+
+def fit(blocks: Dict[str, object], budget: Optional[int], fields: Optional[Dict[str, Sequence[str]]] = None,
+        min_rows: int = 5, formats: Dict[str, str] = FIELD_FORMATS) -> Tuple[str, int, Dict[str, int]]:
+    """
+    encode 후 budget(토큰) 을 넘으면 행이 가장 많은 표의 꼬리를 약 20%씩 잘라 다시 인코딩.
+    반환: (텍스트, 토큰 수, 표별 잘라낸 행 수). 표가 모두 min_rows 이하면 예산을 넘어도 반환.
+    """
+    blocks = dict(blocks)
+    dropped: Dict[str, int] = {}
+    while True:
+        text = encode(blocks, fields, formats)
+        n, _ = count_tokens(text)
+        if not budget or n <= budget:
+            return text, n, dropped
+        tables = [(len(v), k) for k, v in blocks.items()
+                  if isinstance(v, list) and len(v) > min_rows and isinstance(v[0], dict)]
+        if not tables:
+            return text, n, dropped
+        rows, name = max(tables)
+        keep = max(min_rows, rows - max(1, rows // 5))
+        blocks[name] = blocks[name][:keep]
+        dropped[name] = dropped.get(name, 0) + rows - keep
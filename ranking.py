@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+단일 패스 top-K 랭킹 엔진 (US/JPX fetcher 공용)
+- 입력: 행(dict) 리스트 + 선언적 스펙 [(name, metric, filter, k, direction), ...]
+- 스펙마다 크기 k 의 bounded heap 을 유지 → 리스트당 O(n log k)
+- 동률: 입력 순서가 앞선 행이 위 (기존 sorted(..., key=metric) 의 안정 정렬과 같은 순서)
+- metric 이 None/NaN 인 행, filter 가 False 인 행은 해당 리스트에서 제외
+- rank_columns(): NumPy 컬럼 입력용. 스펙별 argpartition 으로 O(n) 선택 후 k 개만 정렬
+  (이 경우 filter 는 컬럼 dict → bool 마스크를 반환하는 함수)
+"""
+
+import heapq
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+
+class RankSpec(NamedTuple):
+    name: str
+    metric: Union[str, Callable[[dict], Optional[float]]]
+    filter: Optional[Callable[[dict], bool]] = None
+    k: int = 10
+    direction: str = "desc"   # "desc" | "asc"
+
+
+class _Entry:
+    """heap 원소. a < b 는 'a 가 b 보다 순위가 낮다' 를 뜻한다 (루트 = 현재 k위)."""
+    __slots__ = ("v", "i", "row", "desc")
+
+    def __init__(self, v, i, row, desc):
+        self.v = v; self.i = i; self.row = row; self.desc = desc
+
+    def __lt__(self, other: "_Entry") -> bool:
+        if self.v != other.v:
+            return (self.v < other.v) if self.desc else (self.v > other.v)
+        return self.i > other.i
+
+
+def _getter(metric):
+    if callable(metric):
+        return metric
+    return lambda r: r.get(metric)
+
+
+def rank(rows: Iterable[dict], specs: Sequence[RankSpec]) -> Dict[str, List[dict]]:
+    """모든 스펙의 top-K 리스트를 한 번의 순회로 계산. 반환 순서는 specs 순서."""
+    # plan 원소: [getter, filter, k, desc, heap, 현재 k위 값(컷오프)]
+    plan = []
+    for s in specs:
+        if s.direction not in ("desc", "asc"):
+            raise ValueError(f"RankSpec {s.name}: direction must be 'desc' or 'asc'")
+        plan.append([_getter(s.metric), s.filter, s.k, s.direction == "desc", [], None])
+
+    for i, r in enumerate(rows):
+        for p in plan:
+            get, flt, k, desc, heap, cut = p
+            if flt is not None and not flt(r):
+                continue
+            v = get(r)
+            if v is None or v != v:
+                continue
+            # 컷오프보다 확실히 낮으면 객체 생성 없이 건너뜀
+            if cut is not None and ((v < cut) if desc else (v > cut)):
+                continue
+            if k <= 0:
+                continue
+            e = _Entry(v, i, r, desc)
+            if len(heap) < k:
+                heapq.heappush(heap, e)
+            elif heap[0] < e:
+                heapq.heapreplace(heap, e)
+            else:
+                continue
+            if len(heap) == k:
+                p[5] = heap[0].v
+
+    return {s.name: [e.row for e in sorted(p[4], reverse=True)] for s, p in zip(specs, plan)}
+
+
+def rank_columns(cols: Dict[str, np.ndarray], specs: Sequence[RankSpec]) -> Dict[str, np.ndarray]:
+    """
+    컬럼 dict 에 대한 top-K. 반환: 스펙 이름 → 순위순 행 인덱스 배열.
+    k 위 값과 같은 동률 후보까지 모두 남긴 뒤 (메트릭, 인덱스) 로 정렬하므로
+    rank() 와 같은 결과를 낸다.
+    """
+    out = {}
+    for s in specs:
+        if s.direction not in ("desc", "asc"):
+            raise ValueError(f"RankSpec {s.name}: direction must be 'desc' or 'asc'")
+        m = np.asarray(s.metric(cols) if callable(s.metric) else cols[s.metric], dtype=np.float64)
+        ok = np.isfinite(m)
+        if s.filter is not None:
+            ok &= np.asarray(s.filter(cols), dtype=bool)
+        idx = np.flatnonzero(ok)
+        key = -m[idx] if s.direction == "desc" else m[idx]
+        k = max(0, min(s.k, len(idx)))
+        if k == 0:
+            out[s.name] = idx[:0]
+            continue
+        if k < len(idx):
+            kth = key[np.argpartition(key, k - 1)[k - 1]]
+            cand = key <= kth
+            idx, key = idx[cand], key[cand]
+        order = np.lexsort((idx, key))[:k]
+        out[s.name] = idx[order]
+    return out
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+로컬 content-addressed 응답 캐시
+- 키: 호출자가 정한 구성요소(예: API 키를 뺀 URL)의 sha256
+- 배치: {root}/{key[:2]}/{key}.bin (본문) + {key}.json (메타: 생성 시각, 크기, 임의 필드)
+- 만료: ttl(초) 경과 시 miss. 용량: max_bytes 초과 시 마지막 사용이 오래된 순으로 삭제
+- 쓰기는 임시 파일 → os.replace 로 원자적. 스트리밍 응답은 writer() 로 흘려 쓰기
+"""
+
+import os, json, time, hashlib
+from pathlib import Path
+from typing import Optional
+
+
+def cache_key(*parts) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode("utf-8")); h.update(b"\0")
+    return h.hexdigest()
+
+
+class _Writer:
+    """본문을 임시 파일에 쓰다가 commit() 시에만 캐시에 반영."""
+    def __init__(self, cache: "ResponseCache", key: str, meta: dict):
+        self.cache, self.key, self.meta = cache, key, meta
+        self.bin = cache._paths(key)[0]
+        self.bin.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.bin.with_name(f"{self.bin.name}.{os.getpid()}.tmp")
+        self.fp = self.tmp.open("wb")
+        self.done = False
+
+    def write(self, data: bytes):
+        self.fp.write(data)
+
+    def commit(self, **extra):
+        self.fp.close()
+        self.meta.update(extra)
+        self.cache._commit(self.key, self.tmp, self.meta)
+        self.done = True
+
+    def abort(self):
+        if not self.fp.closed:
+            self.fp.close()
+        self.tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self.done:
+            self.abort()
+
+
+class ResponseCache:
+    def __init__(self, root, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def _paths(self, key: str):
+        d = self.root / key[:2]
+        return d / f"{key}.bin", d / f"{key}.json"
+
+    # --------------------
+    # 읽기
+    # --------------------
+    def meta(self, key: str, ttl: Optional[float] = None, touch: bool = True) -> Optional[dict]:
+        """유효한 항목의 메타(없거나 만료면 None). 조회 시 사용 시각 갱신(LRU)."""
+        b, m = self._paths(key)
+        try:
+            meta = json.loads(m.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not b.exists():
+            return None
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl >= 0 and time.time() - meta.get("created", 0) > ttl:
+            return None
+        if touch:
+            os.utime(m, None)
+        return meta
+
+    def open(self, key: str):
+        return self._paths(key)[0].open("rb")
+
+    def get_bytes(self, key: str, ttl: Optional[float] = None) -> Optional[bytes]:
+        if self.meta(key, ttl) is None:
+            return None
+        return self._paths(key)[0].read_bytes()
+
+    # --------------------
+    # 쓰기
+    # --------------------
+    def writer(self, key: str, **meta) -> _Writer:
+        return _Writer(self, key, meta)
+
+    def put_bytes(self, key: str, data: bytes, **meta):
+        with self.writer(key, **meta) as w:
+            w.write(data)
+            w.commit()
+
+    def _commit(self, key: str, tmp: Path, meta: dict):
+        b, m = self._paths(key)
+        meta = dict(meta, created=time.time(), size=tmp.stat().st_size)
+        os.replace(tmp, b)
+        mt = m.with_name(m.name + ".tmp")
+        mt.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(mt, m)
+        self.evict()
+
+    def delete(self, key: str):
+        for p in self._paths(key):
+            p.unlink(missing_ok=True)
+
+    def evict(self):
+        """총 크기가 max_bytes 를 넘으면 오래 안 쓴 항목부터 삭제."""
+        if not self.max_bytes or not self.root.exists():
+            return
+        items, total = [], 0
+        for m in self.root.glob("*/*.json"):
+            b = m.with_suffix(".bin")
+            try:
+                sz = b.stat().st_size
+                items.append((m.stat().st_mtime, sz, m.stem))
+                total += sz
+            except OSError:
+                continue
+        for _, sz, key in sorted(items):
+            if total <= self.max_bytes:
+                break
+            self.delete(key)
+            total -= sz
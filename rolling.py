@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+종목별 롤링 윈도우 지표 (증분 엔진)
+- 위치: data/history/{market}/rolling.npz (히스토리 저장소와 같은 캐시 디렉터리)
+- 배열 인덱스 = HistoryStore ticker id (직접 주소). 종목마다:
+    ring_dv / ring_ret : 최근 RING(60)개 관측의 거래대금 / 일간 수익률 링 버퍼
+    sums               : 윈도우(5/20/60)별 누적합 — 거래대금, log(1+r), r, r²
+    count, streak, rvol, last_day, last_close
+- 일간 수익률 r = 종가 / 직전 날짜 종가 - 1 (저장소 pct_change 는 US 가 시가→종가라 쓰지 않음)
+  첫 관측이거나 종가가 없으면 0
+- 하루 갱신 = 그날 행이 있는 종목만 벡터 연산, 종목당 O(1)
+  (윈도우마다 링에서 빠지는 값 1개를 빼고 새 값 1개를 더함 → 전체 재계산 없음)
+- 입력: 저장소 행(top 리스트 합집합) + data/universe/{market}/{date}.npz 전체 유니버스가 있으면 그 행
+  (저장소에 id 가 있는 종목만, 같은 종목은 저장소 행 우선) → 스냅샷이 있으면 매일 모든 종목이 갱신됨
+- 연속성: 직전 날짜에 행이 없던 종목은 상태를 지우고 새로 시작 (streak/윈도우/직전 종가 모두)
+  → 윈도우는 항상 빈 날 없는 최근 N 거래일, obs = 연속 관측 수
+  (스냅샷 없이 저장소만 있으면 리스트를 들락날락한 종목은 obs 가 짧음)
+- 지표:
+    adv{N}   : N일 평균 거래대금 (오늘 포함)
+    rvol{N}  : 오늘 거래대금 / 직전 N일 평균 (오늘 제외, N = 5, 20)
+    ret{N}   : N일 누적 수익률 = exp(Σ log(1+r)) - 1
+    vol{N}   : N일 일간 수익률 표준편차
+    streak   : 종가 기준 연속 상승(+) / 하락(-) 일수 (보합이면 0)
+- advance(): 저장소의 새 날짜만 순서대로 반영. 과거 날짜가 바뀌었으면(지문 불일치) 처음부터 재계산
+    python rolling.py --market us                # 갱신 + 상태 출력
+    python rolling.py --market us --top 20       # RVOL 상위
+"""
+
+import os, sys, argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from history_store import HistoryStore, DEFAULT_ROOT, UNIVERSE_ROOT, load_universe, universe_path
+
+WINDOWS = (5, 20, 60)
+RVOL_WINDOWS = (5, 20)
+RING = max(WINDOWS)
+VERSION = 3                         # 상태 파일 형식/정의가 바뀌면 올림 → 옛 상태는 재계산
+SUMS = ("dv", "lr", "r", "r2")
+METRICS = tuple(f"adv{w}" for w in WINDOWS) + tuple(f"rvol{w}" for w in RVOL_WINDOWS) \
+    + tuple(f"ret{w}" for w in WINDOWS) + ("vol20", "streak", "obs")
+
+
+class RollingState:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.reset()
+        if self.path.exists():
+            try:
+                with np.load(self.path) as z:
+                    if tuple(z["windows"].tolist()) == WINDOWS and "version" in z.files \
+                            and int(z["version"]) == VERSION:
+                        for k in ("count", "streak", "last_day", "last_close", "ring_dv", "ring_ret",
+                                  "sums", "rvol"):
+                            setattr(self, k, z[k].copy())
+                        self.days = int(z["days"])
+                        self.date = str(z["date"])
+                        self.fingerprint = str(z["fingerprint"])
+            except Exception as e:
+                print(f"WARN: rolling state unreadable, rebuilding ({e})", file=sys.stderr)
+                self.reset()
+
+    def reset(self, n: int = 0):
+        self.days = 0                   # 반영한 날짜 수 (= 다음 날짜의 day 번호)
+        self.date = ""
+        self.fingerprint = ""
+        self.count = np.zeros(n, dtype=np.int32)
+        self.streak = np.zeros(n, dtype=np.int16)
+        self.last_day = np.full(n, -1, dtype=np.int32)
+        self.last_close = np.full(n, np.nan)
+        self.ring_dv = np.zeros((n, RING))
+        self.ring_ret = np.zeros((n, RING))
+        self.sums = np.zeros((len(SUMS), len(WINDOWS), n))
+        self.rvol = np.full((len(RVOL_WINDOWS), n), np.nan)
+
+    def _grow(self, n: int):
+        m = len(self.count)
+        if n <= m:
+            return
+        n = max(n, m + m // 2)
+        pad = lambda a, fill: np.concatenate([a, np.full(a.shape[:-1] + (n - m,), fill, dtype=a.dtype)], axis=-1)
+        self.count, self.streak, self.last_day = pad(self.count, 0), pad(self.streak, 0), pad(self.last_day, -1)
+        self.sums, self.rvol = pad(self.sums, 0.0), pad(self.rvol, np.nan)
+        self.last_close = pad(self.last_close, np.nan)
+        self.ring_dv = np.concatenate([self.ring_dv, np.zeros((n - m, RING))])
+        self.ring_ret = np.concatenate([self.ring_ret, np.zeros((n - m, RING))])
+
+    def update(self, date_str: str, tids, dollar_volume, close):
+        """하루치 반영 (tids 는 그날 고유 ticker id). NaN 은 0 으로 (관측 수에는 포함)."""
+        t = np.asarray(tids, dtype=np.int64)
+        if len(t):
+            self._grow(int(t.max()) + 1)
+        g = t[self.last_day[t] != self.days - 1]                 # 직전 날짜에 없던 종목 → 새로 시작
+        self.count[g], self.streak[g], self.last_close[g] = 0, 0, np.nan
+        self.sums[:, :, g], self.rvol[:, g] = 0.0, np.nan
+        dv = np.nan_to_num(np.asarray(dollar_volume, dtype=np.float64), nan=0.0)
+        px = np.asarray(close, dtype=np.float64)
+        prev = self.last_close[t]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = np.where((px > 0) & (prev > 0), px / prev - 1.0, 0.0)
+        self.last_close[t] = np.where(px > 0, px, prev)
+        new = {"dv": dv, "lr": np.log1p(np.maximum(r, -0.999999)), "r": r, "r2": r * r}
+        c = self.count[t].astype(np.int64)
+
+        # RVOL: 갱신 전 합계 = 직전 min(c, N) 관측
+        for i, w in enumerate(RVOL_WINDOWS):
+            prev = self.sums[0, WINDOWS.index(w), t]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.rvol[i, t] = np.where((c > 0) & (prev > 0), dv * np.minimum(c, w) / prev, np.nan)
+
+        old_ret = {w: self.ring_ret[t, (c - w) % RING] for w in WINDOWS}
+        old_dv = {w: self.ring_dv[t, (c - w) % RING] for w in WINDOWS}
+        for j, w in enumerate(WINDOWS):
+            has = c >= w
+            op = np.where(has, old_ret[w], 0.0)
+            old = {"dv": np.where(has, old_dv[w], 0.0), "lr": np.log1p(np.maximum(op, -0.999999)),
+                   "r": op, "r2": op * op}
+            for k, name in enumerate(SUMS):
+                self.sums[k, j, t] += new[name] - old[name]
+
+        slot = c % RING
+        self.ring_dv[t, slot] = dv
+        self.ring_ret[t, slot] = r
+        s = self.streak[t].astype(np.int32)
+        self.streak[t] = np.where(r > 0, np.maximum(s, 0) + 1, np.where(r < 0, np.minimum(s, 0) - 1, 0))
+        self.count[t] = c + 1
+        self.last_day[t] = self.days
+        self.days += 1
+        self.date = date_str
+
+    def metrics(self, tids) -> Dict[str, np.ndarray]:
+        """ticker id 배열 → 지표 배열 dict. 마지막 반영일에 행이 없던 종목(또는 -1)은 NaN."""
+        t = np.asarray(tids, dtype=np.int64)
+        if not len(self.count):
+            return {k: np.full(len(t), np.nan) for k in METRICS}
+        ok = (t >= 0) & (t < len(self.count))
+        ts = np.where(ok, t, 0)
+        ok &= self.last_day[ts] == self.days - 1
+        out: Dict[str, np.ndarray] = {}
+        c = self.count[ts].astype(np.float64)
+        for j, w in enumerate(WINDOWS):
+            n = np.maximum(np.minimum(c, w), 1)
+            out[f"adv{w}"] = np.where(ok, self.sums[0, j, ts] / n, np.nan)
+            out[f"ret{w}"] = np.where(ok, np.expm1(self.sums[1, j, ts]), np.nan)
+            if w == 20:
+                m = self.sums[2, j, ts] / n
+                var = np.maximum(self.sums[3, j, ts] / n - m * m, 0.0)
+                out["vol20"] = np.where(ok & (n > 1), np.sqrt(var), np.nan)
+        for i, w in enumerate(RVOL_WINDOWS):
+            out[f"rvol{w}"] = np.where(ok, self.rvol[i, ts], np.nan)
+        out["streak"] = np.where(ok, self.streak[ts], np.nan)
+        out["obs"] = np.where(ok, c, np.nan)
+        return {k: out[k] for k in METRICS}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        np.savez_compressed(tmp, version=VERSION, windows=np.asarray(WINDOWS), days=self.days,
+                            date=self.date, fingerprint=self.fingerprint, count=self.count,
+                            streak=self.streak, last_day=self.last_day, last_close=self.last_close,
+                            ring_dv=self.ring_dv, ring_ret=self.ring_ret, sums=self.sums, rvol=self.rvol)
+        os.replace(tmp, self.path)
+
+
+def state_path(store: HistoryStore) -> Path:
+    return store.dir / "rolling.npz"
+
+
+def advance(store: HistoryStore, save: bool = True,
+            universe_root: Optional[Path] = UNIVERSE_ROOT) -> RollingState:
+    """저장소에 새로 생긴 날짜만 반영 (상태가 없거나 과거가 바뀌었으면 처음부터)."""
+    st = RollingState(state_path(store))
+    parts = store._index()["parts"]
+    if st.days > len(parts) or store.fingerprint(st.days) != st.fingerprint:
+        st.reset(len(store.symbols()))
+    todo = parts[st.days:]
+    if not todo:
+        return st
+    d = store.load_range(todo[0]["date"], todo[-1]["date"], ("dollar_volume", "close"))
+    tid = np.asarray(d["ticker_id"])
+    dv, px = np.asarray(d["dollar_volume"]), np.asarray(d["close"])
+    bounds = np.cumsum([0] + [p["rows"] for p in todo])
+    for i, p in enumerate(todo):
+        sl = slice(bounds[i], bounds[i + 1])
+        ids, dvs, pxs = [tid[sl]], [dv[sl]], [px[sl]]
+        up = universe_path(store.market, p["date"], universe_root) if universe_root else None
+        if up is not None and up.exists():
+            u = load_universe(up)
+            uid = store.ids_for(u["ticker"].tolist())
+            ok = uid >= 0
+            ids.append(uid[ok]); dvs.append(u["dollar_volume"][ok]); pxs.append(u["close"][ok])
+        ids, dvs, pxs = np.concatenate(ids), np.concatenate(dvs), np.concatenate(pxs)
+        t, first = np.unique(ids, return_index=True)           # 같은 날 중복은 첫 행 (저장소 행 우선)
+        st.update(p["date"], t, dvs[first], pxs[first])
+    st.fingerprint = store.fingerprint()
+    if save:
+        st.save()
+    return st
+
+
+def lookup(market: str, date_str: str, tickers: Sequence[str],
+           root: Path = DEFAULT_ROOT) -> Optional[Dict[str, dict]]:
+    """
+    요약기용: 저장소를 date_str 까지 갱신한 뒤 ticker → {지표: 값}.
+    저장소가 없거나 마지막 날짜가 date_str 가 아니면 None (다른 날짜의 지표를 섞지 않음).
+    """
+    store = HistoryStore(market, root)
+    if not (store.dir / "index.json").exists():
+        return None
+    try:
+        st = advance(store)
+    except Exception as e:
+        print(f"WARN: rolling metrics unavailable ({e})", file=sys.stderr)
+        return None
+    if st.date != date_str:
+        return None
+    tickers = list(dict.fromkeys(tickers))
+    m = st.metrics(store.ids_for(tickers))
+    cols = {k: v.tolist() for k, v in m.items()}
+    out = {}
+    for i, tk in enumerate(tickers):
+        if cols["obs"][i] != cols["obs"][i]:
+            continue
+        row = {k: (None if cols[k][i] != cols[k][i] else cols[k][i]) for k in METRICS}
+        row["streak"], row["obs"] = int(row["streak"]), int(row["obs"])
+        out[tk] = row
+    return out
+
+
+def leaders(metrics: Dict[str, dict], key: str, n: int = 10, min_obs: int = 1,
+            reverse: bool = True, where=None) -> List[str]:
+    """지표 key 기준 상위 n 종목 (값 없음/관측 부족 제외, 동률은 입력 순서 유지)."""
+    items = [(tk, m[key]) for tk, m in metrics.items()
+             if m.get(key) is not None and m["obs"] >= min_obs and (where is None or where(tk, m))]
+    items.sort(key=lambda x: -x[1] if reverse else x[1])
+    return [tk for tk, _ in items[:n]]
+
+
+def highlights(rows: Sequence[dict], metrics: Optional[Dict[str, dict]], n: int = 10,
+               min_streak: int = 3) -> Dict[str, List[dict]]:
+    """
+    요약기 공용 블록 (metrics 가 없으면 빈 리스트):
+      rvol   : RVOL(20) 상위 n — 직전 20 관측이 있는 종목만
+      streaks: 연속 상승 상위 n//2 + 연속 하락 상위 n//2 (|streak| >= min_streak)
+    """
+    if not metrics:
+        return {"rvol": [], "streaks": []}
+    by = {r["ticker"]: r for r in rows if r.get("ticker") in metrics}
+    ms = {tk: metrics[tk] for tk in by}
+    base = lambda tk, keys: {"ticker": tk, "pct_change": by[tk].get("pct_change"),
+                             **{k: ms[tk][k] for k in keys}}
+    rvol = [dict(base(tk, ("rvol20", "rvol5", "ret5")), dollar_volume=by[tk].get("dollar_volume"))
+            for tk in leaders(ms, "rvol20", n, min_obs=RVOL_WINDOWS[-1] + 1)]
+    up = leaders(ms, "streak", n // 2, where=lambda tk, m: m["streak"] >= min_streak)
+    down = leaders(ms, "streak", n // 2, reverse=False, where=lambda tk, m: m["streak"] <= -min_streak)
+    return {"rvol": rvol, "streaks": [base(tk, ("streak", "ret5", "ret20")) for tk in up + down]}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--market", default="us")
+    ap.add_argument("--history-dir", default=str(DEFAULT_ROOT))
+    ap.add_argument("--rebuild", action="store_true", help="상태를 버리고 전체 히스토리로 재계산")
+    ap.add_argument("--top", type=int, default=0, help="RVOL(20) 상위 N 출력")
+    args = ap.parse_args()
+
+    store = HistoryStore(args.market, Path(args.history_dir))
+    if args.rebuild and state_path(store).exists():
+        state_path(store).unlink()
+    st = advance(store)
+    live = int((st.last_day == st.days - 1).sum()) if len(st.last_day) else 0
+    print(f"{state_path(store)}: {st.days} day(s) through {st.date or '-'}, {live} ticker(s) on last day")
+    if args.top and st.days:
+        syms = store.symbols()
+        tids = np.flatnonzero(st.last_day == st.days - 1)
+        m = st.metrics(tids)
+        ok = (m["obs"] > RVOL_WINDOWS[-1]) & np.isfinite(m["rvol20"])
+        order = np.flatnonzero(ok)[np.argsort(-m["rvol20"][ok], kind="stable")][:args.top]
+        print("ticker,rvol20,rvol5,ret5,ret20,streak,obs")
+        for i in order.tolist():
+            print(f"{syms[tids[i]]},{m['rvol20'][i]:.2f},{m['rvol5'][i]:.2f},{m['ret5'][i] * 100:.2f}%,"
+                  f"{m['ret20'][i] * 100:.2f}%,{int(m['streak'][i])},{int(m['obs'][i])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JPX fetch_batch 프레임 추출 벤치마크 (네트워크 불필요)
+- legacy : 종목마다 df[t].dropna() → iloc[-1]/iloc[-2] → float(get(...)) (이전 fetch_batch)
+- vector : extract_bars() — long 형식 변환 후 종목 경계로 마지막/직전 행을 컬럼 단위 계산
+사용: python scripts/bench_jpx_extract.py [--sizes 100 1000 4000] [--days 3] [--repeat 3]
+"""
+import sys, time, argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import fetch_jpx_toplists as fj
+
+
+def synth_frame(n: int, days: int, seed: int = 7):
+    """yf.download(group_by="ticker") 와 같은 (Ticker, Price) 컬럼 프레임. 일부 결측 포함."""
+    rnd = np.random.default_rng(seed)
+    idx = pd.DatetimeIndex(pd.bdate_range(end="2025-09-19", periods=days), name="Date")
+    tickers = [f"{1300 + i}.T" for i in range(n)]
+    frames = {}
+    for t in tickers:
+        close = rnd.lognormal(7, 1, days).round(1)
+        f = pd.DataFrame({"Open": close * (1 + rnd.normal(0, 0.01, days)), "High": close * 1.01,
+                          "Low": close * 0.99, "Close": close, "Adj Close": close,
+                          "Volume": rnd.lognormal(11, 2, days).round()}, index=idx)
+        if rnd.random() < 0.03:
+            f.iloc[-1] = np.nan          # 당일 거래 없음
+        if rnd.random() < 0.01:
+            f.iloc[:] = np.nan           # 전 기간 없음
+        frames[t] = f
+    return pd.concat(frames, axis=1, names=["Ticker", "Price"]), tickers
+
+
+def legacy(df, tickers):
+    rows = []
+    for t in tickers:
+        if t not in df.columns.get_level_values(0):
+            continue
+        cdf = df[t].dropna()
+        if cdf.empty or len(cdf) < 2:
+            continue
+        last, prev = cdf.iloc[-1], cdf.iloc[-2]
+        o = float(last.get("Open", float("nan")))
+        c = float(last.get("Close", float("nan")))
+        v = float(last.get("Volume", float("nan")))
+        pct = None
+        if pd.notna(c) and pd.notna(prev.get("Close")) and prev["Close"] != 0:
+            pct = (c - float(prev["Close"])) / float(prev["Close"])
+        if pd.isna(c) or pd.isna(v):
+            continue
+        rows.append({"ticker": t.replace(".T", ""), "open": o, "close": c, "volume": v,
+                     "dollar_volume": v * c, "pct_change": pct})
+    return rows
+
+
+def vector(df, tickers):
+    return fj.extract_bars(df, tickers)[0]
+
+
+def best_of(fn, df, tickers, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter(); res = fn(df, tickers); best = min(best, time.perf_counter() - t)
+    return best, res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 4000])
+    ap.add_argument("--days", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    keys = ("ticker", "open", "close", "volume", "dollar_volume", "pct_change")
+    print(f"{'tickers':>8} {'legacy ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        df, tickers = synth_frame(n, args.days)
+        t_old, a = best_of(legacy, df, tickers, args.repeat)
+        t_new, b = best_of(vector, df, tickers, args.repeat)
+        assert [tuple(r[k] for k in keys) for r in a] == [tuple(r[k] for k in keys) for r in b], "rows mismatch"
+        print(f"{n:>8} {t_old * 1e3:>10.1f} {t_new * 1e3:>10.1f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Polygon grouped 응답 정규화 + 랭킹 벤치마크 (네트워크 불필요)
+- legacy : 행마다 f() 변환 + dict 생성 + sorted() 4회 (이전 fetch_polygon_toplists.main)
+- vector : ingest_grouped() → rank_columns(argpartition) → 리스트 행만 dict 화
+사용: python scripts/bench_polygon_ingest.py [--sizes 12483 200000] [--repeat 3]
+"""
+import sys, time, random, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import fetch_polygon_toplists as fp
+
+
+def synth_results(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        c = round(rnd.lognormvariate(3, 1.5), 4)
+        o = round(c * (1 + rnd.gauss(0, 0.03)), 4)
+        r = {"T": f"T{i:06d}", "o": o, "h": max(o, c) * 1.01, "l": min(o, c) * 0.99, "c": c,
+             "v": float(int(rnd.lognormvariate(11, 2))), "n": rnd.randint(1, 50000), "t": 0}
+        if rnd.random() > 0.02:
+            r["vw"] = round((o + c) / 2, 4)
+        out.append(r)
+    return out
+
+
+def legacy(raw, dstr):
+    f = fp.f
+    rows = []
+    for r in raw:
+        T = r.get("T"); v = f(r.get("v")); vw = f(r.get("vw")); c = f(r.get("c")); o = f(r.get("o"))
+        if not T or v is None or c is None or o is None: continue
+        dv = v * (vw if (vw and vw > 0) else c)
+        pct = (c - o) / o if o > 0 else None
+        rows.append({"ticker": T, "open": o, "close": c, "vwap": vw, "volume": v,
+                     "dollar_volume": dv, "pct_change": pct, "date": dstr})
+    rows_by_dv = sorted([r for r in rows if r["dollar_volume"] is not None], key=lambda x: x["dollar_volume"], reverse=True)
+    top600 = rows_by_dv[:600]
+    sorted(rows, key=lambda x: x["volume"] if x["volume"] is not None else -1, reverse=True)[:10]
+    pool = [r for r in rows if r["close"] is not None and r["close"] >= 10 and r["pct_change"] is not None]
+    sorted(pool, key=lambda x: x["pct_change"], reverse=True)[:10]
+    sorted(pool, key=lambda x: x["pct_change"])[:10]
+    return top600
+
+
+def vector(raw, dstr):
+    cols = fp.ingest_grouped(raw)
+    lists, _ = fp.build_lists(cols, dstr)
+    return lists["universe_top600_by_dollar"]
+
+
+def best_of(fn, raw, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter(); res = fn(raw, "2025-01-02"); best = min(best, time.perf_counter() - t)
+    return best, res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[12483, 200000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'rows':>8} {'legacy ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        raw = synth_results(n)
+        t_old, a = best_of(legacy, raw, args.repeat)
+        t_new, b = best_of(vector, raw, args.repeat)
+        assert [r["ticker"] for r in a] == [r["ticker"] for r in b], "top600 mismatch"
+        print(f"{n:>8} {t_old * 1e3:>10.1f} {t_new * 1e3:>10.1f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
 #!/usr/bin/env python3
 # JPX universe builder with yfinance validation
-import os, re, io, sys, csv, time
+# - 검증 결과는 data/jpx_validation.json 에 코드별로 캐시 (checked, last_seen)
+#   TTL 이 지나지 않은 코드는 재검증하지 않음. data/jpx_last_close.npz 에 최근 거래일이
+#   기록된 코드도 검증된 것으로 취급 → 평소에는 신규/만료 코드만 동시 요청으로 확인
+import os, re, io, sys, csv, json, time, codecs
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, timedelta
+from html.parser import HTMLParser
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from throttle import AdaptiveScheduler, TokenBucket
+from response_cache import ResponseCache, cache_key
+from last_close import LastCloseStore, DEFAULT_PATH as LAST_CLOSE_PATH
+from ticker_meta import TickerMeta, DEFAULT_PATH as META_PATH, SRC_UNIVERSE
+
 # yfinance 검증용
 import warnings, logging
 warnings.filterwarnings("ignore")
@@ -14,10 +29,16 @@ import yfinance as yf
 OUT = Path("data"); OUT.mkdir(parents=True, exist_ok=True)
 TICKERS_TXT = OUT / "jpx_tickers.txt"
 NAMES_CSV   = OUT / "jpx_names.csv"
+VALIDATION_JSON = OUT / "jpx_validation.json"
+VALIDATION_TTL_DAYS = int(os.getenv("JPX_VALIDATION_TTL_DAYS", "7"))
+VALIDATE_CHUNK = 200
 
 UA = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/123 Safari/537.36"}
 JPX_PAGE = "https://www.jpx.co.jp/markets/statistics-equities/misc/01.html"
-STOCKANALYSIS = "https://stockanalysis.com/list/tokyo-stock-exchange/"
+STOCKANALYSIS = os.getenv("STOCKANALYSIS_URL", "https://stockanalysis.com/list/tokyo-stock-exchange/")
+SA_WORKERS = int(os.getenv("SA_WORKERS", "4"))      # 동시 요청 페이지 수
+SA_RPM = float(os.getenv("SA_RPM", "300"))          # 분당 요청 상한 (예의상)
+SA_CACHE_DIR = Path(os.getenv("SA_CACHE_DIR", ".cache/stockanalysis"))
 
 # 최소 시드
 SEED = [
@@ -74,18 +95,111 @@ def from_jpx():
     except Exception:
         return None
 
-def from_stockanalysis():
+class SAListParser(HTMLParser):
+    """
+    stockanalysis 목록 표 → [(code, name)] (스트리밍 토크나이저, feed() 를 조각마다 호출)
+    /stocks/XXXX.T/ 링크가 있는 칸의 바로 다음 칸 텍스트가 종목명
+    """
+    CODE = re.compile(r"/stocks/(\d{4})\.T/")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self._td = 0          # 현재 행의 td 순번
+        self._cell = None     # 열린 td 의 텍스트 조각
+        self._code = None
+        self._name_td = None  # 종목명이 들어 있는 td 순번
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._td, self._code, self._name_td = 0, None, None
+        elif tag == "td":
+            self._td += 1
+            self._cell = []
+        elif tag == "a" and self._cell is not None and self._code is None:
+            m = self.CODE.search(dict(attrs).get("href") or "")
+            if m:
+                self._code, self._name_td = m.group(1), self._td + 1
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._cell is not None:
+            if self._code and self._td == self._name_td:
+                name = "".join(self._cell).strip()
+                if name:
+                    self.rows.append((self._code, name))
+                self._code = None
+            self._cell = None
+
+def fetch_sa_page(session, url, bucket=None, cache=None):
+    """
+    목록 1페이지 → rows (200 이 아니면 None).
+    캐시에 ETag/Last-Modified 가 있으면 조건부 요청, 304 면 캐시 본문을 파싱
+    """
+    key = cache_key("GET", url)
+    meta = cache.meta(key, ttl=-1) if cache else None
+    headers = dict(UA)
+    if meta:
+        if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+    if bucket: bucket.acquire()
+    parser = SAListParser()
+    with session.get(url, headers=headers, timeout=30, stream=True) as r:
+        if r.status_code == 304 and meta:
+            with cache.open(key) as fp:
+                dec = codecs.getincrementaldecoder(meta.get("encoding") or "utf-8")(errors="replace")
+                for chunk in iter(lambda: fp.read(1 << 16), b""):
+                    parser.feed(dec.decode(chunk))
+                parser.feed(dec.decode(b"", final=True))
+            parser.close()
+            return parser.rows
+        if r.status_code != 200:
+            return None
+        enc = r.encoding or "utf-8"
+        etag, lm = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        # 검증자가 있는 응답만 저장 (중간에 실패하면 writer 가 임시 파일을 버림)
+        w = cache.writer(key, url=url, etag=etag, last_modified=lm, encoding=enc) if cache and (etag or lm) else None
+        with w or nullcontext():
+            dec = codecs.getincrementaldecoder(enc)(errors="replace")
+            for chunk in r.iter_content(1 << 16):
+                if w: w.write(chunk)
+                parser.feed(dec.decode(chunk))
+            parser.feed(dec.decode(b"", final=True))
+            parser.close()
+            if w: w.commit()
+    return parser.rows
+
+def from_stockanalysis(base=None, workers=None, max_pages=79, cache_dir=SA_CACHE_DIR):
+    """
+    목록 페이지를 커넥션 풀(Session) 하나로 최대 workers 개씩 동시 요청 (TokenBucket 으로 속도 제한).
+    빈 페이지(또는 200 이 아닌 응답)를 만나면 그 뒤 페이지는 더 요청하지 않고 앞 페이지까지만 사용
+    """
+    base = base or STOCKANALYSIS
+    workers = max(1, workers or SA_WORKERS)
     try:
-        all_rows = []
-        for page in range(1, 80):
-            url = STOCKANALYSIS + (f"?p={page}" if page > 1 else "")
-            r = requests.get(url, headers=UA, timeout=30)
-            if r.status_code != 200: break
-            rows = re.findall(r'/stocks/(\d{4})\.T/.*?</a>\s*</td>\s*<td[^>]*>([^<]+)</td>',
-                              r.text, flags=re.S)
-            if not rows: break
-            all_rows.extend((c.strip(), n.strip()) for c,n in rows)
-            time.sleep(0.2)
+        cache = ResponseCache(cache_dir) if cache_dir else None
+        bucket = TokenBucket(SA_RPM, burst=workers)
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=workers) as ex:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+            session.mount("https://", adapter); session.mount("http://", adapter)
+            url = lambda page: base + (f"?p={page}" if page > 1 else "")
+
+            pages, running = {}, {}
+            nxt, stop = 1, max_pages + 1
+            while running or nxt < stop:
+                while nxt < stop and len(running) < workers:
+                    running[ex.submit(fetch_sa_page, session, url(nxt), bucket, cache)] = nxt
+                    nxt += 1
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    page = running.pop(fut)
+                    pages[page] = fut.result()
+                    if not pages[page]:
+                        stop = min(stop, page)
+        all_rows = [row for page in sorted(pages) if page < stop for row in pages[page]]
         if not all_rows: return None
         seen, rows = set(), []
         for c,n in all_rows:
@@ -96,22 +210,13 @@ def from_stockanalysis():
         return None
 
 def from_repo():
-    p = Path("public/jpx/jpx_universe.csv")
-    if not p.exists(): return None
+    """public/jpx_universe.csv (저장소에 커밋된 유니버스) → ticker_meta 인덱스로 읽음."""
     try:
-        df = pd.read_csv(p)
-        cols = {c.lower(): c for c in df.columns}
-        c_code = cols.get("ticker") or cols.get("code")
-        c_name = cols.get("name") or cols.get("name_ja") or cols.get("jp_name")
-        if not c_code: return None
-        if c_name is None:
-            df["__name"] = ""
-            c_name = "__name"
-        df = df[df[c_code].astype(str).str.match(r"^\d{4}$")]
-        rows = [(str(int(c)), str(n)) for c, n in zip(df[c_code], df[c_name])]
-        return rows if rows else None
+        meta = TickerMeta.open(ROOT / META_PATH, root=ROOT)
     except Exception:
         return None
+    rows = [(e.key, e.name) for e in meta.entries(SRC_UNIVERSE) if re.fullmatch(r"\d{4}", e.key)]
+    return rows if rows else None
 
 def fallback_seed():
     return SEED
@@ -120,43 +225,97 @@ def batched(seq, n):
     for i in range(0, len(seq), n):
         yield seq[i:i+n]
 
-def validate_with_yf(rows):
-    """ yfinance로 최근 3영업일 데이터 존재하는 코드만 통과 """
+def load_validation():
+    try:
+        return json.loads(VALIDATION_JSON.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def save_validation(cache):
+    tmp = VALIDATION_JSON.with_name(VALIDATION_JSON.name + ".tmp")
+    tmp.write_text(json.dumps(dict(sorted(cache.items())), ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, VALIDATION_JSON)
+
+def seen_in_last_close(codes, path=LAST_CLOSE_PATH):
+    """직전 종가 저장소에 기록된 마지막 거래일 {code: 'YYYY-MM-DD'} (fetcher 가 매일 갱신)."""
+    if not Path(path).exists():
+        return {}
+    store = LastCloseStore(path)
+    slots = store.slots(codes)
+    out = {}
+    for c, s in zip(codes, slots.tolist()):
+        if s >= 0 and store.session[s] > 0:
+            out[c] = (date(1970, 1, 1) + timedelta(days=int(store.session[s]))).isoformat()
+    return out
+
+def probe_chunk(chunk):
+    """chunk 코드들의 최근 3영업일 데이터 → {code: 마지막 거래일 or None}"""
+    syms = [c + ".T" for c in chunk]
+    df = yf.download(
+        tickers=syms,
+        period="3d", interval="1d",
+        group_by="ticker", auto_adjust=False,
+        progress=False, threads=True
+    )
+    if df is None or df.empty:
+        # 전부 실패 = 429 일 가능성이 높으므로 재시도 대상
+        raise RuntimeError("yfinance: empty frame (possible rate limit)")
+    if isinstance(df.columns, pd.MultiIndex):
+        close = df.xs("Close", axis=1, level=1) if "Close" in df.columns.get_level_values(1) else df.iloc[:, :0]
+    else:
+        close = df[["Close"]].set_axis(syms[:1], axis=1)
+    valid = close.notna().to_numpy()
+    last_i = len(close) - 1 - valid[::-1].argmax(axis=0)
+    days = pd.DatetimeIndex(close.index).strftime("%Y-%m-%d")
+    seen = {str(t).replace(".T", ""): (days[i] if ok else None)
+            for t, i, ok in zip(close.columns, last_i, valid.any(axis=0))}
+    return {c: seen.get(c) for c in chunk}
+
+def validate_with_yf(rows, today=None, ttl_days=VALIDATION_TTL_DAYS, concurrency=4):
+    """
+    yfinance로 최근 3영업일 데이터 존재하는 코드만 통과.
+    캐시에서 checked 가 TTL 안인 코드와 직전 종가 저장소에 최근 거래일이 있는 코드는 건너뛰고,
+    나머지(신규/만료)만 chunk 단위로 동시 확인. 요청이 끝내 실패한 chunk 는 기존 판정을 유지
+    """
     code2name = dict(rows)
     codes = list(code2name.keys())
-    good = set()
-
-    for chunk in batched(codes, 200):
-        syms = [c + ".T" for c in chunk]
-        try:
-            df = yf.download(
-                tickers=syms,
-                period="3d", interval="1d",
-                group_by="ticker", auto_adjust=False,
-                progress=False, threads=True
-            )
-        except Exception:
-            continue
-
-        if isinstance(df.columns, pd.MultiIndex):
-            have = set(df.columns.get_level_values(0))
-            for c in chunk:
-                if c+".T" not in have:  # 완전 실패
-                    continue
-                try:
-                    cdf = df[c+".T"].dropna()
-                except KeyError:
-                    continue
-                if not cdf.empty:
-                    good.add(c)
-        else:
-            # 단일 티커 케이스
-            if not df.empty:
-                only = chunk[0]
-                good.add(only)
-
-        time.sleep(0.3)
+    today = today or date.today()
+    cutoff = (today - timedelta(days=ttl_days)).isoformat()
+    cache = load_validation()
+
+    for c, d in seen_in_last_close(codes).items():
+        e = cache.get(c, {})
+        if d >= cutoff and d > (e.get("checked") or ""):
+            cache[c] = {"checked": d, "last_seen": d}
+
+    todo = [c for c in codes if (cache.get(c, {}).get("checked") or "") < cutoff]
+    print(f"validation: {len(codes) - len(todo)} cached, {len(todo)} to probe")
+    if todo:
+        sched = AdaptiveScheduler(probe_chunk, concurrency=concurrency, max_concurrency=8)
+        tries = {}
+        for chunk in batched(todo, VALIDATE_CHUNK):
+            sched.add(tuple(chunk))
+        stamp = today.isoformat()
+        for d in sched.run():
+            if d.error is not None:
+                tries[d.task] = tries.get(d.task, 0) + 1
+                if tries[d.task] <= 2:
+                    sched.add(d.task)
+                else:
+                    print(f"probe failed ({len(d.task)} codes): {d.error}", file=sys.stderr)
+                continue
+            for c, seen in d.value.items():
+                prev = cache.get(c, {}).get("last_seen")
+                cache[c] = {"checked": stamp, "last_seen": seen or prev}
+    save_validation(cache)
+
+    def live(e):
+        # 확인 시점 기준 1주 안에 거래가 있었던 코드
+        if not e or not e.get("last_seen"):
+            return False
+        return e["last_seen"] >= (date.fromisoformat(e["checked"]) - timedelta(days=7)).isoformat()
 
+    good = [c for c in codes if live(cache.get(c))]
     clean = [(c, code2name.get(c, "")) for c in sorted(good)]
     return clean
 
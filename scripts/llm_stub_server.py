@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenAI Responses API 로컬 스텁 (지연/오류 주입, 네트워크·API 키 불필요)
+- POST /v1/responses 에 고정 본문 응답. 요청마다 지연 = latency + U(0, jitter)
+  + per_1k_tokens * max_output_tokens / 1000,
+  slow_rate 확률로 slow 초 추가 (꼬리 지연 → 헤지 확인), error_rate 확률로 status 오류
+사용:
+  python scripts/llm_stub_server.py --port 8787 --latency 1 --slow-rate 0.3 --slow 20 &
+  OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=stub LLM_DEADLINE_S=30 \
+    python summarize_with_openai.py --bundle public/daily/latest.json --no-cache
+"""
+import json, time, random, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BODY = "## 市況ダイジェスト\n- スタブ応答 ({model}, 要求 #{n})\n"
+
+
+def make_handler(args):
+    lock = threading.Lock()
+    counter = [0]
+
+    class H(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *a):
+            if not args.quiet:
+                super().log_message(fmt, *a)
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock:
+                counter[0] += 1
+                n = counter[0]
+            delay = args.latency + random.uniform(0, args.jitter) \
+                + args.per_1k_tokens * int(req.get("max_output_tokens") or 0) / 1000
+            if random.random() < args.slow_rate:
+                delay += args.slow
+            time.sleep(delay)
+            if random.random() < args.error_rate:
+                self._send(args.status, {"error": {"message": f"stub error #{n}", "type": "server_error"}})
+                return
+            text = BODY.format(model=req.get("model", ""), n=n)
+            self._send(200, {
+                "id": f"resp_stub_{n}", "object": "response", "created_at": int(time.time()),
+                "model": req.get("model", ""), "status": "completed",
+                "output": [{"id": f"msg_stub_{n}", "type": "message", "role": "assistant", "status": "completed",
+                            "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+                "usage": {"input_tokens": len(json.dumps(req.get("input", ""))) // 4,
+                          "output_tokens": len(text) // 2,
+                          "total_tokens": len(json.dumps(req.get("input", ""))) // 4 + len(text) // 2},
+            })
+
+        def _send(self, status, obj):
+            data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass    # 클라이언트가 타임아웃으로 먼저 끊음
+
+    return H
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency", type=float, default=0.5, help="기본 지연(초)")
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--per-1k-tokens", type=float, default=0.0,
+                    help="max_output_tokens 1000 당 추가 지연(초) — 출력 길이에 비례하는 생성 시간 흉내")
+    ap.add_argument("--slow-rate", type=float, default=0.0, help="꼬리 지연 확률")
+    ap.add_argument("--slow", type=float, default=10.0, help="꼬리 지연 추가 시간(초)")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--status", type=int, default=500, help="주입할 오류 status (429, 500, 503 ...)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args()
+    random.seed(args.seed)
+    srv = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args))
+    print(f"stub: http://127.0.0.1:{args.port}/v1", flush=True)
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
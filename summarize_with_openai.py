@@ -6,7 +6,18 @@ import sys
 import json
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from llm_client import CacheMiss, add_cache_args, complete
+from market_stats import column, describe
+from prompt_codec import count_tokens, fit
+import clusters
+import follow_through
+import rolling
 
 # OpenAI Python SDK (Responses API)
 try:
@@ -32,17 +43,16 @@ note.com向けに**読み応えのある**日本語マーケットダイジェ
 - フロー/集中度: 売買代金Top10/Top50シェア、出来高Top10シェア、上位銘柄の寄与度
 - メガキャップ動向: AAPL, MSFT, GOOGL/GOOG, AMZN, NVDA, META, TSLA を簡潔に
 - セクターETF/指数スナップショットを1行（SPY, QQQ, IWM, DIA, XLK, XLF, XLE, XLV, XLI, XLY, XLP, XLU, XLB, XLRE, XLC）
-- テーマ/セクター: 6〜10項目。根拠ティッカー2〜5個を丸括弧
+- テーマ/セクター: 6〜10項目。根拠ティッカー2〜5個を丸括弧。clusters（直近60営業日の値動き相関で自動抽出した連動グループ: 構成銘柄・騰落・中央値・代金シェア）を優先的な根拠にする
 - リスク: 4〜6項目（過熱、イベント、ボラ拡大源）
+- rvol_leaders（出来高急増: 当日代金/直近20日平均）と streaks（連騰/連続下落日数）があれば、フローとリスクで触れる
+- follow_through（前日までの上昇/下落/出来高Top10がh営業日後に継続・反転した比率）があれば、リスクで一言
 - 本文には表を含めない。表は本文の後に付ける（下部の4表のみ）。
 - 数値は過度に細かくしない。重複表現を避ける。
 - 出力はMarkdownのみ。冒頭で見出しを繰り返さない（本文は小見出しから開始）。
 
-集計サマリー(JSON):
-{summary_json}
-
-トップリスト(JSON):
-{lists_json}
+集計サマリーとトップリスト:
+{data}
 """
 
 SECTOR_ETFS = [
@@ -62,27 +72,20 @@ def md_table(title, rows, limit=10):
     lines.append("\n")
     return "".join(lines)
 
-def safe_stats(pcts):
-    arr = [x for x in pcts if isinstance(x, (int, float))]
-    n = len(arr)
-    if n == 0:
+def safe_stats(st: dict) -> dict:
+    """market_stats.describe 결과 → pct_stats (기존 키 유지)."""
+    if not st["n"]:
         return {"n": 0}
-    arr.sort()
-    mean = sum(arr) / n
-    median = arr[n // 2] if n % 2 == 1 else (arr[n // 2 - 1] + arr[n // 2]) / 2
-    def q(qv: float):
-        i = max(0, min(n - 1, int(qv * (n - 1))))
-        return arr[i]
     return {
-        "n": n,
-        "mean": mean,
-        "median": median,
-        "p95": q(0.95),
-        "p05": q(0.05),
-        "gt_5": sum(1 for x in arr if x >= 0.05),
-        "lt_-5": sum(1 for x in arr if x <= -0.05),
-        "gt_2": sum(1 for x in arr if x >= 0.02),
-        "lt_-2": sum(1 for x in arr if x <= -0.02),
+        "n": st["n"],
+        "mean": st["mean"],
+        "median": st["median"],
+        "p95": st["q"][0.95],
+        "p05": st["q"][0.05],
+        "gt_5": st["ge"][0.05],
+        "lt_-5": st["le"][0.05],
+        "gt_2": st["ge"][0.02],
+        "lt_-2": st["le"][0.02],
     }
 
 def etf_snapshot(universe):
@@ -94,35 +97,24 @@ def etf_snapshot(universe):
             snap.append({"ticker": t, "pct_change": r.get("pct_change"), "dollar_volume": r.get("dollar_volume")})
     return snap
 
-def build_summary(bundle: dict) -> dict:
+def build_summary(bundle: dict, metrics: dict = None, follow: list = None, groups: list = None) -> dict:
+    """
+    metrics: rolling.lookup() 결과 (ticker → RVOL/N일 수익률/연속일수)
+    follow : follow_through.lookup() 결과 (전일 리스트의 후속 성과)
+    groups : clusters.lookup() 결과 (상관 클러스터별 breadth/flow). 없으면 해당 블록은 빈 리스트.
+    """
     lists = bundle.get("lists", {})
     uni = lists.get("universe_top600_by_dollar", [])[:MAX_ITEMS]
 
-    adv = sum(1 for r in uni if (r.get("pct_change") or 0) > 0)
-    dec = sum(1 for r in uni if (r.get("pct_change") or 0) < 0)
+    # 등락/분포/집중도를 한 번에 (market_stats: 정렬 1회 + partition)
+    dv = column(uni, "dollar_volume")
+    st = describe(column(uni, "pct_change"), dv, column(uni, "volume"))
+    adv, dec = st["adv"], st["dec"]
     flat = len(uni) - adv - dec
-    pstats = safe_stats([r.get("pct_change") for r in uni])
-
-    # 분포 버킷
-    bands = {"ge_5":0,"p2_5":0,"m2_p2":0,"m5_p2":0,"le_m5":0}
-    for r in uni:
-        p = r.get("pct_change") or 0.0
-        if p >= 0.05: bands["ge_5"] += 1
-        elif p >= 0.02: bands["p2_5"] += 1
-        elif p > -0.02: bands["m2_p2"] += 1
-        elif p > -0.05: bands["m5_p2"] += 1
-        else: bands["le_m5"] += 1
-
-    # dollar_volume 집중도
-    by_dv = sorted([r for r in uni if r.get("dollar_volume")], key=lambda x: x["dollar_volume"], reverse=True)
-    dv_total = sum(r["dollar_volume"] for r in by_dv) or 1.0
-    dv_top10 = sum(r["dollar_volume"] for r in by_dv[:10])
-    dv_top50 = sum(r["dollar_volume"] for r in by_dv[:50])
-
-    # volume 집중도
-    by_vol = sorted([r for r in uni if r.get("volume")], key=lambda x: x["volume"], reverse=True)
-    vol_total = sum(r["volume"] for r in by_vol) or 1.0
-    vol_top10 = sum(r["volume"] for r in by_vol[:10])
+    pstats = safe_stats(st)
+    b = st["bands"]
+    bands = {"ge_5": b["ge_5"], "p2_5": b["p2_5"], "m2_p2": b["m2_p2"],
+             "m5_p2": b["m5_m2"], "le_m5": b["le_m5"]}
 
     # 메가캡
     mega_names = {"AAPL","MSFT","GOOGL","GOOG","AMZN","NVDA","META","TSLA"}
@@ -132,7 +124,11 @@ def build_summary(bundle: dict) -> dict:
         for r in mega
     ]
 
-    top40 = [{"ticker": r.get("ticker"), "close": r.get("close"), "pct_change": r.get("pct_change")} for r in by_dv[:40]]
+    # 거래대금 상위 40 (안정 정렬 → 동률은 입력 순서, 기존 sorted() 와 같음)
+    by_dv = [uni[i] for i in np.argsort(-np.nan_to_num(dv), kind="stable")[:40] if dv[i] > 0]
+    top40 = [{"ticker": r.get("ticker"), "close": r.get("close"), "pct_change": r.get("pct_change"),
+              "rvol20": (metrics or {}).get(r.get("ticker"), {}).get("rvol20")} for r in by_dv]
+    hl = rolling.highlights(uni, metrics)
 
     return {
         "date": bundle.get("date", ""),
@@ -140,9 +136,9 @@ def build_summary(bundle: dict) -> dict:
         "pct_stats": pstats,
         "bands": bands,
         "concentration": {
-            "dv_top10_share": dv_top10 / dv_total,
-            "dv_top50_share": dv_top50 / dv_total,
-            "vol_top10_share": vol_top10 / vol_total,
+            "dv_top10_share": st["dv_top"][10],
+            "dv_top50_share": st["dv_top"][50],
+            "vol_top10_share": st["vol_top"][10],
         },
         "mega_caps": mega_view,
         "sector_etfs": etf_snapshot(uni),
@@ -151,67 +147,208 @@ def build_summary(bundle: dict) -> dict:
         "top10_gainers_ge10": lists.get("top10_gainers_ge10", [])[:10],
         "top10_losers_ge10": lists.get("top10_losers_ge10", [])[:10],
         "top40_by_dollar": top40,
+        "rvol_leaders": hl["rvol"],
+        "streaks": hl["streaks"],
+        "follow_through": follow or [],
+        "clusters": groups or [],
     }
 
-def call_llm(cli: OpenAI, model: str, system: str, user: str) -> str:
-    for k in range(3):
-        try:
-            resp = cli.responses.create(
-                model=model,
-                max_output_tokens=int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "6500")),
-                input=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
-            )
-            return resp.output_text or ""
-        except Exception:
-            if k == 2:
-                raise
-            time.sleep(2 * (k + 1))
-    return ""
-
-def fallback_md(summary: dict) -> str:
+def call_llm(model: str, system: str, user: str, mode: str = "use", fallback=None):
+    """
+    llm_client.complete: 프롬프트가 같으면 캐시(.cache/llm)에서 바로 반환.
+    전체 마감(LLM_DEADLINE_S) 안에 성공이 없으면 병렬로 준비한 fallback 본문.
+    """
+    r = complete(model, system, user, int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "6500")),
+                 client=OpenAI, mode=mode, retries=3, fallback=fallback)
+    src = "cache hit" if r.cached else ("fallback" if r.fallback else "called")
+    print(f"LLM: {src} ({r.latency_s:.1f}s, in={r.input_tokens} out={r.output_tokens})", file=sys.stderr)
+    for a in r.attempts:
+        print(f"  attempt {json.dumps(a, ensure_ascii=False)}", file=sys.stderr)
+    return r
+
+# --------------------
+# 프롬프트 데이터 (prompt_codec: 반올림 + 표 인코딩 + 토큰 예산)
+# --------------------
+PROMPT_TOKENS = int(os.getenv("OPENAI_PROMPT_TOKENS", "3000"))
+SUMMARY_KEYS = ["breadth", "pct_stats", "bands", "concentration", "mega_caps", "sector_etfs", "top40_by_dollar",
+                "rvol_leaders", "streaks", "follow_through", "clusters"]
+LIST_KEYS = ["top10_dollar_value", "top10_volume", "top10_gainers_ge10", "top10_losers_ge10"]
+ROW = ("ticker", "close", "volume", "dollar_volume", "pct_change")
+PROMPT_FIELDS = {
+    "mega_caps": ("ticker", "pct_change", "dollar_volume"),
+    "sector_etfs": ("ticker", "pct_change", "dollar_volume"),
+    "top40_by_dollar": ("ticker", "close", "pct_change", "rvol20"),
+    "rvol_leaders": ("ticker", "rvol20", "pct_change", "ret5", "dollar_volume"),
+    "streaks": ("ticker", "streak", "ret5", "ret20"),
+    "clusters": ("tickers", "size", "adv", "dec", "median", "dv_share", "corr"),
+    "follow_through": ("list", "h", "days", "cont_rate", "rev_rate", "avg_fwd", "last_cont_rate", "last_avg_fwd"),
+    **{k: ROW for k in LIST_KEYS},
+}
+
+def prompt_data(summary: dict, keys, budget: int = PROMPT_TOKENS):
+    """summary 의 keys 블록 → (압축 텍스트, 토큰 수, 잘라낸 행 수). 빈 블록(롤링 지표 없음 등)은 생략."""
+    return fit({k: summary[k] for k in keys if summary.get(k) != []}, budget, PROMPT_FIELDS)
+
+def report_prompt(label: str, text: str, dropped=None):
+    n, how = count_tokens(text)
+    cut = f", trimmed {dropped}" if dropped else ""
+    print(f"{label}: {n} tokens ({how}), {len(text)} chars{cut}", file=sys.stderr)
+
+# --------------------
+# fallback (섹션별, LLM 없이 집계값만으로)
+# --------------------
+def fb_digest(summary: dict, concentration: bool = True) -> list:
     b = summary["breadth"]
     s = summary["pct_stats"]
-    c = summary.get("concentration", {})
     adv, dec, flat, total = b["adv"], b["dec"], b["flat"], b["total"]
     mean = s.get("mean"); median = s.get("median")
     gt5, lt5 = s.get("gt_5", 0), s.get("lt_-5", 0)
+    lines = [f"- 銘柄騰落: 上昇 {adv} / 下落 {dec} / 変わらず {flat}（計 {total}）"]
+    if mean is not None and median is not None:
+        lines.append(f"- 平均騰落率 {mean*100:.2f}% / 中央値 {median*100:.2f}%")
+    lines.append(f"- ±5% 以上の変動銘柄: 上昇 {gt5} / 下落 {lt5}")
+    if concentration:
+        lines += fb_concentration(summary)
+    return lines
+
+def fb_concentration(summary: dict) -> list:
+    c = summary.get("concentration", {})
     dv10 = c.get("dv_top10_share"); dv50 = c.get("dv_top50_share"); vol10 = c.get("vol_top10_share")
+    if dv10 is None or vol10 is None:
+        return []
+    return [f"- フロー集中度: 売買代金Top10 {dv10*100:.1f}%, Top50 {dv50*100:.1f}% / 出来高Top10 {vol10*100:.1f}%"]
 
+def fb_etf(summary: dict) -> list:
     etfs = ", ".join(f"{m['ticker']}({pct(m.get('pct_change'))})" for m in summary.get("sector_etfs", []))
+    return [f"- {etfs}"] if etfs else []
+
+def fb_mega(summary: dict) -> list:
     mega_str = ", ".join(f"{m['ticker']}({pct(m.get('pct_change'))})" for m in summary["mega_caps"])
+    return [f"- {mega_str}"] if mega_str else []
 
-    lines = []
-    lines.append("## 市況ダイジェスト")
-    lines.append(f"- 銘柄騰落: 上昇 {adv} / 下落 {dec} / 変わらず {flat}（計 {total}）")
-    if mean is not None and median is not None:
-        lines.append(f"- 平均騰落率 {mean*100:.2f}% / 中央値 {median*100:.2f}%")
-    lines.append(f"- ±5% 以上の変動銘柄: 上昇 {gt5} / 下落 {lt5}")
-    if dv10 is not None and vol10 is not None:
-        lines.append(f"- フロー集中度: 売買代金Top10 {dv10*100:.1f}%, Top50 {dv50*100:.1f}% / 出来高Top10 {vol10*100:.1f}%")
-    lines.append("")
-    lines.append("## セクターETF/指数スナップショット")
-    if etfs:
-        lines.append(f"- {etfs}")
-    lines.append("")
-    lines.append("## メガキャップ動向")
-    if mega_str:
-        lines.append(f"- {mega_str}")
-    lines.append("")
-    lines.append("## テーマ/セクター（簡易）")
+def fb_themes(summary: dict) -> list:
     tick = ", ".join(r.get("ticker", "") for r in summary["top10_dollar_value"][:10])
-    lines.append(f"- 売買代金上位からの主役: {tick}")
-    lines.append("")
-    lines.append("## 需給・フロー（要点）")
-    lines.append("- 売買代金上位は大型テック中心。指数連動のフロー優勢。")
-    lines.append("- 出来高上位は低位株と大型の混在。短期回転の痕跡。")
-    lines.append("")
-    lines.append("## リスク")
-    lines.append("- 低位・高ボラ銘柄の逆回転。")
-    lines.append("- 半導体・エネルギーは外部イベントの見出しに敏感。")
-    lines.append("")
+    lines = [f"- 売買代金上位からの主役: {tick}"]
+    for c in summary.get("clusters", [])[:6]:
+        med = pct(c["median"])
+        lines.append(f"- 連動グループ {c['tickers'].replace('/', ', ')}（{c['size']}銘柄）: 中央値 {med}, "
+                     f"上昇 {c['adv']} / 下落 {c['dec']}, 代金シェア {c['dv_share']*100:.1f}%")
+    return lines
+
+def fb_rvol(summary: dict) -> list:
+    top = ", ".join(f"{r['ticker']}({r['rvol20']:.1f}x)" for r in summary.get("rvol_leaders", [])[:5])
+    return [f"- 出来高急増（売買代金/直近20日平均）: {top}"] if top else []
+
+def fb_streaks(summary: dict) -> list:
+    up = ", ".join(f"{r['ticker']}({r['streak']}日)" for r in summary.get("streaks", []) if r["streak"] > 0)
+    down = ", ".join(f"{r['ticker']}({-r['streak']}日)" for r in summary.get("streaks", []) if r["streak"] < 0)
+    return ([f"- 連騰: {up}"] if up else []) + ([f"- 連続下落: {down}"] if down else [])
+
+def fb_follow(summary: dict) -> list:
+    out = []
+    for r in summary.get("follow_through", []):
+        if r["h"] == 1 and r["list"] != "top10_volume" and r.get("cont_rate") is not None:
+            label = "値上がり" if "gainers" in r["list"] else "値下がり"
+            out.append(f"- 前日{label}Top10の翌営業日: 継続 {r['cont_rate']*100:.0f}% / 反転 {r['rev_rate']*100:.0f}%"
+                       f"（累積 {r['days']}日）")
+    return out
+
+def fb_flow(summary: dict, concentration: bool = False) -> list:
+    lines = fb_concentration(summary) if concentration else []
+    return lines + fb_rvol(summary) + ["- 売買代金上位は大型テック中心。指数連動のフロー優勢。",
+                    "- 出来高上位は低位株と大型の混在。短期回転の痕跡。"]
+
+def fb_risk(summary: dict) -> list:
+    return fb_streaks(summary) + fb_follow(summary) + ["- 低位・高ボラ銘柄の逆回転。",
+                                                       "- 半導体・エネルギーは外部イベントの見出しに敏感。"]
+
+def _block(title: str, lines: list) -> list:
+    return [f"## {title}"] + lines + [""]
+
+def fallback_md(summary: dict) -> str:
+    lines = []
+    lines += _block("市況ダイジェスト", fb_digest(summary))
+    lines += _block("セクターETF/指数スナップショット", fb_etf(summary))
+    lines += _block("メガキャップ動向", fb_mega(summary))
+    lines += _block("テーマ/セクター（簡易）", fb_themes(summary))
+    lines += _block("需給・フロー（要点）", fb_flow(summary))
+    lines += _block("リスク", fb_risk(summary))
+    return "\n".join(lines)
+
+# --------------------
+# 섹션 병렬 생성 (--sectioned)
+# --------------------
+SECTION_TOKENS = int(os.getenv("OPENAI_SECTION_MAX_TOKENS", "2000"))
+
+SECTION_TMPL = """以下は米国株（取引代金上位600ユニバース, {date}）の集計データの一部です。
+note.com向けマーケットダイジェストのうち「{title}」の節だけを書いてください。
+
+要件:
+- {ask}
+- 節見出しは書かない（こちらで付ける）。箇条書き中心。表は含めない。
+- 数値は過度に細かくしない。出力はMarkdownのみ。
+
+データ:
+{data}
+"""
+
+class Section(NamedTuple):
+    key: str
+    title: str
+    ask: str
+    fields: tuple                      # build_summary 의 하위 구조 중 이 섹션에 넘길 키
+    fallback: Callable[[dict], list]
+    max_tokens: int = SECTION_TOKENS
+
+# 기사 순서 = 리스트 순서
+SECTIONS = [
+    Section("digest", "市況ダイジェスト", "6〜9行（騰落広がり、平均/中央値、±2%/±5%比率、分布帯の言及）",
+            ("breadth", "pct_stats", "bands"), lambda s: fb_digest(s, concentration=False)),
+    Section("flow", "フロー/集中度", "売買代金Top10/Top50シェア、出来高Top10シェア、上位銘柄の寄与度",
+            ("concentration", "top40_by_dollar", "top10_volume", "rvol_leaders"),
+            lambda s: fb_flow(s, concentration=True)),
+    Section("mega", "メガキャップ動向", "AAPL, MSFT, GOOGL/GOOG, AMZN, NVDA, META, TSLA を簡潔に",
+            ("mega_caps",), fb_mega, 1200),
+    Section("etf", "セクターETF/指数スナップショット", "1〜2行で簡潔に（SPY, QQQ, IWM, DIA と主要セクターETF）",
+            ("sector_etfs",), fb_etf, 1000),
+    Section("themes", "テーマ/セクター", "6〜10項目。根拠ティッカー2〜5個を丸括弧",
+            ("clusters", "top40_by_dollar", "top10_gainers_ge10", "top10_losers_ge10"), fb_themes),
+    Section("risk", "リスク", "4〜6項目（過熱、イベント、ボラ拡大源）",
+            ("pct_stats", "bands", "top10_gainers_ge10", "top10_losers_ge10", "streaks", "follow_through"),
+            fb_risk),
+]
+
+def section_prompt(sec: Section, summary: dict) -> str:
+    data, _, _ = prompt_data(summary, sec.fields)
+    return SECTION_TMPL.format(date=summary["date"], title=sec.title, ask=sec.ask, data=data)
+
+def _strip_headings(md: str) -> str:
+    return "\n".join(l for l in md.splitlines() if not l.lstrip().startswith("#")).strip()
+
+def generate_sectioned(model: str, summary: dict, mode: str = "use") -> str:
+    """섹션을 동시에 생성 (섹션마다 작은 토큰 예산 + fallback) → 순서대로 이어 붙임."""
+    prompts = {}
+    for sec in SECTIONS:
+        prompts[sec.key] = section_prompt(sec, summary)
+        report_prompt(f"prompt[{sec.key}]", prompts[sec.key])
+
+    def one(sec: Section):
+        user = prompts[sec.key]
+        r = complete(model, SYSTEM, user, sec.max_tokens, client=OpenAI,
+                     mode=mode, retries=2, fallback=lambda: "\n".join(sec.fallback(summary)))
+        text = r.text if r.fallback else strip_tables(_strip_headings(r.text))
+        src = "cache hit" if r.cached else ("fallback" if r.fallback else "called")
+        print(f"LLM[{sec.key}]: {src} ({r.latency_s:.1f}s, in={r.input_tokens} out={r.output_tokens}, "
+              f"attempts={len(r.attempts)})", file=sys.stderr)
+        return text if text.strip() else "\n".join(sec.fallback(summary))
+
+    t = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(SECTIONS)) as ex:
+        bodies = list(ex.map(one, SECTIONS))
+    print(f"LLM: {len(SECTIONS)} sections in {time.monotonic() - t:.1f}s", file=sys.stderr)
+    lines = []
+    for sec, body in zip(SECTIONS, bodies):
+        lines += _block(sec.title, [body])
     return "\n".join(lines)
 
 def strip_tables(md: str) -> str:
@@ -236,9 +373,14 @@ def main():
     ap.add_argument("--bundle", required=True)
     ap.add_argument("--out", default="note_post_llm.md")
     ap.add_argument("--model", default=os.getenv("OPENAI_MODEL", "gpt-5"))
+    ap.add_argument("--sectioned", action="store_true",
+                    help="섹션별로 나눠 동시에 생성 (지연 ≈ 가장 느린 섹션)")
+    ap.add_argument("--history-dir", default=os.getenv("HISTORY_DIR", "data/history"),
+                    help="롤링 지표(RVOL/N일 수익률/연속일수)를 읽을 히스토리 저장소")
+    add_cache_args(ap)
     args = ap.parse_args()
 
-    if not os.getenv("OPENAI_API_KEY"):
+    if args.llm_cache != "only" and not os.getenv("OPENAI_API_KEY"):
         print("ERROR: set OPENAI_API_KEY", file=sys.stderr)
         sys.exit(2)
 
@@ -248,45 +390,32 @@ def main():
         print(f"ERROR: cannot read bundle: {e}", file=sys.stderr)
         sys.exit(2)
 
-    summary = build_summary(bundle)
-
-    user = USER_TMPL.format(
-        date=summary["date"],
-        summary_json=json.dumps(
-            {
-                "date": summary["date"],
-                "breadth": summary["breadth"],
-                "pct_stats": summary["pct_stats"],
-                "bands": summary["bands"],
-                "concentration": summary["concentration"],
-                "mega_caps": summary["mega_caps"],
-                "sector_etfs": summary["sector_etfs"],
-                "top40_by_dollar": summary["top40_by_dollar"],
-            },
-            ensure_ascii=False,
-        ),
-        lists_json=json.dumps(
-            {
-                "top10_dollar_value": summary["top10_dollar_value"],
-                "top10_volume": summary["top10_volume"],
-                "top10_gainers_ge10": summary["top10_gainers_ge10"],
-                "top10_losers_ge10": summary["top10_losers_ge10"],
-            },
-            ensure_ascii=False,
-        ),
-    )
-
-    cli = OpenAI()
+    uni = bundle.get("lists", {}).get("universe_top600_by_dollar", [])[:MAX_ITEMS]
+    metrics = rolling.lookup("us", bundle.get("date", ""), [r.get("ticker") for r in uni], Path(args.history_dir))
+    if metrics is None:
+        print("rolling: no history for this date, skipping RVOL/streaks", file=sys.stderr)
+    follow = follow_through.lookup("us", bundle.get("date", ""), Path(args.history_dir))
+    groups = clusters.lookup("us", bundle.get("date", ""), uni, Path(args.history_dir))
+    summary = build_summary(bundle, metrics, follow, groups)
+
     try:
-        body = call_llm(cli, args.model, SYSTEM, user)
+        if args.sectioned:
+            body = generate_sectioned(args.model, summary, args.llm_cache)
+        else:
+            data, _, dropped = prompt_data(summary, SUMMARY_KEYS + LIST_KEYS, PROMPT_TOKENS)
+            user = USER_TMPL.format(date=summary["date"], data=data)
+            report_prompt("prompt", user, dropped)
+            r = call_llm(args.model, SYSTEM, user, args.llm_cache, fallback=lambda: fallback_md(summary))
+            body = r.text if r.fallback else strip_tables(r.text)  # remove any tables in the LLM body
+    except CacheMiss as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(3)
     except Exception as e:
         print(f"WARN: LLM call failed, using fallback. Detail: {e}", file=sys.stderr)
         body = ""
 
     if not body or not body.strip():
         body = fallback_md(summary)
-    else:
-        body = strip_tables(body)  # remove any tables in the LLM body
 
     md = []
     md.append(f"# 取引代金上位600米国株 デイリー要約 | {summary['date']}\n")
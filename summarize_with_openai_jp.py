@@ -1,35 +1,38 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os, sys, json, csv, argparse, statistics as stats
+import os, sys, json, argparse
 from pathlib import Path
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+import numpy as np
 import pandas as pd
 from openai import OpenAI
 
+from llm_client import add_cache_args, complete
+from market_stats import column, describe
+from prompt_codec import count_tokens
+import follow_through
+import rolling
+from theme_stats import ThemeIndex, aggregate as aggregate_themes
+from themes import DEFAULT_THEME
+from ticker_meta import (TickerMeta, load as load_meta, DEFAULT_PATH as META_PATH,
+                         DEFAULT_SOURCES, SRC_NAMES)
+
 def load_bundle(path: str) -> dict:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def load_names_csv(path: str) -> dict:
-    m = {}
-    p = Path(path)
-    if not p.exists():
-        return m
-    with p.open("r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        # 허용 컬럼: ticker/code , name/name_ja/jp_name
-        for row in r:
-            code = (row.get("ticker") or row.get("code") or "").strip()
-            name = (row.get("name") or row.get("name_ja") or row.get("jp_name") or "").strip()
-            if code:
-                m[code] = name or code
-    return m
-
-def nm(code: str, names: dict) -> str:
-    n = names.get(code)
+def load_names_csv(path: str) -> TickerMeta:
+    """종목 메타 인덱스(ticker_meta.py, mmap). --names 가 기본 경로가 아니면 그 파일을 이름 소스로 쓴 별도 인덱스."""
+    if Path(path) == Path("data/jpx_names.csv"):
+        return load_meta()
+    sources = [(path if bit == SRC_NAMES else rel, mk, bit) for rel, mk, bit in DEFAULT_SOURCES]
+    return TickerMeta.open(META_PATH.with_name("ticker_meta.custom.bin"), sources)
+
+def nm(code: str, names: TickerMeta) -> str:
+    n = names.name(code)
     if n and n != code:
         return f"{n}（{code}）"
     return code
@@ -45,31 +48,28 @@ def yen(n):
     except Exception:
         return ""
 
-def summarize_distribution(pcts):
-    arr = [x for x in pcts if x is not None]
-    if not arr:
+def summarize_distribution(st: dict) -> dict:
+    """
+    market_stats.describe(edges="left") 결과 → 프롬프트용 분포 요약.
+    ±2% 구간은 JP 기존 정의 [-2%, +2%) (US 는 같은 커널의 기본 경계 (-2%, +2%))
+    """
+    if not st["n"]:
         return {}
-    arr.sort()
-    mean = stats.fmean(arr)
-    med = stats.median(arr)
-    def count_between(lo, hi):
-        return sum(1 for x in arr if (lo <= x < hi))
-    res = {
-        "n": len(arr),
-        "up": sum(1 for x in arr if x > 0),
-        "down": sum(1 for x in arr if x < 0),
-        "flat": sum(1 for x in arr if x == 0),
-        "mean": mean,
-        "median": med,
-        "band_m2_p2": count_between(-0.02, 0.02),
-        "p95": arr[int(0.95*(len(arr)-1))],
-        "p05": arr[int(0.05*(len(arr)-1))],
-        "gt_025": sum(1 for x in arr if x >= 0.025),
-        "lt_m025": sum(1 for x in arr if x <= -0.025),
-        "gt_05":  sum(1 for x in arr if x >= 0.05),
-        "lt_m05": sum(1 for x in arr if x <= -0.05),
+    return {
+        "n": st["n"],
+        "up": st["adv"],
+        "down": st["dec"],
+        "flat": st["flat"],
+        "mean": st["mean"],
+        "median": st["median"],
+        "band_m2_p2": st["bands"]["m2_p2"],
+        "p95": st["q"][0.95],
+        "p05": st["q"][0.05],
+        "gt_025": st["ge"][0.025],
+        "lt_m025": st["le"][0.025],
+        "gt_05":  st["ge"][0.05],
+        "lt_m05": st["le"][0.05],
     }
-    return res
 
 def table(lines, header):
     cols = ["銘柄","Close","Vol","代金","%Chg"]
@@ -78,12 +78,19 @@ def table(lines, header):
         out.append(f"{L['disp']}\t{L['close']:,.2f}\t{L['volume']:,.0f}\t{L['dv']}\t{pct(L['pct'])}")
     return "\n".join(out)
 
-def enrich(items, names):
+def theme_map(rows, names) -> dict:
+    """bundle 행 전체의 테마 (theme_stats 조회 배열: 큐레이션 > 종목명 키워드 분류 > 소스 CSV 테마)."""
+    codes = list(dict.fromkeys(r["ticker"] for r in rows))
+    idx = ThemeIndex.open(names)
+    return {c: idx.names[t] for c, t in zip(codes, idx.ids(codes).tolist())}
+
+def enrich(items, names, themes=None):
     res = []
     for r in items:
         res.append({
             "code": r["ticker"],
             "disp": nm(r["ticker"], names),
+            "theme": (themes or {}).get(r["ticker"], DEFAULT_THEME),
             "close": float(r.get("close", 0.0)),
             "volume": float(r.get("volume", 0.0)),
             "dv": yen(r.get("dollar_volume", 0.0)),
@@ -91,28 +98,40 @@ def enrich(items, names):
         })
     return res
 
-def build_context(bundle, names):
+def build_context(bundle, names, metrics=None, follow=None):
+    """
+    metrics: rolling.lookup() 결과 (ticker → RVOL/N일 수익률/연속일수). 없으면 rvol/streaks 는 빈 리스트.
+    follow : follow_through.lookup() 결과 (전일 리스트의 후속 성과).
+    """
     L = bundle["lists"]
     ctx = {}
     ctx["date"] = bundle["date"]
-    # 집중도
+    # 집중도 + 분포 (market_stats 한 번 호출, 등락률은 None 인 행만 제외)
     dv = L["universe_top600_by_dollar"]
-    top50 = dv[:50]; top10 = dv[:10]
-    sum_all = sum(float(x.get("dollar_volume",0)) for x in dv) or 1.0
-    share10 = sum(float(x["dollar_volume"]) for x in top10) / sum_all
-    share50 = sum(float(x["dollar_volume"]) for x in top50) / sum_all
-    ctx["shares"] = {"top10": share10, "top50": share50}
-
-    # 분포
-    pcts = [x.get("pct_change") for x in dv]
-    dist = summarize_distribution(pcts)
-    ctx["dist"] = dist
-
-    # 표 데이터
-    ctx["top_dv"]  = enrich(L["top10_dollar_value"], names)
-    ctx["top_vol"] = enrich(L["top10_volume"], names)
-    ctx["gainers"] = enrich(L["top10_gainers_ge10"], names)
-    ctx["losers"]  = enrich(L["top10_losers_ge10"], names)
+    pcts = np.array([x["pct_change"] for x in dv if x.get("pct_change") is not None], dtype=np.float64)
+    st = describe(pcts, column(dv, "dollar_volume"), thresholds=(0.02, 0.025, 0.05), edges="left")
+    ctx["shares"] = {"top10": st["dv_top"][10], "top50": st["dv_top"][50]}
+    ctx["dist"] = summarize_distribution(st)
+
+    # 표 데이터 (+ 테마 태그)
+    themes = theme_map([r for k in L for r in L[k]], names)
+    ctx["top_dv"]  = enrich(L["top10_dollar_value"], names, themes)
+    ctx["top_vol"] = enrich(L["top10_volume"], names, themes)
+    ctx["gainers"] = enrich(L["top10_gainers_ge10"], names, themes)
+    ctx["losers"]  = enrich(L["top10_losers_ge10"], names, themes)
+
+    # 롤링 지표 (rolling.py): 거래대금 급증(RVOL) / 연속 상승·하락
+    hl = rolling.highlights(dv, metrics)
+    ctx["rvol"] = [dict(x, rvol=h["rvol20"]) for x, h in zip(enrich(hl["rvol"], names, themes), hl["rvol"])]
+    ctx["streaks"] = [dict(x, streak=h["streak"], ret5=h["ret5"])
+                      for x, h in zip(enrich(hl["streaks"], names, themes), hl["streaks"])]
+    ctx["follow"] = [r for r in (follow or []) if r["h"] == 1 and r.get("cont_rate") is not None]
+
+    # 테마별 집계: fetcher 가 전 종목으로 계산해 둔 값, 없으면 top600 으로
+    ts = bundle.get("theme_stats") or {"scope": "top600", "rows": len(dv),
+                                       "themes": aggregate_themes(dv, ThemeIndex.open(names))}
+    ctx["theme_scope"] = "全銘柄" if ts.get("scope") == "universe" else "代金上位600"
+    ctx["themes"] = [t for t in ts["themes"] if t["theme"] != DEFAULT_THEME and t["count"] >= 3]
     return ctx
 
 SYSTEM = """あなたは日本株マーケットの客観的な日次レポート執筆アシスタントです。
@@ -121,6 +140,7 @@ SYSTEM = """あなたは日本株マーケットの客観的な日次レポー
 USER_TPL = """以下の集計値を用いて、見出しなしの本文パラグラフを日本語で300〜450語で作成してください。
 - トーン: 事実ベース、短文主体、過度な形容詞なし
 - 含める章: 市況ダイジェスト / フローと集中度 / テーマ・セクター概況 / リスク
+- テーマ・セクター概況はテーマ別集計（銘柄数・騰落・中央値・代金シェア）を根拠にする
 - 個別銘柄は「銘柄名（コード）」表記
 - 表は本文に入れない（下部に別表あり）
 
@@ -135,13 +155,43 @@ USER_TPL = """以下の集計値を用いて、見出しなしの本文パラグ
 出来高上位の性質（例示）: {vol_examples}
 上昇率上位（終値≥¥1,000の一部）: {g_ex}
 下落率上位（終値≥¥1,000の一部）: {l_ex}
+出来高急増（売買代金/直近20日平均）: {rvol_ex}
+連騰・連続下落（日数, 5日騰落率）: {streak_ex}
+前日リストの翌営業日（継続/反転, 累積）: {follow_ex}
+テーマ別集計（{theme_scope}、代金シェア順、3銘柄以上）: {theme_ex}
 """
 
-def call_llm(model: str, ctx: dict) -> str:
-    dv_ex = "、".join([f"{x['disp']} {pct(x['pct'])}" for x in ctx["top_dv"][:5]])
-    vol_ex = "、".join([f"{x['disp']} {pct(x['pct'])}" for x in ctx["top_vol"][:5]])
-    g_ex = "、".join([f"{x['disp']} {pct(x['pct'])}" for x in ctx["gainers"][:5]])
-    l_ex = "、".join([f"{x['disp']} {pct(x['pct'])}" for x in ctx["losers"][:5]])
+def example(x) -> str:
+    tag = f"［{x['theme']}］" if x.get("theme") and x["theme"] != DEFAULT_THEME else ""
+    return f"{x['disp']}{tag} {pct(x['pct'])}"
+
+def rvol_example(x) -> str:
+    return f"{x['disp']} {x['rvol']:.1f}倍"
+
+def streak_example(x) -> str:
+    word = "連騰" if x["streak"] > 0 else "連続下落"
+    return f"{x['disp']} {abs(x['streak'])}日{word}（5日{pct(x['ret5'])}）"
+
+FOLLOW_LABELS = {"top10_gainers_ge10": "値上がりTop10", "top10_losers_ge10": "値下がりTop10",
+                 "top10_volume": "出来高Top10"}
+
+def follow_example(r) -> str:
+    return (f"{FOLLOW_LABELS.get(r['list'], r['list'])} 継続{r['cont_rate']*100:.0f}%/反転{r['rev_rate']*100:.0f}%"
+            f"（{r['days']}日）")
+
+def theme_example(t) -> str:
+    med = pct(t["median"]) if t["median"] is not None else "-"
+    return f"{t['theme']} {t['count']}銘柄 中央値{med} 上昇{t['adv']}/下落{t['dec']} 代金{t['dv_share']*100:.1f}%"
+
+def call_llm(model: str, ctx: dict, mode: str = "use") -> str:
+    dv_ex = "、".join([example(x) for x in ctx["top_dv"][:5]])
+    vol_ex = "、".join([example(x) for x in ctx["top_vol"][:5]])
+    g_ex = "、".join([example(x) for x in ctx["gainers"][:5]])
+    l_ex = "、".join([example(x) for x in ctx["losers"][:5]])
+    rvol_ex = "、".join([rvol_example(x) for x in ctx["rvol"][:5]]) or "なし（履歴不足）"
+    streak_ex = "、".join([streak_example(x) for x in ctx["streaks"]]) or "なし"
+    follow_ex = "、".join([follow_example(r) for r in ctx["follow"]]) or "なし（履歴不足）"
+    theme_ex = "、".join([theme_example(t) for t in ctx["themes"][:10]]) or "なし"
 
     dist = ctx["dist"]; shares = ctx["shares"]
     user = USER_TPL.format(
@@ -152,20 +202,50 @@ def call_llm(model: str, ctx: dict) -> str:
         gt5=dist["gt_05"], lt5=dist["lt_m05"],
         p95=dist["p95"]*100, p05=dist["p05"]*100,
         share10=shares["top10"]*100, share50=shares["top50"]*100,
-        dv_examples=dv_ex, vol_examples=vol_ex, g_ex=g_ex, l_ex=l_ex
+        dv_examples=dv_ex, vol_examples=vol_ex, g_ex=g_ex, l_ex=l_ex,
+        rvol_ex=rvol_ex, streak_ex=streak_ex, follow_ex=follow_ex,
+        theme_scope=ctx["theme_scope"], theme_ex=theme_ex
     )
 
-    cli = OpenAI()
-    # Responses API 사용. temperature 미지정.
-    r = cli.responses.create(
-        model=model,
-        input=[
-            {"role":"system","content":SYSTEM},
-            {"role":"user","content":user}
-        ],
-        max_output_tokens=1200,
-    )
-    return r.output_text
+    n, how = count_tokens(user)
+    print(f"prompt: {n} tokens ({how}), {len(user)} chars", file=sys.stderr)
+    # Responses API 사용. temperature 미지정. 프롬프트가 같으면 캐시(.cache/llm)에서 재생,
+    # 마감(LLM_DEADLINE_S)까지 성공이 없으면 병렬로 만든 fallback_body
+    r = complete(model, SYSTEM, user, 1200, client=OpenAI, mode=mode, retries=3,
+                 fallback=lambda: fallback_body(ctx))
+    src = "cache hit" if r.cached else ("fallback" if r.fallback else "called")
+    print(f"LLM: {src} ({r.latency_s:.1f}s, in={r.input_tokens} out={r.output_tokens})", file=sys.stderr)
+    for a in r.attempts:
+        print(f"  attempt {json.dumps(a, ensure_ascii=False)}", file=sys.stderr)
+    return r.text
+
+def fallback_body(ctx: dict) -> str:
+    """LLM 없이 집계값만으로 만드는 본문 (마감 초과/오류 시)."""
+    dist = ctx["dist"]; shares = ctx["shares"]
+    lines = []
+    if dist:
+        lines.append(f"騰落は上昇{dist['up']}・下落{dist['down']}・変わらず{dist['flat']}。"
+                     f"平均騰落率{dist['mean']*100:.2f}%、中央値{dist['median']*100:.2f}%。"
+                     f"+5%以上{dist['gt_05']}銘柄、-5%以下{dist['lt_m05']}銘柄。")
+    lines.append(f"売買代金の集中度はTop10で{shares['top10']*100:.1f}%、Top50で{shares['top50']*100:.1f}%。")
+    if ctx["themes"]:
+        lines.append(f"テーマ別（{ctx['theme_scope']}、代金シェア順）: "
+                     + "、".join(theme_example(t) for t in ctx["themes"][:4]) + "。")
+    if ctx["top_dv"]:
+        lines.append("代金上位: " + "、".join(example(x) for x in ctx["top_dv"][:5]) + "。")
+    if ctx["gainers"]:
+        lines.append("上昇率上位: " + "、".join(example(x) for x in ctx["gainers"][:3]) + "。")
+    if ctx["losers"]:
+        lines.append("下落率上位: " + "、".join(example(x) for x in ctx["losers"][:3]) + "。")
+    if ctx["rvol"]:
+        lines.append("出来高急増: " + "、".join(rvol_example(x) for x in ctx["rvol"][:3]) + "。")
+    if ctx["streaks"]:
+        up = [x for x in ctx["streaks"] if x["streak"] > 0][:2]
+        down = [x for x in ctx["streaks"] if x["streak"] < 0][:2]
+        lines.append("連続した値動き: " + "、".join(streak_example(x) for x in up + down) + "。")
+    if ctx["follow"]:
+        lines.append("前日リストの翌営業日: " + "、".join(follow_example(r) for r in ctx["follow"]) + "。")
+    return "\n\n".join(lines)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -173,13 +253,21 @@ def main():
     ap.add_argument("--names", default="data/jpx_names.csv")
     ap.add_argument("--out", default="note_post_llm_jp.md")
     ap.add_argument("--model", default=os.getenv("OPENAI_MODEL","gpt-5"))
+    ap.add_argument("--history-dir", default=os.getenv("HISTORY_DIR", "data/history"),
+                    help="롤링 지표(RVOL/N일 수익률/연속일수)를 읽을 히스토리 저장소")
+    add_cache_args(ap)
     args = ap.parse_args()
 
     bundle = load_bundle(args.bundle)
     names  = load_names_csv(args.names)
 
-    ctx = build_context(bundle, names)
-    body = call_llm(args.model, ctx)
+    uni = bundle["lists"]["universe_top600_by_dollar"]
+    metrics = rolling.lookup("jpx", bundle["date"], [r["ticker"] for r in uni], Path(args.history_dir))
+    if metrics is None:
+        print("rolling: no history for this date, skipping RVOL/streaks", file=sys.stderr)
+    follow = follow_through.lookup("jpx", bundle["date"], Path(args.history_dir))
+    ctx = build_context(bundle, names, metrics, follow)
+    body = call_llm(args.model, ctx, args.llm_cache)
 
     # 제목
     title = f"取引代金上位600日本株 デイリー要約 | {bundle['date']}"
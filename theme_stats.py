@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JPX 테마별 집계 (정수 테마 id 조회 + 그룹 벡터 연산)
+- 조회 배열: 종목 코드 슬롯(last_close.code_slot, 129,600칸) → 테마 id (int16)
+    테마 = 큐레이션 테마(focus/theme_map) > 종목명 키워드 분류(themes.py) > 소스 CSV theme 열
+    (jpx_universe.csv / jpx_names.csv) > DEFAULT_THEME
+    → 요약기 표의 ［테마］ 태그(theme_map)도 이 조회 배열을 사용
+  메타 인덱스(ticker_meta.bin) 전 종목을 한 번 분류해 {메타 파일}.themes.npz 로 저장,
+  메타 파일 (size, mtime) 또는 분류 규칙이 바뀌면 재생성
+- 하루 집계: 행마다 슬롯 → 테마 id gather, market_stats.grouped_stats (bincount/lexsort)
+  → 테마별 종목 수, 상승/하락, 중앙값 등락률, 거래대금 비중 (전체 유니버스 ~3,800 종목도 수 ms)
+- fetch_jpx_toplists 가 전 종목으로 계산해 bundle["theme_stats"] 에 기록,
+  요약기는 번들 값이 있으면 그대로, 없으면 top600 으로 계산
+    python theme_stats.py --bundle public/jpx/daily/latest.json
+"""
+
+import os, sys, json, hashlib, argparse
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from last_close import SLOTS, code_slot
+from market_stats import column, grouped_stats
+from themes import DEFAULT_THEME, MANUAL_OVERRIDES, RULES, classify
+from ticker_meta import CURATED, TickerMeta, load as load_meta
+
+_RULES_SIG = hashlib.sha1(repr((RULES, sorted(MANUAL_OVERRIDES.items()))).encode()).hexdigest()
+
+
+class ThemeIndex:
+    def __init__(self, names: List[str], slot_theme: np.ndarray):
+        self.names = names                  # 테마 id → 테마명 (0 = DEFAULT_THEME)
+        self.slot_theme = slot_theme        # 슬롯 → 테마 id (int16)
+        self.default = 0
+        self._manual = {c: names.index(t) for c, (_, t) in MANUAL_OVERRIDES.items() if t in names}
+
+    @classmethod
+    def build(cls, meta: TickerMeta) -> "ThemeIndex":
+        ents = [e for e in meta.entries() if e.market == "JP"]
+        auto = classify([e.name for e in ents], [e.key for e in ents])
+        # 큐레이션 > 키워드 분류 > 소스 CSV 의 theme 열(universe/names)
+        themes = [e.theme if e.theme and (e.sources & CURATED or a == DEFAULT_THEME) else a
+                  for e, a in zip(ents, auto)]
+        names = [DEFAULT_THEME] + sorted(set(themes) - {DEFAULT_THEME})
+        tid = {t: i for i, t in enumerate(names)}
+        slot_theme = np.zeros(SLOTS, dtype=np.int16)
+        for e, t in zip(ents, themes):
+            s = code_slot(e.key)
+            if s >= 0:
+                slot_theme[s] = tid[t]
+        return cls(names, slot_theme)
+
+    @classmethod
+    def open(cls, meta: Optional[TickerMeta] = None) -> "ThemeIndex":
+        """메타 인덱스 옆 캐시(.themes.npz)를 쓰고, 메타/규칙이 바뀌었으면 재생성."""
+        meta = meta or load_meta()
+        st = meta.path.stat()
+        sig = f"{st.st_size}:{st.st_mtime_ns}:{_RULES_SIG}"
+        path = meta.path.with_suffix(".themes.npz")
+        if path.exists():
+            try:
+                with np.load(path) as z:
+                    if str(z["sig"]) == sig and len(z["slot_theme"]) == SLOTS:
+                        return cls(z["names"].tolist(), z["slot_theme"])
+            except Exception:
+                pass
+        idx = cls.build(meta)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez_compressed(tmp, sig=sig, names=np.asarray(idx.names), slot_theme=idx.slot_theme)
+        os.replace(tmp, path)
+        return idx
+
+    def ids(self, tickers: Sequence[str]) -> np.ndarray:
+        """종목 코드 → 테마 id (형식이 다르거나 모르는 코드는 DEFAULT_THEME, 수동 지정 코드는 그 테마)."""
+        s = np.fromiter((code_slot(t) for t in tickers), dtype=np.int64, count=len(tickers))
+        out = np.where(s >= 0, self.slot_theme[np.maximum(s, 0)], self.default).astype(np.int64)
+        if self._manual:
+            for i in np.flatnonzero(out == self.default).tolist():
+                m = self._manual.get(tickers[i].split(".", 1)[0])
+                if m is not None:
+                    out[i] = m
+        return out
+
+    def theme(self, ticker: str) -> str:
+        return self.names[int(self.ids([ticker])[0])]
+
+
+def aggregate(rows: Sequence[dict], index: ThemeIndex, min_size: int = 1) -> List[dict]:
+    """행 dict 리스트 → 테마별 통계 (거래대금 비중 내림차순)."""
+    if not rows:
+        return []
+    tickers = [r["ticker"] for r in rows]
+    g = grouped_stats(index.ids(tickers), column(rows, "pct_change"), column(rows, "dollar_volume"),
+                      len(index.names))
+    order = np.argsort(-g["dv"], kind="stable")
+    out = []
+    for t in order.tolist():
+        if g["size"][t] < max(min_size, 1):
+            continue
+        out.append({
+            "theme": index.names[t], "count": int(g["size"][t]),
+            "adv": int(g["adv"][t]), "dec": int(g["dec"][t]),
+            "median": None if np.isnan(g["median"][t]) else float(g["median"][t]),
+            "dv_share": float(g["dv_share"][t]),
+        })
+    return out
+
+
+def main():
+    import time
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bundle", required=True)
+    ap.add_argument("--list", default="universe_top600_by_dollar")
+    ap.add_argument("--top", type=int, default=15)
+    args = ap.parse_args()
+    rows = json.loads(Path(args.bundle).read_text(encoding="utf-8"))["lists"][args.list]
+    t = time.perf_counter()
+    idx = ThemeIndex.open()
+    t1 = time.perf_counter()
+    res = aggregate(rows, idx)
+    t2 = time.perf_counter()
+    print(f"{len(rows)} rows, {len(idx.names)} themes, index {(t1 - t) * 1000:.1f} ms, "
+          f"aggregate {(t2 - t1) * 1000:.1f} ms", file=sys.stderr)
+    print("theme,count,adv,dec,median,dv_share")
+    for r in res[:args.top]:
+        med = "" if r["median"] is None else f"{r['median'] * 100:.2f}%"
+        print(f"{r['theme']},{r['count']},{r['adv']},{r['dec']},{med},{r['dv_share'] * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
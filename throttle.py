@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+요청 속도 제어 유틸 (스레드 안전)
+- TokenBucket: 분당 요청 수(rpm) 상한 + burst. acquire() 가 토큰이 찰 때까지 대기
+- AdaptiveScheduler: 작업을 최대 N 개 동시 실행, 관측된 429/지연에 따라 AIMD 로
+  동시성과 시작 간격을 조절. 실행 중 add() 로 작업 추가 가능(재시도 큐 등)
+"""
+
+import time, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+
+class TokenBucket:
+    def __init__(self, rate_per_min: float, burst: int = 1):
+        self.rate = max(rate_per_min, 1e-9) / 60.0   # 초당 토큰
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0) -> float:
+        """토큰 n 개를 확보할 때까지 대기. 반환: 기다린 시간(초)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.t) * self.rate)
+                self.t = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                need = (n - self.tokens) / self.rate
+            time.sleep(need)
+            waited += need
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """429 / rate limit 계열 예외인지 (yfinance YFRateLimitError, HTTPError 429 등)."""
+    if getattr(exc, "code", None) == 429 or getattr(exc, "status_code", None) == 429:
+        return True
+    text = f"{type(exc).__name__} {exc}".lower()
+    return "429" in text or "ratelimit" in text or "rate limit" in text or "too many requests" in text
+
+
+class Done(NamedTuple):
+    task: Any
+    value: Any
+    error: Optional[BaseException]
+    elapsed: float        # 실행 시간(초)
+    concurrency: float    # 완료 시점의 동시성 한도
+    delay: float          # 완료 시점의 시작 간격(초)
+
+
+class AdaptiveScheduler:
+    """
+    AIMD 동시성 제어:
+    - 성공 & elapsed <= target_latency : limit += 1/limit (한도만큼 성공하면 +1), delay 감쇠
+    - 성공 & elapsed >  target_latency : limit *= 0.75 (지연 상승 = 혼잡 신호)
+    - rate limit 실패                  : limit *= 0.5, delay 를 2배(최소 backoff)로
+    - 그 외 실패                       : 한도 유지 (호출자가 재시도 여부 결정)
+    감소는 직전 감소 이후에 시작된 작업의 신호에만 반응 (동시에 떠 있던 작업들이
+    같은 혼잡으로 한꺼번에 실패해도 한 번만 줄임)
+    """
+
+    def __init__(self, fn: Callable[[Any], Any], concurrency: float = 2, min_concurrency: int = 1,
+                 max_concurrency: int = 8, delay: float = 0.0, max_delay: float = 60.0,
+                 backoff: float = 2.0, target_latency: Optional[float] = None,
+                 throttled: Callable[[BaseException], bool] = is_rate_limited):
+        self.fn = fn
+        self.limit = float(min(max(concurrency, min_concurrency), max_concurrency))
+        self.min_c, self.max_c = min_concurrency, max_concurrency
+        self.delay, self.base_delay, self.max_delay = delay, delay, max_delay
+        self.backoff = backoff
+        self.target = target_latency
+        self.throttled = throttled
+        self.pending = deque()
+        self.throttle_events = 0
+        self._last_cut = -1.0
+
+    def add(self, task: Any):
+        self.pending.append(task)
+
+    def _timed(self, task):
+        t = time.monotonic()
+        try:
+            return self.fn(task), None, t, time.monotonic() - t
+        except Exception as e:
+            return None, e, t, time.monotonic() - t
+
+    def _feedback(self, error, started, elapsed):
+        fresh = started > self._last_cut
+        if error is None:
+            if self.target is not None and elapsed > self.target:
+                if fresh:
+                    self.limit = max(self.min_c, self.limit * 0.75)
+                    self._last_cut = time.monotonic()
+            else:
+                self.limit = min(self.max_c, self.limit + 1.0 / self.limit)
+                self.delay = max(self.base_delay, self.delay * 0.8)
+        elif self.throttled(error):
+            self.throttle_events += 1
+            if fresh:
+                self.limit = max(self.min_c, self.limit * 0.5)
+                self.delay = min(self.max_delay, max(self.delay * 2, self.backoff))
+                self._last_cut = time.monotonic()
+
+    def run(self) -> Iterator[Done]:
+        """완료 순서대로 Done 을 yield. 소비 중 add() 한 작업도 이어서 실행."""
+        running = {}
+        next_start = 0.0
+        with ThreadPoolExecutor(max_workers=self.max_c) as ex:
+            while self.pending or running:
+                now = time.monotonic()
+                while self.pending and len(running) < int(self.limit) and now >= next_start:
+                    task = self.pending.popleft()
+                    running[ex.submit(self._timed, task)] = task
+                    next_start = now + self.delay
+                if not running:
+                    time.sleep(max(0.0, next_start - now))
+                    continue
+                timeout = max(0.0, next_start - now) if self.pending and len(running) < int(self.limit) else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    task = running.pop(fut)
+                    value, error, started, elapsed = fut.result()
+                    self._feedback(error, started, elapsed)
+                    yield Done(task, value, error, elapsed, self.limit, self.delay)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+종목 메타데이터 바이너리 인덱스 (이름/테마/요약/야후 심볼, 파이썬 스크립트 공용)
+- 소스 (뒤에 오는 소스가 비어 있지 않은 필드를 덮어씀, '-' 는 빈 값):
+    public/jpx_universe.csv   code,name,theme,brief,tags,yahooSymbol
+    data/jpx_names.csv        ticker,name[,theme]                 (요약기 표시명, 테마는 키워드 분류 결과)
+    public/jpx_focus.csv      code,name,theme,brief,yahooSymbol   (큐레이션)
+    data/jpx_theme_map.json   [{code, theme, brief}]              (수동 테마)
+- 산출: data/ticker_meta.bin (소스가 바뀌면 자동 재생성, .gitignore)
+    header   : magic(버전 포함), 레코드 수, 슬롯 수, 서명 JSON 길이
+    서명 JSON: 소스별 [path, size, mtime_ns, sha256]
+    records  : 고정폭 구조체 (문자열 6개의 (offset, length) + market + sources 비트)
+    slots    : FNV-1a 해시 open addressing 테이블 (레코드 번호 + 1, 0 = 빈 칸)
+    blob     : utf-8 문자열 묶음
+- 읽기: 파일을 mmap 한 번, records/slots 는 np.frombuffer 로 복사 없이 사용 → 조회 O(1)
+- 재생성 판단: size/mtime 이 모두 같으면 그대로, 다르면 sha256 비교 후 다를 때만 재생성
+    python ticker_meta.py build | info | get 7203
+"""
+
+import os, csv, json, mmap, struct, hashlib, argparse, threading
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_PATH = Path(os.getenv("TICKER_META", "data/ticker_meta.bin"))
+
+# 소스 비트 (Entry.sources)
+SRC_UNIVERSE, SRC_FOCUS, SRC_NAMES, SRC_THEME_MAP = 1, 2, 4, 8
+CURATED = SRC_FOCUS | SRC_THEME_MAP    # 사람이 고른 테마가 있는 소스
+# (경로, 시장, 비트) — 순서 = 덮어쓰기 우선순위(뒤가 우선)
+DEFAULT_SOURCES: List[Tuple[str, str, int]] = [
+    ("public/jpx_universe.csv", "JP", SRC_UNIVERSE),
+    ("data/jpx_names.csv", "JP", SRC_NAMES),
+    ("public/jpx_focus.csv", "JP", SRC_FOCUS),
+    ("data/jpx_theme_map.json", "JP", SRC_THEME_MAP),
+]
+MARKETS = ("", "US", "JP")
+
+_MAGIC = b"TKMETA\x00\x01"
+_HEAD = struct.Struct("<8sIIII")
+_FIELDS = ("key", "name", "theme", "brief", "yahoo", "tags")
+_REC = np.dtype([(f"{f}_{p}", "<u4") for f in _FIELDS for p in ("off", "len")]
+                + [("market", "u1"), ("sources", "u1"), ("_pad", "u2")])
+_WORDS = _REC.itemsize // 4
+
+
+class Entry(NamedTuple):
+    id: int
+    key: str
+    market: str
+    name: str
+    theme: str
+    brief: str
+    yahoo: str
+    tags: str
+    sources: int
+
+
+def _fnv1a(b: bytes) -> int:
+    h = 0x811C9DC5
+    for x in b:
+        h = ((h ^ x) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def norm_key(key: str) -> str:
+    """'7203.T' → '7203' (JP 야후 심볼), 그 외는 대문자/공백 제거."""
+    k = str(key).strip().upper()
+    return k[:-2] if k.endswith(".T") else k
+
+
+# --------------------
+# 소스 읽기 (컬럼 이름 추정은 여기 한 곳에서만)
+# --------------------
+def _clean(v) -> str:
+    v = "" if v is None else str(v).strip()
+    return "" if v in ("-", "nan", "None") else v
+
+
+def _pick(row: dict, *names) -> str:
+    low = {str(k).lower(): v for k, v in row.items() if k is not None}
+    for n in names:
+        if n in low and _clean(low[n]):
+            return _clean(low[n])
+    return ""
+
+
+def read_source(path: Path, market: str) -> Iterator[dict]:
+    """CSV/JSON 소스 → 표준 필드 dict (key, name, theme, brief, yahoo, tags)."""
+    if path.suffix == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        rows = data if isinstance(data, list) else [dict(v, code=k) for k, v in data.items()]
+    else:
+        with path.open("r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    for r in rows:
+        code = _pick(r, "ticker", "code", "symbol")
+        if not code:
+            continue
+        yahoo = _pick(r, "yahoosymbol", "yahoo_symbol", "yahoo")
+        if not yahoo and market == "JP" and code.isalnum():
+            yahoo = code + ".T"
+        yield {"key": norm_key(code), "name": _pick(r, "name", "name_ja", "jp_name"),
+               "theme": _pick(r, "theme"), "brief": _pick(r, "brief"),
+               "yahoo": yahoo, "tags": _pick(r, "tags")}
+
+
+def _file_sig(path: Path, with_hash: bool = True) -> list:
+    st = path.stat()
+    h = hashlib.sha256(path.read_bytes()).hexdigest() if with_hash else ""
+    return [str(path), st.st_size, st.st_mtime_ns, h]
+
+
+# --------------------
+# 빌드
+# --------------------
+def build(out: Path = DEFAULT_PATH, sources: Sequence[Tuple[str, str, int]] = DEFAULT_SOURCES,
+          root: Path = Path(".")) -> int:
+    merged: Dict[str, dict] = {}
+    sig = []
+    for rel, market, bit in sources:
+        p = Path(root) / rel
+        if not p.exists():
+            continue
+        sig.append([rel] + _file_sig(p)[1:])     # 상대 경로로 기록 → cwd/root 가 달라도 같은 서명
+        for r in read_source(p, market):
+            e = merged.setdefault(r["key"], {"market": market, "sources": 0})
+            e["sources"] |= bit
+            for f in _FIELDS:
+                if r[f]:
+                    e[f] = r[f]
+
+    keys = sorted(merged)
+    n = len(keys)
+    nslots = 1
+    while nslots < max(8, n * 2):
+        nslots <<= 1
+    recs = np.zeros(n, dtype=_REC)
+    slots = np.zeros(nslots, dtype="<u4")
+    blob = bytearray()
+    for i, k in enumerate(keys):
+        e = merged[k]
+        e["key"] = k
+        for f in _FIELDS:
+            b = e.get(f, "").encode("utf-8")
+            recs[i][f"{f}_off"], recs[i][f"{f}_len"] = len(blob), len(b)
+            blob += b
+        recs[i]["market"] = MARKETS.index(e["market"]) if e["market"] in MARKETS else 0
+        recs[i]["sources"] = e["sources"]
+        j = _fnv1a(k.encode("utf-8")) & (nslots - 1)
+        while slots[j]:
+            j = (j + 1) & (nslots - 1)
+        slots[j] = i + 1
+
+    meta = json.dumps({"sources": sig}, ensure_ascii=False).encode("utf-8")
+    meta += b" " * (-len(meta) % 8)
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEAD.pack(_MAGIC, n, nslots, len(meta), 0))
+        f.write(meta)
+        f.write(recs.tobytes())
+        f.write(slots.tobytes())
+        f.write(bytes(blob))
+    os.replace(tmp, out)
+    return n
+
+
+def _stale(path: Path, sources, root: Path) -> bool:
+    """인덱스가 없거나 소스 구성/내용이 바뀌었으면 True."""
+    try:
+        with path.open("rb") as f:
+            magic, _, _, mlen, _ = _HEAD.unpack(f.read(_HEAD.size))
+            if magic != _MAGIC:
+                return True
+            old = json.loads(f.read(mlen))["sources"]
+    except (OSError, ValueError, struct.error, KeyError):
+        return True
+    now = [(rel, Path(root) / rel) for rel, _, _ in sources if (Path(root) / rel).exists()]
+    if [o[0] for o in old] != [rel for rel, _ in now]:
+        return True
+    for o, (_, p) in zip(old, now):
+        st = p.stat()
+        if (o[1], o[2]) != (st.st_size, st.st_mtime_ns) and o[3] != _file_sig(p)[3]:
+            return True
+    return False
+
+
+# --------------------
+# 읽기
+# --------------------
+class TickerMeta:
+    def __init__(self, path: Path = DEFAULT_PATH):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, nslots, mlen, _ = _HEAD.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path}: not a ticker meta index")
+        off = _HEAD.size + mlen
+        self.recs = np.frombuffer(self._mm, dtype=_REC, count=n, offset=off)
+        self.slots = np.frombuffer(self._mm, dtype="<u4", count=nslots, offset=off + n * _REC.itemsize)
+        # 단건 조회용: 같은 영역을 u4 워드 memoryview 로 (numpy 스칼라 생성 비용 회피, little-endian 전제)
+        mv = memoryview(self._mm)
+        self._w = mv[off:off + n * _REC.itemsize].cast("I")
+        self._s = mv[off + n * _REC.itemsize:off + n * _REC.itemsize + nslots * 4].cast("I")
+        self._blob = off + n * _REC.itemsize + nslots * 4
+        self._mask = nslots - 1
+
+    @classmethod
+    def open(cls, path: Path = DEFAULT_PATH, sources=DEFAULT_SOURCES, root: Path = Path(".")) -> "TickerMeta":
+        """소스가 바뀌었으면 재생성 후 mmap 으로 연다."""
+        if _stale(Path(path), sources, root):
+            build(path, sources, root)
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.recs)
+
+    def _str(self, i: int, fi: int) -> str:
+        base = i * _WORDS + 2 * fi
+        o = self._blob + self._w[base]
+        return self._mm[o:o + self._w[base + 1]].decode("utf-8")
+
+    def id_of(self, key: str) -> int:
+        """키 → 레코드 번호(ticker id). 없으면 -1."""
+        k = norm_key(key)
+        b = k.encode("utf-8")
+        j = _fnv1a(b) & self._mask
+        while True:
+            s = self._s[j]
+            if s == 0:
+                return -1
+            base = (s - 1) * _WORDS
+            if self._w[base + 1] == len(b):
+                o = self._blob + self._w[base]
+                if self._mm[o:o + len(b)] == b:
+                    return s - 1
+            j = (j + 1) & self._mask
+
+    def entry(self, i: int) -> Entry:
+        tail = self._w[i * _WORDS + 2 * len(_FIELDS)]     # market(u1) | sources(u1) << 8
+        return Entry(i, self._str(i, 0), MARKETS[tail & 0xFF],
+                     *(self._str(i, fi) for fi in range(1, len(_FIELDS))), (tail >> 8) & 0xFF)
+
+    def get(self, key: str) -> Optional[Entry]:
+        i = self.id_of(key)
+        return None if i < 0 else self.entry(i)
+
+    def name(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        i = self.id_of(key)
+        return (self._str(i, 1) or default) if i >= 0 else default
+
+    def entries(self, source: int = 0) -> Iterator[Entry]:
+        """source 비트가 주어지면 해당 소스에 있던 종목만 (키 순)."""
+        for i in range(len(self.recs)):
+            if not source or (self._w[i * _WORDS + 2 * len(_FIELDS)] >> 8) & source:
+                yield self.entry(i)
+
+
+_cache: Dict[str, TickerMeta] = {}
+_lock = threading.Lock()
+
+
+def load(path: Path = DEFAULT_PATH) -> TickerMeta:
+    """프로세스 안에서 한 번만 검사·mmap."""
+    with _lock:
+        k = str(path)
+        if k not in _cache:
+            _cache[k] = TickerMeta.open(Path(path))
+        return _cache[k]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build")
+    sub.add_parser("info")
+    g = sub.add_parser("get"); g.add_argument("keys", nargs="+")
+    ap.add_argument("--path", default=str(DEFAULT_PATH))
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        n = build(Path(args.path))
+        print(f"OK: {args.path} ({n} tickers)")
+        return
+    meta = TickerMeta.open(Path(args.path))
+    if args.cmd == "info":
+        size = Path(args.path).stat().st_size
+        print(f"{args.path}: {len(meta)} tickers, {len(meta.slots)} slots, {size / 1024:.0f} KB")
+    else:
+        for k in args.keys:
+            print(json.dumps(meta.get(k)._asdict() if meta.get(k) else {"key": k, "missing": True},
+                             ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()